@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 
 import os
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -20,13 +21,22 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/3.2/howto/deployment/checklist/
 
+# Settings profile, either "development" (the default) or "production".
+# The production overrides are applied at the bottom of this file.
+APP_PROFILE = os.getenv('APP_PROFILE', 'development')
+
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = 'django-insecure-vp=)@iu1kpsa0vfas=w(bnowfrp-ay&8cwp^i(9)^vyyw79h##'
+SECRET_KEY = os.getenv(
+    'DJANGO_SECRET_KEY',
+    'django-insecure-vp=)@iu1kpsa0vfas=w(bnowfrp-ay&8cwp^i(9)^vyyw79h##',
+)
 
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = True
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = [
+    host for host in os.getenv('DJANGO_ALLOWED_HOSTS', '').split(',') if host
+]
 
 
 # Application definition
@@ -38,6 +48,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     "core",
     "rest_framework.authtoken",
     "rest_framework",
@@ -47,13 +58,17 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.RequestContextMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.StatementTimeoutMiddleware',
 ]
 
 ROOT_URLCONF = 'app.urls'
@@ -88,10 +103,62 @@ DATABASES = {
         'NAME': os.getenv('DB_NAME', 'postgres'),
         'USER': os.getenv('DB_USER', 'postgres'),
         'PASSWORD': os.getenv('DB_PASS', 'postgres'),
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', '0')),
     }
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+# The default cache holds authenticated tokens, profiles, recipe counts
+# and the versions that retire cached statistics and similarity indexes,
+# so every worker process must see the same one: memcached at
+# CACHE_LOCATION (host:port). Without it the cache is local to each
+# process, which only suits a single-process development server.
+
+CACHE_LOCATION = os.getenv('CACHE_LOCATION', '')
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+        'LOCATION': CACHE_LOCATION,
+    } if CACHE_LOCATION else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Compressed copies of cached response bodies, kept apart so they
+    # never evict the entries they were made from.
+    'compression': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'compression',
+        'OPTIONS': {'MAX_ENTRIES': 1000},
+    },
+}
+
+
+# Password hashing
+# https://docs.djangoproject.com/en/3.2/topics/auth/passwords/
+# The first hasher hashes new passwords; the others only verify existing
+# hashes, which are upgraded on the next login. PASSWORD_HASH_ITERATIONS
+# sets the PBKDF2 cost (see the benchmark_password_hashers command) and a
+# positive PASSWORD_HASHING_POOL_SIZE moves PBKDF2 into a process pool of
+# that size so login bursts queue instead of taking every core.
+
+PASSWORD_HASHERS = [
+    'core.hashers.PooledPBKDF2PasswordHasher',
+    'core.hashers.PooledPBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
+if os.getenv('PASSWORD_HASHER'):
+    PASSWORD_HASHERS = [os.getenv('PASSWORD_HASHER')] + [
+        hasher for hasher in PASSWORD_HASHERS
+        if hasher != os.getenv('PASSWORD_HASHER')
+    ]
+
+PASSWORD_HASH_ITERATIONS = int(os.getenv('PASSWORD_HASH_ITERATIONS', '260000'))
+PASSWORD_HASHING_POOL_SIZE = int(os.getenv('PASSWORD_HASHING_POOL_SIZE', '0'))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -145,4 +212,206 @@ REST_FRAMEWORK = {
     # 'DEFAULT_PERMISSION_CLASSES': (
     #     'rest_framework.permissions.IsAuthenticated',
     # ),
-}
\ No newline at end of file
+    # Token buckets per user, or per client IP for anonymous requests,
+    # holding n requests and refilling n per period (core.throttling).
+    # Login attempts are also limited per account.
+    'DEFAULT_THROTTLE_CLASSES': (
+        'core.throttling.RequestRateThrottle',
+    ),
+    'DEFAULT_THROTTLE_RATES': {
+        'login': '10/min',
+        'writes': '120/min',
+        'reads': '1200/min',
+    },
+    # Reverse proxies in front of the app, whose X-Forwarded-For entries
+    # are trusted to find the client IP.
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', '0')),
+}
+
+# Rate limit buckets are shared by the worker processes through this
+# memory-mapped file of THROTTLE_STORE_SLOTS slots (core.throttling).
+THROTTLE_STORE_PATH = os.getenv(
+    'THROTTLE_STORE_PATH', os.path.join(tempfile.gettempdir(), 'recipe-throttle')
+)
+THROTTLE_STORE_SLOTS = 65536
+
+# Tests run with throttling off, apart from the tests of it, and with a
+# throttle store of their own (core.tests.runner).
+TEST_RUNNER = 'core.tests.runner.TestRunner'
+
+# Serve ?with_counts=1 tag listings from the denormalized Tag.recipe_count
+# column instead of a grouped query over the recipe/tag links.
+TAG_RECIPE_COUNT_DENORMALIZED = True
+
+# Serve the tags of recipe list entries from the denormalized
+# Recipe.tags_snapshot column instead of prefetching them.
+RECIPE_LIST_TAG_SNAPSHOT = True
+
+# Tag autocomplete (?prefix= / ?q= on the tag list) returns this many of
+# the most used matches. ?q= also matches by trigram similarity when the
+# pg_trgm extension is installed.
+TAG_AUTOCOMPLETE_LIMIT = 10
+TAG_TRIGRAM_SEARCH = True
+
+# Similar recipes (/api/recipe/recipes/<id>/similar/) are ranked by tag
+# overlap in SQL, or from a per-process in-memory index of each user's
+# recipe tags when RECIPE_SIMILAR_IN_MEMORY is on. Indexes of at most
+# RECIPE_SIMILAR_INDEX_MAX_USERS users are kept per process.
+RECIPE_SIMILAR_LIMIT = 10
+RECIPE_SIMILAR_IN_MEMORY = False
+RECIPE_SIMILAR_INDEX_MAX_USERS = 100
+
+# Recipe statistics (/api/recipe/recipes/stats/) are cached per user until
+# the user's recipes or tags change.
+RECIPE_STATS_CACHE_SECONDS = 60 * 60
+RECIPE_STATS_PRICE_BUCKETS = 10
+RECIPE_STATS_TOP_TAGS = 20
+
+# Bytes read per chunk when streaming CSV exports (core.export).
+RECIPE_EXPORT_CHUNK_SIZE = 64 * 1024
+
+# Background jobs (core.jobs, run by the run_worker command). Failed jobs
+# are retried with exponential backoff up to JOB_MAX_ATTEMPTS times; jobs
+# locked longer than JOB_LOCK_TIMEOUT_SECONDS are assumed abandoned.
+JOB_MAX_ATTEMPTS = 5
+JOB_RETRY_BACKOFF_SECONDS = 10
+JOB_RETRY_BACKOFF_MAX_SECONDS = 60 * 60
+JOB_LOCK_TIMEOUT_SECONDS = 60 * 60
+JOB_POLL_INTERVAL_SECONDS = 1
+
+# Rows deleted per statement when purging a deleted user (core.purge).
+PURGE_BATCH_SIZE = 10000
+
+# Server-sent events of recipe and tag changes (core.events), served by
+# app/asgi.py at EVENTS_PATH under an ASGI server. Streams that fall
+# EVENTS_QUEUE_SIZE events behind are sent a reset event and closed.
+# Browsers' EventSource cannot send the token header, so they connect with
+# ?ticket= from POST /api/events/ticket/, usable once within
+# EVENTS_TICKET_SECONDS.
+EVENTS_PATH = '/api/events/'
+EVENTS_CHANNEL = 'recipe_events'
+EVENTS_HEARTBEAT_SECONDS = 15
+EVENTS_QUEUE_SIZE = 100
+EVENTS_TICKET_SECONDS = 30
+
+# Prometheus metrics at /metrics (core.metrics). Every process writes its
+# values to METRICS_DIR, which should be emptied when the service restarts.
+# Scrapes must send METRICS_TOKEN as a bearer token, and /metrics answers
+# 404 while it is unset.
+METRICS_DIR = os.getenv(
+    'METRICS_DIR', os.path.join(tempfile.gettempdir(), 'recipe-metrics')
+)
+METRICS_FLUSH_SECONDS = 5
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# Queries slower than SLOW_QUERY_THRESHOLD_MS are logged, a sample of them
+# explained, and the SLOW_QUERY_TOP_K slowest fingerprints kept per process
+# for /api/slow-queries/ (core.slow_queries).
+SLOW_QUERY_THRESHOLD_MS = 100
+SLOW_QUERY_EXPLAIN_SAMPLE_RATE = 0.1
+SLOW_QUERY_TOP_K = 50
+
+# Views run in a transaction with a statement_timeout, in milliseconds, of
+# STATEMENT_TIMEOUTS[route] or STATEMENT_TIMEOUT_DEFAULT_MS; None means no
+# limit. Batched sub-requests get their own route's timeout. Cancelled
+# statements answer 503 with Retry-After (core.timeouts).
+STATEMENT_TIMEOUT_DEFAULT_MS = 5000
+STATEMENT_TIMEOUTS = {
+    'core:batch': None,
+    'recipe:recipe-list': 2000,
+    'recipe:recipe-export': None,
+    'user:token': 500,
+}
+STATEMENT_TIMEOUT_RETRY_AFTER_SECONDS = 5
+
+# Incremental sync (recipe.views.SyncView). Changes younger than the safety
+# window are left for the next sync so that rows written by transactions
+# still in flight are not skipped. Tokens older than the tombstone
+# retention get a full resync.
+SYNC_SAFETY_WINDOW_SECONDS = 5
+SYNC_TOMBSTONE_RETENTION_DAYS = 30
+
+# Batch endpoint (core.views.BatchView).
+BATCH_MAX_REQUESTS = 20
+BATCH_MAX_WORKERS = 4
+
+# API tokens (core.authentication.ExpiringTokenAuthentication) expire after
+# AUTH_TOKEN_TTL_SECONDS without use. last_used is written at most once per
+# touch interval and authenticated tokens are cached for a short while.
+AUTH_TOKEN_TTL_SECONDS = 30 * 24 * 60 * 60
+AUTH_TOKEN_TOUCH_INTERVAL_SECONDS = 5 * 60
+AUTH_TOKEN_CACHE_SECONDS = 30
+
+# Paginated API lists and admin changelists count exactly up to this many
+# rows and use the planner's estimate above it (core.counts).
+EXACT_COUNT_LIMIT = 10000
+# Per-user recipe counts are cached and bumped on create and delete.
+RECIPE_COUNT_CACHE_SECONDS = 60 * 60
+
+# Seconds the rendered /api/user/me/ profile is cached for each user.
+ME_CACHE_SECONDS = 5 * 60
+
+# Responses to POSTs carrying an Idempotency-Key header are replayed for
+# repeats of the key within this many seconds (core.idempotency).
+IDEMPOTENCY_KEY_TTL_SECONDS = 24 * 60 * 60
+
+# API response compression (core.middleware.CompressionMiddleware).
+# Brotli is offered when the optional brotli package is installed.
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_GZIP_LEVEL = 6
+COMPRESSION_BROTLI_QUALITY = 5
+COMPRESSION_STREAMING = True
+# Compressed copies of cached bodies (the profile, recipe statistics) are
+# kept in their own cache; set the timeout to 0 to disable.
+COMPRESSION_CACHE_ALIAS = 'compression'
+COMPRESSION_CACHE_TIMEOUT = 300
+
+# Requests under this prefix are token authenticated API calls and skip the
+# session, auth and message middleware in the production profile.
+API_PATH_PREFIX = '/api/'
+
+
+# Production profile
+# Removes the debug-only overhead: query logging in connection.queries,
+# per-request template recompilation and session/message storage on API
+# calls. core.checks refuses to boot this profile if any of it comes back.
+
+if APP_PROFILE == 'production':
+    DEBUG = False
+
+    MIDDLEWARE = [
+        'core.middleware.MetricsMiddleware',
+        'core.middleware.RequestContextMiddleware',
+        'django.middleware.security.SecurityMiddleware',
+        'core.middleware.CompressionMiddleware',
+        'core.middleware.APISessionMiddleware',
+        'django.middleware.common.CommonMiddleware',
+        'django.middleware.csrf.CsrfViewMiddleware',
+        'core.middleware.APIAuthenticationMiddleware',
+        'core.middleware.APIMessageMiddleware',
+        'django.middleware.clickjacking.XFrameOptionsMiddleware',
+        'core.middleware.StatementTimeoutMiddleware',
+    ]
+
+    TEMPLATES[0]['APP_DIRS'] = False
+    TEMPLATES[0]['OPTIONS'] = {
+        'debug': False,
+        'context_processors': [
+            'django.template.context_processors.request',
+            'django.contrib.auth.context_processors.auth',
+            'django.contrib.messages.context_processors.messages',
+        ],
+        'loaders': [
+            (
+                'django.template.loaders.cached.Loader',
+                [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ],
+            ),
+        ],
+    }
+
+    DATABASES['default']['CONN_MAX_AGE'] = int(
+        os.getenv('DB_CONN_MAX_AGE', '600')
+    )
@@ -22,9 +22,12 @@ from drf_spectacular.views import (
     SpectacularSwaggerView,
 )
 
+from core.views import metrics_view
+
 
 urlpatterns = [
     path("admin/", admin.site.urls),
+    path("metrics", metrics_view, name="metrics"),
     path("api/schema/", SpectacularAPIView.as_view(), name="api-schema"),
     path(
         "api/docs/",
@@ -38,4 +41,5 @@ urlpatterns = [
     # ),
     path("api/user/", include("user.urls")),
     path("api/recipe/", include("recipe.urls")),
+    path("api/", include("core.urls")),
 ]
@@ -4,8 +4,24 @@ Django admin customization.
 
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
 from django.utils.translation import gettext as _
-from core import models
+from core import counts, models
+from core.purge import request_user_purge
+from user.cache import invalidate_me_cache
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that counts exactly up to EXACT_COUNT_LIMIT rows.
+
+    Larger result sets use the planner's estimate instead of a COUNT(*)
+    over the whole table.
+    """
+
+    @cached_property
+    def count(self):
+        return counts.count(self.object_list)[0]
 
 
 class UserAdmin(BaseUserAdmin):
@@ -36,7 +52,68 @@ class UserAdmin(BaseUserAdmin):
         ),
     )
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        invalidate_me_cache(obj.pk)
+
+    # Deleting a user cascades through all their recipes and tags, so the
+    # admin deactivates them and leaves the data to the purge_users command
+    # instead of collecting every related row.
+
+    def get_deleted_objects(self, objs, request):
+        deleted = [str(obj) for obj in objs]
+        return deleted, {self.opts.verbose_name_plural: len(deleted)}, set(), []
+
+    def delete_model(self, request, obj):
+        request_user_purge(obj)
+
+    def delete_queryset(self, request, queryset):
+        for user in queryset:
+            request_user_purge(user)
+
+
+class RecipeAdmin(admin.ModelAdmin):
+    ordering = ["-id"]
+    list_display = ["id", "title", "user", "time_minutes", "price"]
+    list_select_related = ["user"]
+    # Prefix searches, served by the upper(title) pattern index.
+    search_fields = ["^title"]
+    raw_id_fields = ["user"]
+    autocomplete_fields = ["tags"]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        # Numbers also look recipes up by id. An "=id" search field would
+        # compare id::text instead and rule out both indexes.
+        results, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        term = search_term.strip()
+        if term.isdigit() and int(term) < 2 ** 63:
+            results |= queryset.filter(pk=int(term))
+        return results, may_have_duplicates
+
+
+class TagAdmin(admin.ModelAdmin):
+    ordering = ["-id"]
+    list_display = ["id", "name", "user", "recipe_count"]
+    list_select_related = ["user"]
+    # Prefix searches, served by the upper(name) pattern index.
+    search_fields = ["^name"]
+    raw_id_fields = ["user"]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class JobAdmin(admin.ModelAdmin):
+    ordering = ["-id"]
+    list_display = ["id", "name", "status", "attempts", "run_at", "finished_at"]
+    list_filter = ["status"]
+    raw_id_fields = ["user"]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
 
 admin.site.register(models.User, UserAdmin)
-admin.site.register(models.Recipe)
-admin.site.register(models.Tag)
+admin.site.register(models.Recipe, RecipeAdmin)
+admin.site.register(models.Tag, TagAdmin)
+admin.site.register(models.Job, JobAdmin)
@@ -1,6 +1,25 @@
 from django.apps import AppConfig
+from django.core import checks
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.signals import connection_created
 
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from core.checks import check_production_profile
+        from core import schema, signals, tasks  # noqa: F401
+        from core.slow_queries import install
+
+        checks.register(check_production_profile)
+        connection_created.connect(install)
+
+        # Checks only run for management commands, so refuse to boot a
+        # misconfigured production worker here as well.
+        errors = check_production_profile()
+        if errors:
+            raise ImproperlyConfigured(
+                "; ".join(f"{error.id}: {error.msg}" for error in errors)
+            )
@@ -0,0 +1,80 @@
+"""
+Token authentication with sliding expiry.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+from core import metrics
+from core.models import AuthToken
+
+
+def token_cache_key(key):
+    """Return the cache key holding an authenticated token."""
+    return f"auth-token:{key}"
+
+
+def invalidate_cached_tokens(keys):
+    """Drop tokens from the authentication cache."""
+    cache.delete_many([token_cache_key(key) for key in keys])
+
+
+class ExpiringTokenAuthentication(TokenAuthentication):
+    """Token authentication where tokens expire after a period of disuse.
+
+    Each use slides the expiry forward, but last_used is written at most
+    once per AUTH_TOKEN_TOUCH_INTERVAL_SECONDS per token. Authenticated
+    tokens are cached for AUTH_TOKEN_CACHE_SECONDS, so most requests
+    neither read nor write the token table.
+    """
+
+    model = AuthToken
+
+    def authenticate_credentials(self, key):
+        token = self._get_token(key)
+
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_("User inactive or deleted."))
+
+        now = timezone.now()
+        idle = now - token.last_used
+        if idle > timedelta(seconds=settings.AUTH_TOKEN_TTL_SECONDS):
+            invalidate_cached_tokens([key])
+            raise exceptions.AuthenticationFailed(_("Token has expired."))
+
+        if idle > timedelta(seconds=settings.AUTH_TOKEN_TOUCH_INTERVAL_SECONDS):
+            AuthToken.objects.filter(key=key).update(last_used=now)
+            token.last_used = now
+            self._cache_token(token)
+
+        return (token.user, token)
+
+    def _get_token(self, key):
+        """Return the token for a key, from the cache when possible."""
+        token = None
+        if settings.AUTH_TOKEN_CACHE_SECONDS:
+            token = cache.get(token_cache_key(key))
+            metrics.inc("auth_token_cache_total", ("miss" if token is None else "hit",))
+        if token is not None:
+            return token
+
+        try:
+            token = AuthToken.objects.select_related("user").get(key=key)
+        except AuthToken.DoesNotExist:
+            raise exceptions.AuthenticationFailed(_("Invalid token."))
+        self._cache_token(token)
+        return token
+
+    def _cache_token(self, token):
+        """Store an authenticated token with its user."""
+        if settings.AUTH_TOKEN_CACHE_SECONDS:
+            cache.set(
+                token_cache_key(token.key), token, settings.AUTH_TOKEN_CACHE_SECONDS
+            )
@@ -0,0 +1,96 @@
+"""
+System checks for the settings profiles.
+"""
+
+from django.conf import settings
+from django.core.checks import Error
+
+DEBUG_MIDDLEWARE = (
+    "django.contrib.sessions.middleware.SessionMiddleware",
+    "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "django.contrib.messages.middleware.MessageMiddleware",
+)
+
+CACHED_LOADER = "django.template.loaders.cached.Loader"
+
+# Backends whose entries only the process that stored them can see.
+PROCESS_LOCAL_CACHES = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+def _uses_cached_loader(options):
+    loaders = options.get("loaders")
+    if loaders is None:
+        # Django wraps the default loaders in the cached one unless debug.
+        return not options.get("debug", settings.DEBUG)
+    return all(
+        isinstance(loader, (list, tuple)) and loader[0] == CACHED_LOADER
+        for loader in loaders
+    )
+
+
+def check_production_profile(app_configs=None, **kwargs):
+    """Report debug-only overhead and per-process state in the production profile."""
+    if settings.APP_PROFILE != "production":
+        return []
+
+    errors = []
+    if settings.DEBUG:
+        errors.append(
+            Error(
+                "DEBUG is enabled in the production profile.",
+                hint="Every SQL query is kept in connection.queries.",
+                id="core.E001",
+            )
+        )
+
+    for alias, db in settings.DATABASES.items():
+        if not db.get("CONN_MAX_AGE"):
+            errors.append(
+                Error(
+                    f"Database '{alias}' does not use persistent connections.",
+                    hint="Set DB_CONN_MAX_AGE to a positive number of seconds.",
+                    id="core.E002",
+                )
+            )
+
+    for template in settings.TEMPLATES:
+        options = template.get("OPTIONS", {})
+        if options.get("debug") or not _uses_cached_loader(options):
+            errors.append(
+                Error(
+                    "Templates are not served by the cached loader.",
+                    id="core.E003",
+                )
+            )
+        processors = options.get("context_processors", [])
+        if "django.template.context_processors.debug" in processors:
+            errors.append(
+                Error(
+                    "The debug context processor is enabled.",
+                    id="core.E004",
+                )
+            )
+
+    for middleware in DEBUG_MIDDLEWARE:
+        if middleware in settings.MIDDLEWARE:
+            errors.append(
+                Error(
+                    f"{middleware} runs for API requests.",
+                    hint="Use the core.middleware API variant instead.",
+                    id="core.E005",
+                )
+            )
+
+    if settings.CACHES["default"]["BACKEND"] in PROCESS_LOCAL_CACHES:
+        errors.append(
+            Error(
+                "The default cache is not shared by the worker processes.",
+                hint="Set CACHE_LOCATION to a memcached server.",
+                id="core.E006",
+            )
+        )
+
+    return errors
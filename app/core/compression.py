@@ -0,0 +1,100 @@
+"""
+Response body compression for the API.
+"""
+
+import gzip
+import hashlib
+import zlib
+
+from django.conf import settings
+from django.core.cache import caches
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is an optional dependency
+    brotli = None
+
+
+def available_encodings():
+    """Return the supported content codings, most preferred first."""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate_encoding(accept_encoding):
+    """Pick the best supported coding from an Accept-Encoding header."""
+    accepted = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+
+    best = None
+    for coding in available_encodings():
+        quality = accepted.get(coding, accepted.get("*", 0.0))
+        if quality > 0 and (best is None or quality > best[1]):
+            best = (coding, quality)
+    return best[0] if best else None
+
+
+def compress(content, encoding):
+    """Compress a complete body."""
+    if encoding == "br":
+        return brotli.compress(content, quality=settings.COMPRESSION_BROTLI_QUALITY)
+    return gzip.compress(content, compresslevel=settings.COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+def cache_compressed_as(response, key):
+    """Mark a response rendered from a cached body for compressed caching.
+
+    key must change whenever the body does, for example by including the
+    version or ETag of the cache entry it was rendered from.
+    """
+    response.compression_cache_key = key
+    return response
+
+
+def compress_cached(content, encoding, key=None):
+    """Compress a body, reusing the bytes stored under its cache key.
+
+    Bodies without a key are compressed every time. Returns
+    (compressed, cache_hit).
+    """
+    timeout = settings.COMPRESSION_CACHE_TIMEOUT
+    if key is None or not timeout:
+        return compress(content, encoding), False
+
+    cache = caches[settings.COMPRESSION_CACHE_ALIAS]
+    # Hashed, as keys can hold media types with spaces or be long.
+    key = f"compressed:{encoding}:{hashlib.sha256(key.encode()).hexdigest()}"
+    compressed = cache.get(key)
+    if compressed is not None:
+        return compressed, True
+
+    compressed = compress(content, encoding)
+    cache.set(key, compressed, timeout)
+    return compressed, False
+
+
+def compress_stream(chunks, encoding):
+    """Compress a streamed body chunk by chunk."""
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=settings.COMPRESSION_BROTLI_QUALITY)
+        for chunk in chunks:
+            data = compressor.process(chunk)
+            if data:
+                yield data
+        yield compressor.finish()
+        return
+
+    compressor = zlib.compressobj(settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
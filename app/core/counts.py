@@ -0,0 +1,86 @@
+"""
+Row counts that stay cheap on large tables.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+
+from core.models import Recipe
+
+
+def table_estimate(model, using="default"):
+    """Return the planner's row estimate for a whole table, or None."""
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            "SELECT reltuples FROM pg_class WHERE oid = %s::regclass",
+            [model._meta.db_table],
+        )
+        row = cursor.fetchone()
+    # reltuples is -1 until the table has been vacuumed or analyzed.
+    if row is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+def estimate_count(queryset):
+    """Return the planner's row estimate for a queryset."""
+    if not queryset.query.where and not queryset.query.distinct:
+        estimate = table_estimate(queryset.model, queryset.db)
+        if estimate is not None:
+            return estimate
+
+    queryset = queryset.order_by()
+    sql, params = queryset.query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def count(queryset, limit=None):
+    """Count a queryset exactly up to a limit and estimate beyond it.
+
+    Returns (count, approximate). The limit defaults to EXACT_COUNT_LIMIT.
+    """
+    limit = settings.EXACT_COUNT_LIMIT if limit is None else limit
+    if queryset.query.is_sliced:
+        return queryset.count(), False
+
+    exact = queryset.order_by()[:limit + 1].count()
+    if exact <= limit:
+        return exact, False
+    # The exact count proved there are more rows than the limit, so never
+    # report fewer than that.
+    return max(estimate_count(queryset), limit + 1), True
+
+
+def recipe_count_key(user_id):
+    """Return the cache key holding a user's recipe count."""
+    return f"recipe-count:{user_id}"
+
+
+def user_recipe_count(user_id):
+    """Return the number of recipes a user owns, cached between calls.
+
+    The count lives in the default cache, which the workers share, so it
+    follows the bumps made by any of them.
+    """
+    key = recipe_count_key(user_id)
+    value = cache.get(key)
+    if value is None:
+        value = Recipe.objects.filter(user_id=user_id).count()
+        cache.add(key, value, settings.RECIPE_COUNT_CACHE_SECONDS)
+    return value
+
+
+def bump_user_recipe_count(user_id, delta):
+    """Adjust a cached recipe count once the current transaction commits."""
+    def bump():
+        try:
+            cache.incr(recipe_count_key(user_id), delta)
+        except ValueError:
+            # Nothing cached yet; the next read counts from the table.
+            pass
+
+    transaction.on_commit(bump)
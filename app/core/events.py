@@ -0,0 +1,215 @@
+"""
+Server-sent events of recipe and tag changes.
+
+Writes publish small JSON payloads with pg_notify, which PostgreSQL
+delivers when the writing transaction commits. Each process keeps one
+LISTEN connection and fans the notifications out to the event streams
+of the users they belong to. The stream is a plain ASGI app mounted by
+app/asgi.py at EVENTS_PATH.
+"""
+
+import asyncio
+import json
+import logging
+import select
+import threading
+from collections import defaultdict
+from urllib.parse import parse_qs
+
+import psycopg2
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connection, connections
+
+from rest_framework.exceptions import AuthenticationFailed
+
+from core.authentication import ExpiringTokenAuthentication
+from core.models import StreamTicket
+
+logger = logging.getLogger(__name__)
+
+
+def publish(user_id, event, object_id):
+    """Queue a change event for a user's streams, sent on commit."""
+    payload = json.dumps({"user": user_id, "event": event, "id": object_id})
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_notify(%s, %s)", [settings.EVENTS_CHANNEL, payload])
+
+
+class Listener:
+    """Shared LISTEN connection fanning notifications out to subscribers."""
+
+    def __init__(self):
+        self.subscribers = defaultdict(set)
+        self.lock = threading.Lock()
+        self.thread = None
+        self.ready = threading.Event()
+        self.stopping = threading.Event()
+
+    def subscribe(self, user_id, queue, loop):
+        """Deliver a user's events into an asyncio queue on a loop."""
+        with self.lock:
+            self.subscribers[user_id].add((queue, loop))
+            if self.thread is None or not self.thread.is_alive():
+                self.ready.clear()
+                self.stopping.clear()
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+        # Events committed before LISTEN runs would be lost.
+        self.ready.wait(timeout=10)
+
+    def unsubscribe(self, user_id, queue, loop):
+        with self.lock:
+            self.subscribers[user_id].discard((queue, loop))
+            if not self.subscribers[user_id]:
+                del self.subscribers[user_id]
+
+    def stop(self):
+        """Close the listener connection."""
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join()
+
+    def _run(self):
+        while not self.stopping.is_set():
+            try:
+                self._listen()
+            except psycopg2.Error:
+                logger.exception("Event listener lost its connection")
+                self.stopping.wait(1)
+
+    def _listen(self):
+        params = connections["default"].get_connection_params()
+        conn = psycopg2.connect(**params)
+        try:
+            conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            with conn.cursor() as cursor:
+                cursor.execute(f"LISTEN {settings.EVENTS_CHANNEL}")
+            self.ready.set()
+            while not self.stopping.is_set():
+                if select.select([conn], [], [], 1)[0]:
+                    conn.poll()
+                    while conn.notifies:
+                        self._dispatch(conn.notifies.pop(0).payload)
+        finally:
+            conn.close()
+
+    def _dispatch(self, payload):
+        message = json.loads(payload)
+        with self.lock:
+            targets = list(self.subscribers.get(message.pop("user"), ()))
+        for queue, loop in targets:
+            loop.call_soon_threadsafe(_offer, queue, message)
+
+
+def _offer(queue, message):
+    try:
+        queue.put_nowait(message)
+    except asyncio.QueueFull:
+        # A stream that cannot keep up is told to resync and reconnect.
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(None)
+
+
+listener = Listener()
+
+
+def _token(scope):
+    """Return the API token in a request's Authorization header."""
+    headers = dict(scope.get("headers", []))
+    scheme, _, key = headers.get(b"authorization", b"").decode().partition(" ")
+    if scheme.lower() == "token" and key:
+        return key.strip()
+    return None
+
+
+def _ticket(scope):
+    """Return the stream ticket in a request's ?ticket=.
+
+    EventSource cannot send headers. Tickets rather than API tokens go in
+    the URL, as URLs end up in access logs.
+    """
+    query = parse_qs(scope.get("query_string", b"").decode())
+    return query.get("ticket", [None])[0]
+
+
+def _authenticate(scope):
+    """Return the user of a request's token or ticket, or None."""
+    try:
+        key = _token(scope)
+        if key:
+            return ExpiringTokenAuthentication().authenticate_credentials(key)[0]
+        ticket = _ticket(scope)
+        return ticket and StreamTicket.objects.redeem(ticket)
+    except AuthenticationFailed:
+        return None
+    finally:
+        close_old_connections()
+
+
+async def _respond(send, status, body):
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json")],
+    })
+    await send({"type": "http.response.body", "body": json.dumps(body).encode()})
+
+
+async def _disconnected(receive):
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+async def events_app(scope, receive, send):
+    """Stream the authenticated user's change events.
+
+    Events are not replayed, so clients call the sync endpoint whenever
+    they (re)connect or receive a "reset" event.
+    """
+    if scope["method"] != "GET":
+        return await _respond(send, 405, {"detail": "Method not allowed."})
+    user = await sync_to_async(_authenticate)(scope)
+    if not user:
+        return await _respond(send, 401, {"detail": "Invalid token or ticket."})
+
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(maxsize=settings.EVENTS_QUEUE_SIZE)
+    await sync_to_async(listener.subscribe, thread_sensitive=False)(user.pk, queue, loop)
+    disconnected = asyncio.ensure_future(_disconnected(receive))
+    try:
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"text/event-stream"),
+                (b"cache-control", b"no-cache"),
+                (b"x-accel-buffering", b"no"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": b": connected\n\n", "more_body": True})
+        while True:
+            message = asyncio.ensure_future(queue.get())
+            done, _ = await asyncio.wait(
+                {message, disconnected},
+                timeout=settings.EVENTS_HEARTBEAT_SECONDS,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if disconnected in done:
+                message.cancel()
+                return
+            if message not in done:
+                message.cancel()
+                body = b": ping\n\n"
+            elif message.result() is None:
+                await send({"type": "http.response.body", "body": b"event: reset\ndata: {}\n\n"})
+                return
+            else:
+                event = message.result()
+                data = json.dumps({"id": event["id"]})
+                body = f"event: {event['event']}\ndata: {data}\n\n".encode()
+            await send({"type": "http.response.body", "body": body, "more_body": True})
+    finally:
+        disconnected.cancel()
+        listener.unsubscribe(user.pk, queue, loop)
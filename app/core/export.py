@@ -0,0 +1,100 @@
+"""
+CSV export of recipes through PostgreSQL COPY.
+"""
+
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.db import connection, connections
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+logger = logging.getLogger(__name__)
+
+EXPORT_SQL = """
+COPY (
+    SELECT r.id, r.title, r.time_minutes, r.price, r.link, r.description,
+           COALESCE(string_agg(t.name, '|' ORDER BY t.name), '') AS tags,
+           r.updated_at
+    FROM core_recipe r
+    LEFT JOIN core_recipe_tags rt ON rt.recipe_id = r.id
+    LEFT JOIN core_tag t ON t.id = rt.tag_id
+    {where}
+    GROUP BY r.id
+    ORDER BY r.id
+) TO STDOUT WITH (FORMAT csv, HEADER)
+"""
+
+
+def export_sql(cursor, user_id=None):
+    """Return the COPY statement exporting one user's recipes, or everyone's.
+
+    COPY takes no bind parameters, so the user id is quoted by psycopg2.
+    """
+    if user_id is None:
+        return EXPORT_SQL.format(where="")
+    where = cursor.mogrify("WHERE r.user_id = %s", [user_id]).decode()
+    return EXPORT_SQL.format(where=where)
+
+
+def copy_recipes(file, user_id=None):
+    """Write the recipe CSV into a file object without parsing rows."""
+    connection.ensure_connection()
+    with connection.connection.cursor() as cursor:
+        cursor.copy_expert(export_sql(cursor, user_id), file)
+
+
+def _copy_into_pipe(write_fd, user_id, errors):
+    try:
+        with os.fdopen(write_fd, "wb") as pipe:
+            copy_recipes(pipe, user_id)
+    except BrokenPipeError:
+        # The reader went away, e.g. the client disconnected.
+        pass
+    except Exception as exc:
+        logger.exception("Recipe export for user %s failed", user_id)
+        errors.append(exc)
+    finally:
+        connections.close_all()
+
+
+def stream_recipes(user_id):
+    """Yield the recipe CSV of a user in chunks as COPY produces it.
+
+    COPY writes into a pipe from a separate thread, with its own database
+    connection, while the response reads the other end.
+    """
+    read_fd, write_fd = os.pipe()
+    errors = []
+    thread = threading.Thread(
+        target=_copy_into_pipe, args=(write_fd, user_id, errors), daemon=True
+    )
+    thread.start()
+    try:
+        with os.fdopen(read_fd, "rb") as pipe:
+            while True:
+                chunk = pipe.read(settings.RECIPE_EXPORT_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+    finally:
+        thread.join()
+    if errors:
+        raise errors[0]
+
+
+class CSVRenderer(BaseRenderer):
+    """Renderer letting export actions accept text/csv.
+
+    The CSV itself is streamed past the renderer; error responses are
+    rendered as JSON.
+    """
+
+    media_type = "text/csv"
+    format = "csv"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return JSONRenderer().render(data)
@@ -0,0 +1,79 @@
+"""
+Password hashers with settings driven cost and an optional process pool.
+"""
+
+import base64
+import hashlib
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, PBKDF2SHA1PasswordHasher
+from django.utils.encoding import force_bytes
+
+_pool = None
+_pool_size = 0
+_pool_lock = threading.Lock()
+
+
+def get_hashing_pool():
+    """Return the shared hashing pool, or None when hashing runs inline."""
+    global _pool, _pool_size
+
+    size = settings.PASSWORD_HASHING_POOL_SIZE
+    if _pool_size == size:
+        return _pool
+    with _pool_lock:
+        if _pool_size != size:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            # forkserver children start from a clean process, so they do not
+            # inherit the worker's threads or database connections.
+            _pool = ProcessPoolExecutor(
+                max_workers=size,
+                mp_context=multiprocessing.get_context("forkserver"),
+            ) if size else None
+            _pool_size = size
+    return _pool
+
+
+def pbkdf2(password, salt, iterations, digest):
+    """Run PBKDF2, in the hashing pool when one is configured.
+
+    The pool bounds how many CPU cores login bursts can take; further
+    requests queue for a free pool process.
+    """
+    args = (digest().name, force_bytes(password), force_bytes(salt), iterations)
+    pool = get_hashing_pool()
+    if pool is None:
+        return hashlib.pbkdf2_hmac(*args)
+    return pool.submit(hashlib.pbkdf2_hmac, *args).result()
+
+
+class PooledPBKDF2Mixin:
+    """PBKDF2 with PASSWORD_HASH_ITERATIONS rounds and optional pooling.
+
+    Hashes made with another iteration count are upgraded transparently
+    the next time the user logs in.
+    """
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_HASH_ITERATIONS
+
+    def encode(self, password, salt, iterations=None):
+        assert password is not None
+        assert salt and "$" not in salt
+        iterations = iterations or self.iterations
+        hash = pbkdf2(password, salt, iterations, digest=self.digest)
+        hash = base64.b64encode(hash).decode("ascii").strip()
+        return "%s$%d$%s$%s" % (self.algorithm, iterations, salt, hash)
+
+
+class PooledPBKDF2PasswordHasher(PooledPBKDF2Mixin, PBKDF2PasswordHasher):
+    """PBKDF2-SHA256 hasher driven by settings."""
+
+
+class PooledPBKDF2SHA1PasswordHasher(PooledPBKDF2Mixin, PBKDF2SHA1PasswordHasher):
+    """PBKDF2-SHA1 hasher driven by settings."""
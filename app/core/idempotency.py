@@ -0,0 +1,124 @@
+"""
+Idempotency-Key support for create endpoints.
+"""
+
+import hashlib
+import json
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from django.utils.crypto import salted_hmac
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.throttling import BaseThrottle
+
+from core.models import IdempotencyKey
+
+HEADER = "Idempotency-Key"
+
+
+@contextmanager
+def advisory_lock(name):
+    """Hold a PostgreSQL advisory lock named by a string.
+
+    Inside a transaction the lock is held until it ends, so that waiters
+    see what the holder committed.
+    """
+    lock_id = int.from_bytes(hashlib.sha256(name.encode()).digest()[:8], "big", signed=True)
+    if connection.in_atomic_block:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_xact_lock(%s)", [lock_id])
+        yield
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_lock(%s)", [lock_id])
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_unlock(%s)", [lock_id])
+
+
+def client_scope(request):
+    """Return the scope keys are unique in: the path and the user or client IP.
+
+    Anonymous clients behind one address share a scope, so their keys
+    should be globally unique, such as UUIDs.
+    """
+    if request.user and request.user.is_authenticated:
+        client = request.user.pk
+    else:
+        client = f"ip:{BaseThrottle().get_ident(request)}"
+    return f"{request.path}:{client}"
+
+
+def request_fingerprint(request):
+    """Return a keyed digest of the parsed request payload.
+
+    Payloads can hold passwords, so a plain hash would let anyone reading
+    the table guess them offline.
+    """
+    payload = json.dumps(request.data, sort_keys=True, default=str)
+    return salted_hmac(
+        "core.idempotency.request_fingerprint", payload, algorithm="sha256"
+    ).hexdigest()
+
+
+class IdempotentCreateMixin:
+    """Replay the first response of a POST repeated with the same key.
+
+    Concurrent duplicates wait on an advisory lock for the first request
+    and then replay its stored response instead of running again.
+    Responses are kept for IDEMPOTENCY_KEY_TTL_SECONDS; server errors are
+    not stored so that a retry runs again.
+    """
+
+    def create(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return super().create(request, *args, **kwargs)
+        if len(key) > IdempotencyKey._meta.get_field("key").max_length:
+            raise ValidationError({HEADER: _("Idempotency key is too long.")})
+
+        scope = client_scope(request)
+        fingerprint = request_fingerprint(request)
+        with advisory_lock(f"idempotency:{scope}:{key}"):
+            record = IdempotencyKey.objects.filter(
+                scope=scope, key=key, expires_at__gt=timezone.now()
+            ).first()
+            if record is not None:
+                return self._replay(record, fingerprint)
+
+            response = super().create(request, *args, **kwargs)
+            if response.status_code < status.HTTP_500_INTERNAL_SERVER_ERROR:
+                IdempotencyKey.objects.update_or_create(
+                    scope=scope,
+                    key=key,
+                    defaults={
+                        "request_hash": fingerprint,
+                        "status_code": response.status_code,
+                        "response_body": response.data,
+                        "expires_at": timezone.now()
+                        + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL_SECONDS),
+                    },
+                )
+            return response
+
+    def _replay(self, record, fingerprint):
+        """Return the stored response of a repeated request."""
+        if record.request_hash != fingerprint:
+            return Response(
+                {"detail": _("Idempotency key was already used with another payload.")},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+        return Response(
+            record.response_body,
+            status=record.status_code,
+            headers={"Idempotent-Replayed": "true"},
+        )
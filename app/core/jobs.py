@@ -0,0 +1,128 @@
+"""
+Database-backed background jobs.
+
+Jobs are rows in core_job. Workers (the run_worker command) claim them
+with SELECT ... FOR UPDATE SKIP LOCKED, so any number of workers can poll
+the table without a broker and without handing a job out twice.
+"""
+
+import logging
+import random
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from core.models import Job
+
+logger = logging.getLogger(__name__)
+
+_tasks = {}
+
+
+def task(name):
+    """Register a function as the job with the given name."""
+    def register(func):
+        _tasks[name] = func
+        return func
+    return register
+
+
+def enqueue(name, payload=None, user=None, run_at=None, max_attempts=None):
+    """Queue a job.
+
+    The job becomes visible to workers when the current transaction
+    commits, so it never runs against uncommitted data.
+    """
+    if name not in _tasks:
+        raise ValueError(f"Unknown job {name!r}.")
+    return Job.objects.create(
+        name=name,
+        payload=payload or {},
+        user=user,
+        run_at=run_at or timezone.now(),
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+    )
+
+
+def claim(limit=1):
+    """Mark up to limit due jobs as running and return them.
+
+    Running jobs whose lock is older than JOB_LOCK_TIMEOUT_SECONDS belonged
+    to a worker that died and are claimed again.
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.JOB_LOCK_TIMEOUT_SECONDS)
+    with transaction.atomic():
+        jobs = list(
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(status=Job.QUEUED, run_at__lte=now)
+                | Q(status=Job.RUNNING, locked_at__lt=stale)
+            )
+            .order_by("run_at", "id")[:limit]
+        )
+        if jobs:
+            Job.objects.filter(pk__in=[job.pk for job in jobs]).update(
+                status=Job.RUNNING, locked_at=now, attempts=F("attempts") + 1
+            )
+    for job in jobs:
+        job.status, job.locked_at, job.attempts = Job.RUNNING, now, job.attempts + 1
+    return jobs
+
+
+def retry_delay(attempts):
+    """Return the backoff before retrying a job that failed attempts times."""
+    delay = min(
+        settings.JOB_RETRY_BACKOFF_SECONDS * 2 ** (attempts - 1),
+        settings.JOB_RETRY_BACKOFF_MAX_SECONDS,
+    )
+    # Jitter keeps jobs that failed together from retrying together.
+    return timedelta(seconds=delay * random.uniform(0.5, 1.0))
+
+
+def run_job(job):
+    """Run a claimed job and record its outcome."""
+    try:
+        func = _tasks.get(job.name)
+        if func is None:
+            raise LookupError(f"Unknown job {job.name!r}.")
+        result = func(**job.payload)
+    except Exception as exc:
+        logger.exception("Job %s failed on attempt %s", job, job.attempts)
+        error = "".join(traceback.format_exception_only(type(exc), exc)).strip()
+        if job.attempts < job.max_attempts:
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.QUEUED,
+                run_at=timezone.now() + retry_delay(job.attempts),
+                locked_at=None,
+                error=error,
+            )
+        else:
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.FAILED, locked_at=None, error=error, finished_at=timezone.now()
+            )
+        return
+
+    Job.objects.filter(pk=job.pk).update(
+        status=Job.SUCCEEDED, locked_at=None, result=result, error="", finished_at=timezone.now()
+    )
+
+
+def work(stop, poll_interval, once=False):
+    """Claim and run jobs until stop is set, or the queue is empty if once."""
+    try:
+        while not stop.is_set():
+            jobs = claim()
+            if not jobs:
+                if once:
+                    break
+                stop.wait(poll_interval)
+                continue
+            for job in jobs:
+                run_job(job)
+    finally:
+        connections.close_all()
@@ -0,0 +1,58 @@
+"""
+Django command to measure the cost of the configured password hashers.
+"""
+
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, get_hashers
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    """Time one password hash per hasher and iteration count."""
+
+    help = "Benchmark the hashers in PASSWORD_HASHERS."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--iterations",
+            type=int,
+            nargs="+",
+            help="PBKDF2 iteration counts to try, defaults to the configured one.",
+        )
+        parser.add_argument(
+            "--rounds",
+            type=int,
+            default=5,
+            help="Number of hashes timed per configuration.",
+        )
+
+    def handle(self, *args, **options):
+        """Entry point for the command"""
+        iteration_counts = options["iterations"] or [settings.PASSWORD_HASH_ITERATIONS]
+        for hasher in get_hashers():
+            if isinstance(hasher, PBKDF2PasswordHasher):
+                for iterations in iteration_counts:
+                    label = f"{hasher.algorithm} x{iterations}"
+                    self._time(hasher, label, options, iterations=iterations)
+            else:
+                self._time(hasher, hasher.algorithm, options)
+
+    def _time(self, hasher, label, options, **kwargs):
+        """Time hashing a password with a hasher and report the cost."""
+        timings = []
+        for _ in range(options["rounds"]):
+            try:
+                salt = hasher.salt()
+                started = time.perf_counter()
+                hasher.encode("benchmark-password", salt, **kwargs)
+            except ValueError as exc:
+                # Raised by hashers whose optional library is not installed.
+                self.stdout.write(self.style.WARNING(f"{label:<36} skipped: {exc}"))
+                return
+            timings.append(time.perf_counter() - started)
+        best = min(timings)
+        self.stdout.write(
+            f"{label:<36} {best * 1000:9.2f} ms/hash {1 / best:9.1f} hashes/s per core"
+        )
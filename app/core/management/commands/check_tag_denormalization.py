@@ -0,0 +1,58 @@
+"""
+Django command to verify and repair the denormalized tag columns.
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+
+from core.models import Recipe, Tag
+
+
+class Command(BaseCommand):
+    """Compare Recipe.tags_snapshot and Tag.recipe_count with the links."""
+
+    help = "Verify Recipe.tags_snapshot and Tag.recipe_count, optionally repairing drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--repair",
+            action="store_true",
+            help="Rebuild the rows that have drifted.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=10000,
+            help="Number of ids scanned per query.",
+        )
+
+    def handle(self, *args, **options):
+        """Entry point for the command"""
+        checks = (
+            ("recipe tag snapshots", Recipe, Recipe.objects.stale_tag_snapshots,
+             Recipe.objects.refresh_tag_snapshots),
+            ("tag recipe counts", Tag, Tag.objects.stale_recipe_counts,
+             Tag.objects.refresh_recipe_counts),
+        )
+        for label, model, find_stale, refresh in checks:
+            stale = self._scan(model, find_stale, refresh, options)
+            if not stale:
+                self.stdout.write(self.style.SUCCESS(f"All {label} are consistent."))
+            elif options["repair"]:
+                self.stdout.write(self.style.SUCCESS(f"Repaired {stale} {label}."))
+            else:
+                self.stdout.write(self.style.WARNING(f"Found {stale} stale {label}."))
+
+    def _scan(self, model, find_stale, refresh, options):
+        """Walk the table in id batches and return the number of stale rows."""
+        batch_size = options["batch_size"]
+        last_id = model.objects.aggregate(last_id=Max("id"))["last_id"] or 0
+        stale = 0
+        for start in range(0, last_id + 1, batch_size):
+            with transaction.atomic():
+                ids = find_stale(start, start + batch_size)
+                if ids and options["repair"]:
+                    refresh(ids)
+            stale += len(ids)
+        return stale
@@ -0,0 +1,42 @@
+"""
+Django command to export recipes as CSV.
+"""
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core.export import copy_recipes
+
+
+class Command(BaseCommand):
+    """Write recipes as CSV using COPY ... TO STDOUT."""
+
+    help = "Export recipes, with their tags, as CSV."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            help="Only export the recipes of the user with this email.",
+        )
+        parser.add_argument(
+            "--output",
+            default="-",
+            help="File to write to; defaults to standard output.",
+        )
+
+    def handle(self, *args, **options):
+        """Entry point for the command"""
+        user_id = None
+        if options["user"]:
+            try:
+                user_id = get_user_model().objects.get(email=options["user"]).id
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"No user with email {options['user']}.")
+
+        if options["output"] == "-":
+            # Bypass OutputWrapper, which would add line endings to chunks.
+            copy_recipes(self.stdout._out, user_id)
+            return
+        with open(options["output"], "wb") as file:
+            copy_recipes(file, user_id)
+        self.stderr.write(self.style.SUCCESS(f"Exported recipes to {options['output']}."))
@@ -0,0 +1,37 @@
+"""
+Django command to delete API tokens past their expiry.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import AuthToken
+
+
+class Command(BaseCommand):
+    """Delete expired API tokens in bounded batches."""
+
+    help = "Delete tokens unused for longer than AUTH_TOKEN_TTL_SECONDS."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=10000,
+            help="Number of tokens deleted per statement.",
+        )
+
+    def handle(self, *args, **options):
+        """Entry point for the command"""
+        horizon = timezone.now() - timedelta(seconds=settings.AUTH_TOKEN_TTL_SECONDS)
+        expired = AuthToken.objects.filter(last_used__lt=horizon)
+        total = 0
+        while True:
+            keys = list(expired.values_list("key", flat=True)[:options["batch_size"]])
+            if not keys:
+                break
+            total += AuthToken.objects.filter(key__in=keys).delete()[0]
+        self.stdout.write(self.style.SUCCESS(f"Deleted {total} expired tokens."))
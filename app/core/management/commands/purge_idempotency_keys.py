@@ -0,0 +1,33 @@
+"""
+Django command to delete expired idempotency keys.
+"""
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    """Delete expired idempotency keys in bounded batches."""
+
+    help = "Delete idempotency keys past their expiry."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=10000,
+            help="Number of keys deleted per statement.",
+        )
+
+    def handle(self, *args, **options):
+        """Entry point for the command"""
+        expired = IdempotencyKey.objects.filter(expires_at__lte=timezone.now())
+        total = 0
+        while True:
+            ids = list(expired.values_list("id", flat=True)[:options["batch_size"]])
+            if not ids:
+                break
+            total += IdempotencyKey.objects.filter(id__in=ids).delete()[0]
+        self.stdout.write(self.style.SUCCESS(f"Deleted {total} idempotency keys."))
@@ -0,0 +1,37 @@
+"""
+Django command to delete tombstones older than the sync retention.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import Tombstone
+
+
+class Command(BaseCommand):
+    """Delete expired tombstones in bounded batches."""
+
+    help = "Delete tombstones older than SYNC_TOMBSTONE_RETENTION_DAYS."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=10000,
+            help="Number of tombstones deleted per statement.",
+        )
+
+    def handle(self, *args, **options):
+        """Entry point for the command"""
+        horizon = timezone.now() - timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS)
+        expired = Tombstone.objects.filter(deleted_at__lt=horizon)
+        total = 0
+        while True:
+            ids = list(expired.values_list("id", flat=True)[:options["batch_size"]])
+            if not ids:
+                break
+            total += Tombstone.objects.filter(id__in=ids).delete()[0]
+        self.stdout.write(self.style.SUCCESS(f"Deleted {total} tombstones."))
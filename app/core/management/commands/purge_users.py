@@ -0,0 +1,39 @@
+"""
+Django command to purge users whose deletion was requested.
+"""
+
+from django.core.management.base import BaseCommand
+
+from core.models import User
+from core.purge import purge_user
+
+
+class Command(BaseCommand):
+    """Delete deactivated users and their data in bounded batches."""
+
+    help = "Purge users whose deletion was requested, reporting progress."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=10000,
+            help="Number of rows deleted per statement.",
+        )
+        parser.add_argument(
+            "--user",
+            help="Only purge the user with this email.",
+        )
+
+    def handle(self, *args, **options):
+        """Entry point for the command"""
+        users = User.objects.filter(purge_requested_at__isnull=False)
+        if options["user"]:
+            users = users.filter(email=options["user"])
+
+        for user_id, email in users.order_by("purge_requested_at").values_list("id", "email"):
+            def progress(label, deleted):
+                self.stdout.write(f"{email}: deleted {deleted} {label}")
+
+            total = purge_user(user_id, options["batch_size"], progress)
+            self.stdout.write(self.style.SUCCESS(f"Purged {email} ({total} rows)."))
@@ -0,0 +1,86 @@
+"""
+Django command to run background jobs.
+"""
+
+import multiprocessing
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core.jobs import work
+
+
+def _work_in_child(stop, poll_interval, once):
+    # Ctrl-C reaches the whole process group; the parent relays it via stop.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    work(stop, poll_interval, once)
+
+
+class Command(BaseCommand):
+    """Claim and run queued jobs from core_job."""
+
+    help = "Run background jobs with the given concurrency."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=1,
+            help="Number of jobs run at the same time.",
+        )
+        parser.add_argument(
+            "--mode",
+            choices=("threads", "processes"),
+            default="threads",
+            help="Run jobs on threads or on forked processes.",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=settings.JOB_POLL_INTERVAL_SECONDS,
+            help="Seconds to wait when the queue is empty.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit once the queue is empty.",
+        )
+
+    def handle(self, *args, **options):
+        """Entry point for the command"""
+        processes = options["mode"] == "processes"
+        context = multiprocessing.get_context("fork")
+        stop = context.Event() if processes else threading.Event()
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, lambda *args: stop.set())
+        args = (stop, options["poll_interval"], options["once"])
+        self.stdout.write(
+            f"Running jobs on {options['concurrency']} {options['mode']}."
+        )
+
+        if processes:
+            # Children must not share the parent's database connections.
+            connections.close_all()
+            workers = [
+                context.Process(target=_work_in_child, args=args)
+                for _ in range(options["concurrency"])
+            ]
+        else:
+            workers = [
+                threading.Thread(target=work, args=args)
+                for _ in range(options["concurrency"])
+            ]
+
+        for worker in workers:
+            worker.start()
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            stop.set()
+            for worker in workers:
+                worker.join()
+        self.stdout.write(self.style.SUCCESS("Worker stopped."))
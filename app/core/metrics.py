@@ -0,0 +1,302 @@
+"""
+Process metrics in the Prometheus text format, shared across workers.
+
+Each process records into its own in-memory registry and writes it to
+METRICS_DIR/<pid>.json at most once per METRICS_FLUSH_SECONDS, replacing
+the file atomically. The /metrics view merges the files of every process,
+so a scrape sees all gunicorn workers whichever one serves it. Files of
+exited processes are folded into METRICS_DIR/dead.json, so counters never
+go backwards while the directory stays one file per live process; their
+gauges are dropped.
+"""
+
+import fcntl
+import json
+import os
+import resource
+import threading
+import time
+
+from django.conf import settings
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+# name: (type, help, label names, histogram buckets)
+METRICS = {
+    "http_request_duration_seconds": (
+        "histogram", "Request latency by route.", ("route", "method", "status"),
+        LATENCY_BUCKETS,
+    ),
+    "http_response_size_bytes": (
+        "histogram", "Response body size by route.", ("route",), SIZE_BUCKETS,
+    ),
+    "db_queries_per_request": (
+        "histogram", "Database queries run per request.", ("route",),
+        QUERY_COUNT_BUCKETS,
+    ),
+    "db_query_duration_seconds": (
+        "histogram", "Database time spent per request.", ("route",), LATENCY_BUCKETS,
+    ),
+    "db_statement_timeouts_total": (
+        "counter", "Statements cancelled by their route's timeout.", ("route",), None,
+    ),
+    "auth_token_cache_total": (
+        "counter", "Token authentication cache lookups.", ("result",), None,
+    ),
+    "compression_bytes_total": (
+        "counter", "Response bytes before and after compression.",
+        ("encoding", "stage"), None,
+    ),
+    "compression_cache_total": (
+        "counter", "Compressed body cache lookups.", ("result",), None,
+    ),
+    "throttle_requests_total": (
+        "counter", "Rate limited requests by throttle scope.", ("scope", "result"), None,
+    ),
+    "throttle_capacity_requests": (
+        "gauge", "Burst size of each throttle scope.", ("scope",), None,
+    ),
+    "throttle_refill_per_second": (
+        "gauge", "Requests per second refilled in each throttle scope.", ("scope",), None,
+    ),
+    "process_resident_memory_bytes": (
+        "gauge", "Resident memory of the worker process.", ("pid",), None,
+    ),
+}
+
+
+class Registry:
+    """Metric values recorded by one process."""
+
+    def __init__(self):
+        self.pid = os.getpid()
+        self.values = {}
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.flushed = 0.0
+
+    def inc(self, name, labels=(), value=1):
+        key = f"{name}|{json.dumps(labels)}"
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + value
+        self.maybe_flush()
+
+    def observe(self, name, value, labels=()):
+        buckets = METRICS[name][3]
+        key = f"{name}|{json.dumps(labels)}"
+        with self.lock:
+            # Per-bucket counts, then sum and count.
+            state = self.values.setdefault(key, [0] * (len(buckets) + 2))
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+        self.maybe_flush()
+
+    def maybe_flush(self, force=False):
+        """Write the values to this process's file if the interval passed."""
+        now = time.monotonic()
+        if not force and now - self.flushed < settings.METRICS_FLUSH_SECONDS:
+            return
+        if not self.flush_lock.acquire(blocking=force):
+            return
+        try:
+            self.flushed = now
+            with self.lock:
+                data = json.dumps(self.values)
+            os.makedirs(settings.METRICS_DIR, exist_ok=True)
+            _write(os.path.join(settings.METRICS_DIR, f"{self.pid}.json"), data)
+        finally:
+            self.flush_lock.release()
+
+
+def _write(path, data):
+    """Replace a file atomically."""
+    with open(f"{path}.tmp", "w") as file:
+        file.write(data)
+    os.replace(f"{path}.tmp", path)
+
+
+def _read(path):
+    """Return the values in a file, or None if it is gone or unreadable."""
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+_registry = None
+_registry_lock = threading.Lock()
+# fcntl locks are held by the process, so threads also need one.
+_fold_lock = threading.Lock()
+
+
+def registry():
+    """Return the registry of the current process."""
+    global _registry
+    if _registry is None or _registry.pid != os.getpid():
+        # Forked workers start their own registry.
+        with _registry_lock:
+            if _registry is None or _registry.pid != os.getpid():
+                _registry = Registry()
+    return _registry
+
+
+def inc(name, labels=(), value=1):
+    """Increment a counter."""
+    registry().inc(name, labels, value)
+
+
+def observe(name, value, labels=()):
+    """Record a value in a histogram."""
+    registry().observe(name, value, labels)
+
+
+def resident_memory(pid=None):
+    """Return the resident memory of a process in bytes, or None."""
+    try:
+        with open(f"/proc/{pid or 'self'}/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        if pid is not None and pid != os.getpid():
+            return None
+        # Peak rather than current usage, in KiB on Linux.
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _add(merged, values):
+    for key, value in values.items():
+        if isinstance(value, list):
+            total = merged.setdefault(key, [0] * len(value))
+            merged[key] = [a + b for a, b in zip(total, value)]
+        else:
+            merged[key] = merged.get(key, 0) + value
+
+
+def _fold(pids):
+    """Add the files of exited processes to dead.json and remove them."""
+    directory = settings.METRICS_DIR
+    with _fold_lock:
+        fd = os.open(os.path.join(directory, ".lock"), os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.lockf(fd, fcntl.LOCK_EX)
+            dead_path = os.path.join(directory, "dead.json")
+            totals = _read(dead_path) or {}
+            folded = []
+            for pid in pids:
+                path = os.path.join(directory, f"{pid}.json")
+                values = _read(path)
+                # Gone if another scrape folded it first.
+                if values is not None:
+                    _add(totals, values)
+                    folded.append(path)
+            if folded:
+                _write(dead_path, json.dumps(totals))
+                for path in folded:
+                    os.remove(path)
+        finally:
+            # Closing the file releases the lock.
+            os.close(fd)
+
+
+def _merge():
+    """Return the values of every process, summed, and the live pids."""
+    merged, live, dead = {}, [], []
+    try:
+        names = os.listdir(settings.METRICS_DIR)
+    except FileNotFoundError:
+        names = []
+    for filename in names:
+        pid = filename[:-len(".json")]
+        if not filename.endswith(".json") or not pid.isdigit():
+            continue
+        pid = int(pid)
+        (live if _alive(pid) else dead).append(pid)
+    if dead:
+        _fold(dead)
+    paths = [os.path.join(settings.METRICS_DIR, f"{pid}.json") for pid in live]
+    for path in paths + [os.path.join(settings.METRICS_DIR, "dead.json")]:
+        values = _read(path)
+        if values is not None:
+            _add(merged, values)
+    return merged, live
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (
+        str(value).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+        for _, value in pairs
+    )
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _number(value):
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def render():
+    """Return the merged metrics of all processes in the text format."""
+    from core.throttling import rate_limits
+
+    current = registry()
+    current.maybe_flush(force=True)
+    merged, live = _merge()
+    memory = {(str(pid),): resident_memory(pid) for pid in set(live) | {current.pid}}
+    limits = rate_limits()
+    gauges = {
+        "process_resident_memory_bytes": {
+            pid: value for pid, value in memory.items() if value is not None
+        },
+        "throttle_capacity_requests": {
+            (scope,): capacity for scope, (capacity, _) in limits.items()
+        },
+        "throttle_refill_per_second": {
+            (scope,): refill for scope, (_, refill) in limits.items()
+        },
+    }
+
+    by_name = {}
+    for key, value in merged.items():
+        name, labels = key.split("|", 1)
+        by_name.setdefault(name, []).append((tuple(json.loads(labels)), value))
+
+    lines = []
+    for name, (kind, help_text, label_names, buckets) in METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        if kind == "gauge":
+            for labels, value in sorted(gauges.get(name, {}).items()):
+                lines.append(f"{name}{_labels(label_names, labels)} {_number(value)}")
+            continue
+        for labels, value in sorted(by_name.get(name, [])):
+            if kind == "counter":
+                lines.append(f"{name}{_labels(label_names, labels)} {_number(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(buckets, value):
+                cumulative += count
+                le = _labels(label_names, labels, [("le", _number(float(bound)))])
+                lines.append(f"{name}_bucket{le} {cumulative}")
+            le = _labels(label_names, labels, [("le", "+Inf")])
+            lines.append(f"{name}_bucket{le} {value[-1]}")
+            lines.append(f"{name}_sum{_labels(label_names, labels)} {_number(value[-2])}")
+            lines.append(f"{name}_count{_labels(label_names, labels)} {value[-1]}")
+    return "\n".join(lines) + "\n"
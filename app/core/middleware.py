@@ -0,0 +1,197 @@
+"""
+Middleware for the API.
+"""
+
+import logging
+import time
+
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.messages.middleware import MessageMiddleware
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.db import connection, transaction
+from django.urls import Resolver404, resolve
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+from core import metrics, timeouts
+from core.compression import compress_cached, compress_stream, negotiate_encoding
+from core.slow_queries import current_request
+
+logger = logging.getLogger(__name__)
+
+
+def is_api_request(request):
+    """Return whether the request targets the token authenticated API."""
+    return request.path_info.startswith(settings.API_PATH_PREFIX)
+
+
+class APIExemptMixin:
+    """Skip a middleware for API requests, keeping it for admin and docs."""
+
+    def __call__(self, request):
+        if is_api_request(request):
+            return self.get_response(request)
+        return super().__call__(request)
+
+
+class APISessionMiddleware(APIExemptMixin, SessionMiddleware):
+    """Session middleware that never loads or saves sessions for the API."""
+
+
+class APIAuthenticationMiddleware(APIExemptMixin, AuthenticationMiddleware):
+    """Authentication middleware that leaves API auth to DRF."""
+
+
+class APIMessageMiddleware(APIExemptMixin, MessageMiddleware):
+    """Message middleware that never touches message storage for the API."""
+
+
+class MetricsMiddleware:
+    """Record latency, response size and database work per route."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = {"count": 0, "duration": 0.0}
+
+        def count_query(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                queries["count"] += 1
+                queries["duration"] += time.perf_counter() - started
+
+        started = time.perf_counter()
+        with connection.execute_wrapper(count_query):
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+
+        match = request.resolver_match
+        route = match.view_name if match else "unmatched"
+        metrics.observe(
+            "http_request_duration_seconds",
+            duration,
+            (route, request.method, str(response.status_code)),
+        )
+        metrics.observe("db_queries_per_request", queries["count"], (route,))
+        metrics.observe("db_query_duration_seconds", queries["duration"], (route,))
+        if not response.streaming:
+            metrics.observe("http_response_size_bytes", len(response.content), (route,))
+        return response
+
+
+class RequestContextMiddleware:
+    """Make the current request available to slow query capture."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = current_request.set(request)
+        try:
+            return self.get_response(request)
+        finally:
+            current_request.reset(token)
+
+
+class StatementTimeoutMiddleware:
+    """Run views under their route's statement timeout.
+
+    Cancelled statements become a 503 with Retry-After instead of a 500.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            route = resolve(request.path_info).view_name
+        except Resolver404:
+            return self.get_response(request)
+        if timeouts.timeout_for(route) is None or connection.in_atomic_block:
+            return self.get_response(request)
+        request.statement_timeout_route = route
+        with timeouts.statement_timeout(route):
+            return self.get_response(request)
+
+    def process_exception(self, request, exception):
+        route = getattr(request, "statement_timeout_route", None)
+        if route is None:
+            return None
+        # The exception ends here, so the transaction would otherwise commit.
+        transaction.set_rollback(True)
+        if timeouts.is_query_canceled(exception):
+            return timeouts.timeout_response(route)
+        return None
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """Compress API responses with brotli or gzip.
+
+    Bodies below COMPRESSION_MIN_SIZE are sent as is. Views serving a
+    cached body mark the response with compression.cache_compressed_as,
+    and its compressed bytes are cached next to it, so repeat hits skip
+    the compression work. Streamed bodies are compressed chunk by chunk.
+    """
+
+    def process_response(self, request, response):
+        if not is_api_request(request) or response.has_header("Content-Encoding"):
+            return response
+        if not response.streaming and len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        encoding = negotiate_encoding(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if not settings.COMPRESSION_STREAMING:
+                return response
+            response.streaming_content = compress_stream(
+                response.streaming_content, encoding
+            )
+            del response["Content-Length"]
+        else:
+            started = time.perf_counter()
+            key = getattr(response, "compression_cache_key", None)
+            if key is not None:
+                # Renderings of one entry differ by media type parameters,
+                # such as indent=4.
+                media_type = getattr(response, "accepted_media_type", None) or ""
+                key = f"{key}|{media_type}|{response.get('Content-Type', '')}"
+            compressed, cache_hit = compress_cached(response.content, encoding, key)
+            duration = time.perf_counter() - started
+            if len(compressed) >= len(response.content):
+                return response
+
+            ratio = len(compressed) / len(response.content)
+            self._report(request, response, encoding, ratio, duration, cache_hit)
+            response.content = compressed
+            response["Content-Length"] = str(len(compressed))
+
+        # A strong ETag no longer matches the compressed bytes.
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response["ETag"] = "W/" + etag
+        response["Content-Encoding"] = encoding
+        return response
+
+    def _report(self, request, response, encoding, ratio, duration, cache_hit):
+        """Expose the compression ratio and CPU time of a response."""
+        metrics.inc("compression_bytes_total", (encoding, "in"), len(response.content))
+        metrics.inc("compression_bytes_total", (encoding, "out"), round(len(response.content) * ratio))
+        metrics.inc("compression_cache_total", ("hit" if cache_hit else "miss",))
+        description = f"{encoding} ratio={ratio:.3f}{' cached' if cache_hit else ''}"
+        timing = f'compress;dur={duration * 1000:.3f};desc="{description}"'
+        if response.has_header("Server-Timing"):
+            timing = f"{response['Server-Timing']}, {timing}"
+        response["Server-Timing"] = timing
+        logger.debug(
+            "Compressed %s with %s: ratio %.3f in %.3fms%s",
+            request.path, encoding, ratio, duration * 1000,
+            " (cached)" if cache_hit else "",
+        )
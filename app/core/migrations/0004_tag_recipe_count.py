@@ -0,0 +1,30 @@
+# Generated by Django 3.2.25 on 2026-10-19 10:34
+
+from django.db import migrations, models
+
+
+BACKFILL_RECIPE_COUNT = """
+    UPDATE core_tag SET recipe_count = counts.total
+    FROM (
+        SELECT tag_id, COUNT(*) AS total
+        FROM core_recipe_tags
+        GROUP BY tag_id
+    ) AS counts
+    WHERE core_tag.id = counts.tag_id
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_auto_20250212_0633'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tag',
+            name='recipe_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunSQL(BACKFILL_RECIPE_COUNT, migrations.RunSQL.noop),
+    ]
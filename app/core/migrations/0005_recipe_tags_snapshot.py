@@ -0,0 +1,31 @@
+# Generated by Django 3.2.25 on 2026-10-19 10:35
+
+from django.db import migrations, models
+
+
+BACKFILL_TAGS_SNAPSHOT = """
+    UPDATE core_recipe SET tags_snapshot = COALESCE((
+        SELECT jsonb_agg(
+            jsonb_build_object('id', t.id, 'name', t.name) ORDER BY rt.id
+        )
+        FROM core_recipe_tags rt
+        JOIN core_tag t ON t.id = rt.tag_id
+        WHERE rt.recipe_id = core_recipe.id
+    ), '[]'::jsonb)
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_tag_recipe_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='tags_snapshot',
+            field=models.JSONField(default=list, editable=False),
+        ),
+        migrations.RunSQL(BACKFILL_TAGS_SNAPSHOT, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.2.25 on 2026-10-19 10:47
+
+from django.db import migrations
+
+
+# Django 3.2 cannot render OpClass() inside an expression index, so these
+# are written by hand. CONCURRENTLY keeps the tables writable while they
+# are built.
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('core', '0008_authtoken'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS recipe_upper_title_idx '
+            'ON core_recipe (UPPER(title) text_pattern_ops)',
+            'DROP INDEX CONCURRENTLY IF EXISTS recipe_upper_title_idx',
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS tag_upper_name_idx '
+            'ON core_tag (UPPER(name) text_pattern_ops)',
+            'DROP INDEX CONCURRENTLY IF EXISTS tag_upper_name_idx',
+        ),
+    ]
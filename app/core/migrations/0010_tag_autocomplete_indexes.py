@@ -0,0 +1,61 @@
+# Generated by Django 3.2.25 on 2026-10-19 11:32
+
+from django.db import migrations, transaction
+from django.db.utils import ProgrammingError
+
+
+def install_pg_trgm(cursor):
+    """Return whether pg_trgm is installed, installing it if allowed.
+
+    Roles that may not create extensions skip it; fuzzy tag search then
+    stays off until pg_trgm is installed by a superuser.
+    """
+    cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+    if cursor.fetchone() is not None:
+        return True
+    cursor.execute(
+        "SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'"
+    )
+    if cursor.fetchone() is None:
+        return False
+    try:
+        with transaction.atomic(using=cursor.db.alias):
+            cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    except ProgrammingError:
+        # Insufficient privilege.
+        return False
+    return True
+
+
+def create_trigram_index(apps, schema_editor):
+    """Build the fuzzy tag search index where pg_trgm is available."""
+    with schema_editor.connection.cursor() as cursor:
+        if not install_pg_trgm(cursor):
+            return
+        cursor.execute(
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS tag_name_trgm_idx '
+            'ON core_tag USING gin (name gin_trgm_ops)'
+        )
+
+
+def drop_trigram_index(apps, schema_editor):
+    schema_editor.execute('DROP INDEX CONCURRENTLY IF EXISTS tag_name_trgm_idx')
+
+
+# See 0009 for why these indexes are written by hand.
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('core', '0009_admin_search_indexes'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS tag_user_lower_name_idx '
+            'ON core_tag (user_id, LOWER(name) text_pattern_ops)',
+            'DROP INDEX CONCURRENTLY IF EXISTS tag_user_lower_name_idx',
+        ),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
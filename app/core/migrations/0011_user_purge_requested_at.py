@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-19 10:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_tag_autocomplete_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='purge_requested_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 3.2.25 on 2026-10-19 12:10
+
+from django.db import migrations
+
+
+def copy_legacy_tokens(apps, schema_editor):
+    """Copy DRF authtoken tokens into AuthToken so clients stay logged in.
+
+    Copied tokens keep their creation time and start their expiry window
+    at the migration. Tokens already copied are left alone, so this can
+    be run again.
+    """
+    schema_editor.execute(
+        'INSERT INTO core_authtoken (key, user_id, created, last_used) '
+        'SELECT key, user_id, created, now() FROM authtoken_token '
+        'ON CONFLICT (key) DO NOTHING'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authtoken', '0003_tokenproxy'),
+        ('core', '0012_job'),
+    ]
+
+    operations = [
+        migrations.RunPython(copy_legacy_tokens, migrations.RunPython.noop),
+    ]
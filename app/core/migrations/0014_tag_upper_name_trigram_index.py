@@ -0,0 +1,44 @@
+# Generated by Django 3.2.25 on 2026-10-19 12:25
+
+from django.db import migrations
+
+
+def has_pg_trgm(schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        return cursor.fetchone() is not None
+
+
+def create_upper_trigram_index(apps, schema_editor):
+    """Index UPPER(name), which ?q= tag searches match on."""
+    if not has_pg_trgm(schema_editor):
+        return
+    schema_editor.execute(
+        'CREATE INDEX CONCURRENTLY IF NOT EXISTS tag_upper_name_trgm_idx '
+        'ON core_tag USING gin (UPPER(name) gin_trgm_ops)'
+    )
+    schema_editor.execute('DROP INDEX CONCURRENTLY IF EXISTS tag_name_trgm_idx')
+
+
+def create_name_trigram_index(apps, schema_editor):
+    if has_pg_trgm(schema_editor):
+        schema_editor.execute(
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS tag_name_trgm_idx '
+            'ON core_tag USING gin (name gin_trgm_ops)'
+        )
+    schema_editor.execute('DROP INDEX CONCURRENTLY IF EXISTS tag_upper_name_trgm_idx')
+
+
+# icontains compiles to UPPER(name) LIKE UPPER(%s), which an index on name
+# cannot serve. See 0009 for why the index is written by hand.
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('core', '0013_copy_legacy_tokens'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_upper_trigram_index, create_name_trigram_index),
+    ]
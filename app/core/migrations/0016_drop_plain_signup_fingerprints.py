@@ -0,0 +1,20 @@
+# Generated by Django 3.2.25 on 2026-10-19 12:55
+
+from django.db import migrations
+
+
+def drop_signup_keys(apps, schema_editor):
+    """Delete stored signups, whose plain payload hashes cover passwords."""
+    IdempotencyKey = apps.get_model('core', 'IdempotencyKey')
+    IdempotencyKey.objects.filter(scope__startswith='/api/user/create/').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_streamticket'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_signup_keys, migrations.RunPython.noop),
+    ]
@@ -2,7 +2,12 @@
 Database models for the core app.
 """
 
+import binascii
+import os
+from datetime import timedelta
+
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 
 from django.contrib.auth.models import (
     AbstractBaseUser,
@@ -10,7 +15,8 @@ from django.contrib.auth.models import (
     PermissionsMixin,
 )
 
-from django.db import models
+from django.db import connection, models
+from django.utils import timezone
 
 
 class UserManager(BaseUserManager):
@@ -42,12 +48,105 @@ class User(AbstractBaseUser, PermissionsMixin):
     name = models.CharField(max_length=255)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    # Set when the user asked to be deleted; core.purge removes their data.
+    purge_requested_at = models.DateTimeField(null=True, blank=True, editable=False)
 
     objects = UserManager()
 
     USERNAME_FIELD = "email"
 
 
+# JSON array of {"id", "name"} for a recipe's tags, in link order.
+TAG_SNAPSHOT_SQL = """
+    COALESCE((
+        SELECT jsonb_agg(
+            jsonb_build_object('id', t.id, 'name', t.name) ORDER BY rt.id
+        )
+        FROM core_recipe_tags rt
+        JOIN core_tag t ON t.id = rt.tag_id
+        WHERE rt.recipe_id = core_recipe.id
+    ), '[]'::jsonb)
+"""
+
+
+class RecipeManager(models.Manager):
+    """Manager for recipes."""
+
+    def refresh_tag_snapshots(self, recipe_ids):
+        """Rebuild Recipe.tags_snapshot for the given recipe ids."""
+        recipe_ids = list(recipe_ids)
+        if not recipe_ids:
+            return 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE core_recipe SET tags_snapshot = {TAG_SNAPSHOT_SQL}, "
+                "updated_at = %s WHERE id = ANY(%s)",
+                [timezone.now(), recipe_ids],
+            )
+            return cursor.rowcount
+
+    def update_returning(self, pk, user, **values):
+        """Update one of a user's recipes with a single UPDATE ... RETURNING.
+
+        Rows already holding the values are not written. Returns the updated
+        recipe, or None when no row was changed.
+        """
+        quote_name = connection.ops.quote_name
+        fields = [self.model._meta.get_field(name) for name in values]
+        assignments = ", ".join(
+            f"{quote_name(field.column)} = %s" for field in fields
+        )
+        changes = " OR ".join(
+            f"{quote_name(field.column)} IS DISTINCT FROM %s" for field in fields
+        )
+        values = [
+            field.get_db_prep_save(values[field.name], connection)
+            for field in fields
+        ]
+        recipes = self.raw(
+            f"UPDATE core_recipe SET {assignments}, updated_at = %s "
+            f"WHERE id = %s AND user_id = %s AND ({changes}) RETURNING *",
+            values + [timezone.now(), pk, user.pk] + values,
+        )
+        return next(iter(recipes), None)
+
+    def similar(self, recipe_id, user_id, limit):
+        """Rank a user's recipes by tag overlap (Jaccard) with a recipe.
+
+        Candidates are found through the tag_id index of the recipe/tag
+        links, so only recipes sharing a tag are looked at. Returns a list
+        of (recipe_id, score), best first.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "WITH target AS ("
+                "  SELECT rt.tag_id FROM core_recipe_tags rt"
+                "  WHERE rt.recipe_id = %s"
+                "), shared AS ("
+                "  SELECT rt.recipe_id, COUNT(*) AS shared"
+                "  FROM core_recipe_tags rt JOIN target USING (tag_id)"
+                "  WHERE rt.recipe_id <> %s GROUP BY rt.recipe_id"
+                ") "
+                "SELECT r.id, s.shared::float / ((SELECT COUNT(*) FROM target)"
+                "  + jsonb_array_length(r.tags_snapshot) - s.shared) AS score "
+                "FROM shared s JOIN core_recipe r ON r.id = s.recipe_id "
+                "WHERE r.user_id = %s ORDER BY score DESC, r.id DESC LIMIT %s",
+                [recipe_id, recipe_id, user_id, limit],
+            )
+            return cursor.fetchall()
+
+    def stale_tag_snapshots(self, start_id, end_id):
+        """Return ids in [start_id, end_id) whose tags_snapshot has drifted."""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT id FROM core_recipe "
+                "WHERE id >= %s AND id < %s "
+                f"AND tags_snapshot IS DISTINCT FROM {TAG_SNAPSHOT_SQL}",
+                [start_id, end_id],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
 class Recipe(models.Model):
     """Profile model for a user."""
 
@@ -59,6 +158,55 @@ class Recipe(models.Model):
     link = models.CharField(max_length=255, blank=True)
 
     tags = models.ManyToManyField("Tag")
+    # Copy of [{"id", "name"}] for the tags, maintained by core.signals so
+    # list reads need no join.
+    tags_snapshot = models.JSONField(default=list, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = RecipeManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "updated_at"], name="recipe_user_updated_at_idx"),
+        ]
+        # Migration 0009 adds recipe_upper_title_idx on
+        # (UPPER(title) text_pattern_ops) for admin prefix searches.
+
+    def __str__(self):
+        return self.title
+
+
+TAG_RECIPE_COUNT_SQL = """
+    (SELECT COUNT(*) FROM core_recipe_tags rt WHERE rt.tag_id = core_tag.id)
+"""
+
+
+class TagManager(models.Manager):
+    """Manager for tags."""
+
+    def refresh_recipe_counts(self, tag_ids):
+        """Recount Tag.recipe_count for the given tag ids."""
+        tag_ids = list(tag_ids)
+        if not tag_ids:
+            return 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE core_tag SET recipe_count = {TAG_RECIPE_COUNT_SQL} "
+                "WHERE id = ANY(%s)",
+                [tag_ids],
+            )
+            return cursor.rowcount
+
+    def stale_recipe_counts(self, start_id, end_id):
+        """Return ids in [start_id, end_id) whose recipe_count has drifted."""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT id FROM core_tag "
+                "WHERE id >= %s AND id < %s "
+                f"AND recipe_count <> {TAG_RECIPE_COUNT_SQL}",
+                [start_id, end_id],
+            )
+            return [row[0] for row in cursor.fetchall()]
 
 
 class Tag(models.Model):
@@ -66,6 +214,173 @@ class Tag(models.Model):
 
     name = models.CharField(max_length=255)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    # Number of recipes using the tag, maintained by core.signals.
+    recipe_count = models.PositiveIntegerField(default=0, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = TagManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "updated_at"], name="tag_user_updated_at_idx"),
+        ]
+        # Migration 0009 adds tag_upper_name_idx on
+        # (UPPER(name) text_pattern_ops) for admin prefix searches, and 0010
+        # adds tag_user_lower_name_idx on (user_id, LOWER(name)
+        # text_pattern_ops) for autocomplete plus, where pg_trgm is
+        # available, the trigram index tag_name_trgm_idx.
 
     def __str__(self):
         return self.name
+
+
+class Tombstone(models.Model):
+    """Record of a deleted recipe or tag, read by the sync endpoint."""
+
+    RECIPE = "recipe"
+    TAG = "tag"
+    KIND_CHOICES = [(RECIPE, "Recipe"), (TAG, "Tag")]
+
+    # No constraint: tombstones are written while a user's rows cascade away.
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+    )
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "deleted_at"], name="tombstone_user_deleted_at_idx"),
+        ]
+
+
+class IdempotencyKey(models.Model):
+    """Stored response of a request sent with an Idempotency-Key header."""
+
+    scope = models.CharField(max_length=255)
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField()
+    response_body = models.JSONField(encoder=DjangoJSONEncoder, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["scope", "key"], name="idempotency_scope_key_uniq"),
+        ]
+
+
+class AuthTokenManager(models.Manager):
+    """Manager for API tokens."""
+
+    def issue(self, user):
+        """Create a new token for a user with a single INSERT."""
+        key = binascii.hexlify(os.urandom(20)).decode()
+        return self.create(key=key, user=user)
+
+
+class AuthToken(models.Model):
+    """API token that expires when unused for AUTH_TOKEN_TTL_SECONDS."""
+
+    key = models.CharField(max_length=40, primary_key=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        related_name="auth_tokens",
+        on_delete=models.CASCADE,
+    )
+    created = models.DateTimeField(auto_now_add=True)
+    last_used = models.DateTimeField(default=timezone.now, db_index=True)
+
+    objects = AuthTokenManager()
+
+    def __str__(self):
+        return self.key
+
+
+class StreamTicketManager(models.Manager):
+    """Manager for event stream tickets."""
+
+    def issue(self, user):
+        """Create a ticket for a user, dropping expired ones."""
+        self.filter(created__lt=self._cutoff()).delete()
+        key = binascii.hexlify(os.urandom(20)).decode()
+        return self.create(key=key, user=user)
+
+    def redeem(self, key):
+        """Return the active user of an unexpired ticket, once."""
+        ticket = self.select_related("user").filter(key=key, created__gte=self._cutoff()).first()
+        # Of concurrent redeemers only one deletes the row.
+        if ticket is None or not self.filter(key=key).delete()[0]:
+            return None
+        return ticket.user if ticket.user.is_active else None
+
+    def _cutoff(self):
+        return timezone.now() - timedelta(seconds=settings.EVENTS_TICKET_SECONDS)
+
+
+class StreamTicket(models.Model):
+    """Single-use credential for opening an event stream from a browser."""
+
+    key = models.CharField(max_length=40, primary_key=True)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    created = models.DateTimeField(default=timezone.now, db_index=True)
+
+    objects = StreamTicketManager()
+
+    def __str__(self):
+        return self.key
+
+
+class Job(models.Model):
+    """Background job, claimed by run_worker with FOR UPDATE SKIP LOCKED."""
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (SUCCEEDED, "Succeeded"),
+        (FAILED, "Failed"),
+    ]
+
+    name = models.CharField(max_length=255)
+    payload = models.JSONField(encoder=DjangoJSONEncoder, default=dict)
+    # The user allowed to poll the job, if any.
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+    )
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField()
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    result = models.JSONField(encoder=DjangoJSONEncoder, null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["run_at"],
+                name="job_queued_run_at_idx",
+                condition=models.Q(status="queued"),
+            ),
+            models.Index(
+                fields=["locked_at"],
+                name="job_running_locked_at_idx",
+                condition=models.Q(status="running"),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk}"
@@ -0,0 +1,48 @@
+"""
+Pagination for the API.
+"""
+
+from collections import OrderedDict
+
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.response import Response
+
+from core import counts
+
+
+class EstimatedCountPagination(LimitOffsetPagination):
+    """Limit/offset pagination whose count may be a planner estimate.
+
+    Lists stay unpaginated unless ?limit= is given. Views may define
+    get_count(queryset) returning (count, approximate) to supply a cheaper
+    count; otherwise core.counts.count is used.
+    """
+
+    default_limit = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.view = view
+        self.count_is_approximate = False
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_count(self, queryset):
+        get_count = getattr(self.view, "get_count", None)
+        if get_count is not None:
+            value, self.count_is_approximate = get_count(queryset)
+        else:
+            value, self.count_is_approximate = counts.count(queryset)
+        return value
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ("count", self.count),
+            ("count_is_approximate", self.count_is_approximate),
+            ("next", self.get_next_link()),
+            ("previous", self.get_previous_link()),
+            ("results", data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        schema = super().get_paginated_response_schema(schema)
+        schema["properties"]["count_is_approximate"] = {"type": "boolean"}
+        return schema
@@ -0,0 +1,85 @@
+"""
+Deactivate-then-purge deletion of users with large cascades.
+"""
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.jobs import enqueue
+from core.models import AuthToken, User
+from user.cache import invalidate_me_cache
+
+# Statements deleting one batch of a user's dependent rows, in dependency
+# order. Each takes (user_id, batch_size).
+PURGE_STEPS = (
+    ("recipe tag links", """
+        DELETE FROM core_recipe_tags WHERE id IN (
+            SELECT rt.id FROM core_recipe_tags rt
+            JOIN core_recipe r ON r.id = rt.recipe_id
+            WHERE r.user_id = %s LIMIT %s
+        )
+    """),
+    ("tag links", """
+        DELETE FROM core_recipe_tags WHERE id IN (
+            SELECT rt.id FROM core_recipe_tags rt
+            JOIN core_tag t ON t.id = rt.tag_id
+            WHERE t.user_id = %s LIMIT %s
+        )
+    """),
+    ("recipes", """
+        DELETE FROM core_recipe WHERE id IN (
+            SELECT id FROM core_recipe WHERE user_id = %s LIMIT %s
+        )
+    """),
+    ("tags", """
+        DELETE FROM core_tag WHERE id IN (
+            SELECT id FROM core_tag WHERE user_id = %s LIMIT %s
+        )
+    """),
+    ("tombstones", """
+        DELETE FROM core_tombstone WHERE id IN (
+            SELECT id FROM core_tombstone WHERE user_id = %s LIMIT %s
+        )
+    """),
+)
+
+
+@transaction.atomic
+def request_user_purge(user):
+    """Deactivate a user at once and queue a job purging their data."""
+    user.is_active = False
+    user.purge_requested_at = timezone.now()
+    # Saving invalidates the user's cached tokens (core.signals).
+    user.save(update_fields=["is_active", "purge_requested_at"])
+    AuthToken.objects.filter(user=user).delete()
+    invalidate_me_cache(user.pk)
+    return enqueue("purge_user", {"user_id": user.pk})
+
+
+def purge_user(user_id, batch_size=10000, progress=None):
+    """Delete a user and their data in bounded batches.
+
+    Dependents are removed with raw DELETEs of at most batch_size rows,
+    each committed on its own, so no step holds many locks or loads rows
+    into Python. Deletion signals are not sent for these rows; the user's
+    cached data goes with the user. progress, if given, is called with
+    (label, deleted_so_far) after every batch. Returns the rows deleted.
+    """
+    total = 0
+    for label, sql in PURGE_STEPS:
+        deleted = 0
+        while True:
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(sql, [user_id, batch_size])
+                count = cursor.rowcount
+            if not count:
+                break
+            deleted += count
+            if progress:
+                progress(label, deleted)
+        total += deleted
+
+    # What is left is small enough for the regular cascade.
+    total += User.objects.filter(pk=user_id).delete()[0]
+    invalidate_me_cache(user_id)
+    return total
@@ -0,0 +1,20 @@
+"""
+OpenAPI schema extensions.
+"""
+
+from drf_spectacular.extensions import OpenApiAuthenticationExtension
+
+
+class ExpiringTokenScheme(OpenApiAuthenticationExtension):
+    """Describe ExpiringTokenAuthentication like DRF's token scheme."""
+
+    target_class = "core.authentication.ExpiringTokenAuthentication"
+    name = "tokenAuth"
+
+    def get_security_definition(self, auto_schema):
+        return {
+            "type": "apiKey",
+            "in": "header",
+            "name": "Authorization",
+            "description": 'Token-based authentication with required prefix "Token"',
+        }
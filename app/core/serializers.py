@@ -0,0 +1,85 @@
+"""
+Serializers for the core APIs.
+"""
+
+from django.conf import settings
+
+from rest_framework import serializers
+
+from core.models import Job
+
+# Headers that apply to a single request, so each sub-request sends its own
+# rather than inheriting the batch's.
+SUB_REQUEST_HEADERS = (
+    "Idempotency-Key",
+    "If-Match",
+    "If-Modified-Since",
+    "If-None-Match",
+    "If-Range",
+    "If-Unmodified-Since",
+)
+
+
+class SubRequestSerializer(serializers.Serializer):
+    """Serializer for one request of a batch."""
+
+    id = serializers.CharField(required=False, max_length=64)
+    method = serializers.ChoiceField(
+        choices=("GET", "POST", "PUT", "PATCH", "DELETE"), default="GET"
+    )
+    path = serializers.CharField(max_length=2048)
+    body = serializers.JSONField(required=False)
+    headers = serializers.DictField(
+        child=serializers.CharField(max_length=1024), required=False
+    )
+
+    def validate_path(self, value):
+        """Only allow API routes."""
+        if not value.startswith(settings.API_PATH_PREFIX):
+            raise serializers.ValidationError("Only API paths can be batched.")
+        return value
+
+    def validate_headers(self, value):
+        """Only allow the per-request headers, by their canonical names."""
+        names = {name.lower(): name for name in SUB_REQUEST_HEADERS}
+        if any(name.lower() not in names for name in value):
+            raise serializers.ValidationError(
+                f"Sub-requests can only set {', '.join(SUB_REQUEST_HEADERS)}."
+            )
+        return {names[name.lower()]: header for name, header in value.items()}
+
+
+class BatchSerializer(serializers.Serializer):
+    """Serializer for a batch of API requests."""
+
+    requests = SubRequestSerializer(many=True)
+    parallel = serializers.BooleanField(default=False)
+
+    def validate_requests(self, value):
+        """Bound the number of requests in a batch."""
+        if not value:
+            raise serializers.ValidationError("A batch needs at least one request.")
+        if len(value) > settings.BATCH_MAX_REQUESTS:
+            raise serializers.ValidationError(
+                f"A batch can hold at most {settings.BATCH_MAX_REQUESTS} requests."
+            )
+        return value
+
+
+class JobSerializer(serializers.ModelSerializer):
+    """Serializer for the status of a background job."""
+
+    class Meta:
+        model = Job
+        fields = (
+            "id",
+            "name",
+            "status",
+            "attempts",
+            "result",
+            "error",
+            "run_at",
+            "created_at",
+            "finished_at",
+        )
+        read_only_fields = fields
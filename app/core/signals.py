@@ -0,0 +1,200 @@
+"""
+Signal handlers keeping denormalized columns in sync.
+"""
+
+from collections import Counter
+
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from core.authentication import invalidate_cached_tokens
+from core.counts import bump_user_recipe_count
+from core.events import publish
+from core.models import AuthToken, Recipe, Tag, Tombstone, User
+from core.similarity import links_changed
+from core.stats import invalidate_recipe_stats
+
+RecipeTag = Recipe.tags.through
+
+
+def _bump_recipe_counts(deltas):
+    """Apply a {tag_id: delta} mapping to Tag.recipe_count."""
+    by_delta = {}
+    for tag_id, delta in deltas.items():
+        if delta:
+            by_delta.setdefault(delta, []).append(tag_id)
+    for delta, tag_ids in by_delta.items():
+        Tag.objects.filter(pk__in=tag_ids).update(
+            recipe_count=F("recipe_count") + delta
+        )
+
+
+def _links(instance, reverse, pk_set):
+    """Return the existing (recipe_id, tag_id) links touched by a change."""
+    if reverse:
+        links = RecipeTag.objects.filter(tag_id=instance.pk)
+        if pk_set is not None:
+            links = links.filter(recipe_id__in=pk_set)
+    else:
+        links = RecipeTag.objects.filter(recipe_id=instance.pk)
+        if pk_set is not None:
+            links = links.filter(tag_id__in=pk_set)
+    return list(links.values_list("recipe_id", "tag_id"))
+
+
+@receiver(m2m_changed, sender=RecipeTag)
+def update_recipe_tag_links(sender, instance, action, reverse, pk_set, **kwargs):
+    """Keep Tag.recipe_count and Recipe.tags_snapshot in step with links."""
+    if action == "post_add" and pk_set:
+        if reverse:
+            _bump_recipe_counts({instance.pk: len(pk_set)})
+            Recipe.objects.refresh_tag_snapshots(pk_set)
+            added = [(recipe_id, instance.pk) for recipe_id in pk_set]
+        else:
+            _bump_recipe_counts(dict.fromkeys(pk_set, 1))
+            Recipe.objects.refresh_tag_snapshots([instance.pk])
+            added = [(instance.pk, tag_id) for tag_id in pk_set]
+        links_changed(instance.user_id, added=added)
+    elif action in ("pre_remove", "pre_clear"):
+        # pk_set may name links that do not exist, so look up the real ones
+        # before they are gone.
+        pk_set = pk_set if action == "pre_remove" else None
+        instance._removed_links = _links(instance, reverse, pk_set)
+    elif action in ("post_remove", "post_clear"):
+        removed = getattr(instance, "_removed_links", [])
+        instance._removed_links = []
+        tag_counts = Counter(tag_id for _, tag_id in removed)
+        _bump_recipe_counts({
+            tag_id: -count for tag_id, count in tag_counts.items()
+        })
+        Recipe.objects.refresh_tag_snapshots(
+            {recipe_id for recipe_id, _ in removed}
+        )
+        links_changed(instance.user_id, removed=removed)
+
+
+@receiver(pre_delete, sender=Recipe)
+def release_tag_recipe_counts(sender, instance, **kwargs):
+    """Decrement the counts of a deleted recipe's tags.
+
+    Deleting a recipe drops its links without sending m2m_changed.
+    """
+    links = _links(instance, reverse=False, pk_set=None)
+    _bump_recipe_counts(dict.fromkeys((tag_id for _, tag_id in links), -1))
+    links_changed(instance.user_id, removed=links)
+
+
+@receiver(post_save, sender=Recipe)
+def count_created_recipe(sender, instance, created, **kwargs):
+    """Bump the owner's cached recipe count for a new recipe."""
+    if created:
+        bump_user_recipe_count(instance.user_id, 1)
+
+
+@receiver(post_delete, sender=Recipe)
+def count_deleted_recipe(sender, instance, **kwargs):
+    """Lower the owner's cached recipe count for a deleted recipe."""
+    bump_user_recipe_count(instance.user_id, -1)
+
+
+@receiver(post_save, sender=Tag)
+def refresh_snapshots_on_tag_rename(sender, instance, created, update_fields, **kwargs):
+    """Copy a renamed tag into the snapshots of its recipes."""
+    if created or (update_fields is not None and "name" not in update_fields):
+        return
+    recipe_ids = RecipeTag.objects.filter(tag_id=instance.pk).values_list(
+        "recipe_id", flat=True
+    )
+    Recipe.objects.refresh_tag_snapshots(recipe_ids)
+
+
+@receiver(pre_delete, sender=Tag)
+def collect_snapshots_on_tag_delete(sender, instance, **kwargs):
+    """Remember the recipes of a tag before its links are cascaded away."""
+    instance._snapshot_recipe_ids = list(
+        RecipeTag.objects.filter(tag_id=instance.pk).values_list(
+            "recipe_id", flat=True
+        )
+    )
+
+
+@receiver(post_delete, sender=Tag)
+def refresh_snapshots_on_tag_delete(sender, instance, **kwargs):
+    """Drop a deleted tag from the snapshots of its recipes."""
+    recipe_ids = getattr(instance, "_snapshot_recipe_ids", [])
+    Recipe.objects.refresh_tag_snapshots(recipe_ids)
+    links_changed(
+        instance.user_id,
+        removed=[(recipe_id, instance.pk) for recipe_id in recipe_ids],
+    )
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+def record_tombstone(sender, instance, **kwargs):
+    """Leave a tombstone so syncing clients learn about the deletion."""
+    Tombstone.objects.create(
+        user_id=instance.user_id,
+        kind=Tombstone.RECIPE if sender is Recipe else Tombstone.TAG,
+        object_id=instance.pk,
+    )
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_stats(sender, instance, **kwargs):
+    """Retire the owner's cached recipe statistics."""
+    invalidate_recipe_stats(instance.user_id)
+
+
+@receiver(m2m_changed, sender=RecipeTag)
+def invalidate_stats_on_links(sender, instance, action, **kwargs):
+    """Retire cached statistics when recipes per tag change."""
+    if action in ("post_add", "post_remove", "post_clear"):
+        invalidate_recipe_stats(instance.user_id)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Tag)
+def publish_saved(sender, instance, created, **kwargs):
+    """Tell the owner's event streams about a new or changed object."""
+    kind = "recipe" if sender is Recipe else "tag"
+    publish(instance.user_id, f"{kind}.{'created' if created else 'updated'}", instance.pk)
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+def publish_deleted(sender, instance, **kwargs):
+    """Tell the owner's event streams about a deleted object."""
+    kind = "recipe" if sender is Recipe else "tag"
+    publish(instance.user_id, f"{kind}.deleted", instance.pk)
+
+
+@receiver(m2m_changed, sender=RecipeTag)
+def publish_retagged(sender, instance, action, reverse, pk_set, **kwargs):
+    """Report recipes whose tags changed as updated."""
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        publish(instance.user_id, "recipe.updated", instance.pk)
+    else:
+        for recipe_id in pk_set or ():
+            publish(instance.user_id, "recipe.updated", recipe_id)
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_tokens(sender, instance, created, **kwargs):
+    """Drop cached tokens so changes such as deactivation apply at once."""
+    if not created:
+        invalidate_cached_tokens(
+            instance.auth_tokens.values_list("key", flat=True)
+        )
+
+
+@receiver(post_delete, sender=AuthToken)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    """Drop a deleted token from the authentication cache."""
+    invalidate_cached_tokens([instance.key])
@@ -0,0 +1,124 @@
+"""
+In-memory tag index for similar-recipe lookups.
+"""
+
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+
+from core.models import Recipe
+from core.versions import bump_version, current_version
+
+RecipeTag = Recipe.tags.through
+
+_indexes = OrderedDict()
+_lock = threading.Lock()
+
+
+def version_key(user_id):
+    """Return the cache key holding the version of a user's recipe tags."""
+    return f"recipe-tags-version:{user_id}"
+
+
+class TagIndex:
+    """A user's recipe/tag links, held as one tag bitmap per recipe.
+
+    postings maps each tag to its recipes so that only recipes sharing a
+    tag with the target are scored.
+    """
+
+    def __init__(self, links, version):
+        self.version = version
+        self.bits = {}
+        self.recipe_bits = {}
+        self.postings = {}
+        for recipe_id, tag_id in links:
+            self.add(recipe_id, tag_id)
+
+    def _bit(self, tag_id):
+        bit = self.bits.get(tag_id)
+        if bit is None:
+            bit = self.bits[tag_id] = 1 << len(self.bits)
+        return bit
+
+    def add(self, recipe_id, tag_id):
+        self.recipe_bits[recipe_id] = self.recipe_bits.get(recipe_id, 0) | self._bit(tag_id)
+        self.postings.setdefault(tag_id, set()).add(recipe_id)
+
+    def remove(self, recipe_id, tag_id):
+        bits = self.recipe_bits.get(recipe_id, 0) & ~self._bit(tag_id)
+        if bits:
+            self.recipe_bits[recipe_id] = bits
+        else:
+            self.recipe_bits.pop(recipe_id, None)
+        self.postings.get(tag_id, set()).discard(recipe_id)
+
+    def similar(self, recipe_id, limit):
+        """Return [(recipe_id, score)] ranked by Jaccard overlap, best first."""
+        target = self.recipe_bits.get(recipe_id, 0)
+        candidates = set()
+        for tag_id, bit in self.bits.items():
+            if target & bit:
+                candidates |= self.postings[tag_id]
+        candidates.discard(recipe_id)
+
+        scored = []
+        for candidate in candidates:
+            bits = self.recipe_bits[candidate]
+            shared = bin(bits & target).count("1")
+            scored.append((shared / bin(bits | target).count("1"), candidate))
+        scored.sort(reverse=True)
+        return [(candidate, score) for score, candidate in scored[:limit]]
+
+
+def get_index(user_id):
+    """Return the up to date tag index of a user, building it if needed."""
+    version = current_version(version_key(user_id))
+    with _lock:
+        index = _indexes.get(user_id)
+        if index is not None and index.version == version:
+            _indexes.move_to_end(user_id)
+            return index
+
+    links = RecipeTag.objects.filter(recipe__user_id=user_id).values_list(
+        "recipe_id", "tag_id"
+    )
+    index = TagIndex(links.iterator(), version)
+    with _lock:
+        _indexes[user_id] = index
+        _indexes.move_to_end(user_id)
+        while len(_indexes) > settings.RECIPE_SIMILAR_INDEX_MAX_USERS:
+            _indexes.popitem(last=False)
+    return index
+
+
+def links_changed(user_id, added=(), removed=()):
+    """Record recipe/tag link changes once the transaction commits.
+
+    The version in the shared default cache is bumped so other processes
+    rebuild their index;
+    this process applies the change to its own index in place when that
+    index was current.
+    """
+    if not settings.RECIPE_SIMILAR_IN_MEMORY or not (added or removed):
+        return
+    added, removed = list(added), list(removed)
+
+    def apply():
+        version = bump_version(version_key(user_id))
+        with _lock:
+            index = _indexes.get(user_id)
+            if index is None:
+                return
+            if version is None or index.version != version - 1:
+                del _indexes[user_id]
+                return
+            for recipe_id, tag_id in removed:
+                index.remove(recipe_id, tag_id)
+            for recipe_id, tag_id in added:
+                index.add(recipe_id, tag_id)
+            index.version = version
+
+    transaction.on_commit(apply)
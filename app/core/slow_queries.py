@@ -0,0 +1,140 @@
+"""
+Capture of slow database queries.
+
+A wrapper installed on every new database connection times each query.
+Queries slower than SLOW_QUERY_THRESHOLD_MS are logged with their
+fingerprint and the route that ran them, a sample of them is explained,
+and the slowest fingerprints are kept in a bounded in-memory table.
+"""
+
+import contextvars
+import hashlib
+import logging
+import random
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+# The request being handled, set by core.middleware.RequestContextMiddleware.
+current_request = contextvars.ContextVar("current_request", default=None)
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_LISTS = re.compile(r"\((?:\s*\?\s*,)+\s*\?\s*\)")
+_SPACE = re.compile(r"\s+")
+
+_top = {}
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def fingerprint(sql):
+    """Return (digest, normalized SQL) with literals and placeholders folded."""
+    normalized = _LITERALS.sub("?", sql.replace("%s", "?"))
+    normalized = _LISTS.sub("(...)", normalized)
+    normalized = _SPACE.sub(" ", normalized).strip()
+    return hashlib.sha1(normalized.encode()).hexdigest()[:12], normalized
+
+
+def _route():
+    """Return the (route, view) of the current request, if any."""
+    request = current_request.get()
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return None, None
+    func = match.func
+    view = getattr(func, "cls", None) or getattr(func, "view_class", None) or func
+    return match.view_name, f"{view.__module__}.{view.__qualname__}"
+
+
+def _explain(connection, sql, params):
+    """Return the JSON plan of a query, or None if it cannot be explained."""
+    if not sql.lstrip().upper().startswith(("SELECT", "WITH")):
+        return None
+    _local.explaining = True
+    try:
+        # A failed statement aborts the transaction, so inside the request's
+        # one it needs a savepoint of its own.
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            return cursor.fetchone()[0]
+    except Exception:
+        logger.debug("Could not explain slow query", exc_info=True)
+        return None
+    finally:
+        _local.explaining = False
+
+
+def record(sql, duration_ms, route, view, plan):
+    """Add a slow query to the top-K table of the slowest fingerprints."""
+    digest, normalized = fingerprint(sql)
+    with _lock:
+        entry = _top.get(digest)
+        if entry is None:
+            if len(_top) >= settings.SLOW_QUERY_TOP_K:
+                fastest = min(_top, key=lambda key: _top[key]["max_ms"])
+                if _top[fastest]["max_ms"] >= duration_ms:
+                    return
+                del _top[fastest]
+            entry = _top[digest] = {
+                "fingerprint": digest,
+                "sql": normalized,
+                "count": 0,
+                "total_ms": 0.0,
+                "max_ms": 0.0,
+                "route": None,
+                "view": None,
+                "plan": None,
+            }
+        entry["count"] += 1
+        entry["total_ms"] += duration_ms
+        if duration_ms >= entry["max_ms"]:
+            entry.update(max_ms=duration_ms, route=route, view=view)
+        if plan is not None:
+            entry["plan"] = plan
+
+
+def slowest():
+    """Return the recorded fingerprints, slowest first."""
+    with _lock:
+        entries = [dict(entry) for entry in _top.values()]
+    return sorted(entries, key=lambda entry: entry["max_ms"], reverse=True)
+
+
+def reset():
+    """Forget the recorded slow queries."""
+    with _lock:
+        _top.clear()
+
+
+def capture_slow_queries(execute, sql, params, many, context):
+    """Database execute wrapper timing queries and recording slow ones."""
+    if getattr(_local, "explaining", False):
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    result = execute(sql, params, many, context)
+    duration_ms = (time.perf_counter() - started) * 1000
+    if duration_ms >= settings.SLOW_QUERY_THRESHOLD_MS:
+        route, view = _route()
+        digest, _ = fingerprint(sql)
+        logger.warning(
+            "Slow query %.1fms [%s] route=%s view=%s: %s",
+            duration_ms, digest, route, view, sql,
+        )
+        plan = None
+        if not many and random.random() < settings.SLOW_QUERY_EXPLAIN_SAMPLE_RATE:
+            plan = _explain(context["connection"], sql, params)
+        record(sql, duration_ms, route, view, plan)
+    return result
+
+
+def install(sender, connection, **kwargs):
+    """Add the slow query wrapper to a new database connection."""
+    # Reconnecting sends connection_created again for the same wrapper.
+    if capture_slow_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(capture_slow_queries)
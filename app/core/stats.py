@@ -0,0 +1,105 @@
+"""
+Per-user recipe statistics, cached until the user's recipes change.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+
+from core.versions import bump_version, current_version
+
+# One round trip: time and price summaries, an equal-width price
+# histogram and the most used tags.
+STATS_SQL = """
+WITH r AS (
+    SELECT time_minutes, price FROM core_recipe WHERE user_id = %(user_id)s
+), bounds AS (
+    SELECT MIN(price) AS lo, MAX(price) AS hi FROM r
+), buckets AS (
+    SELECT CASE WHEN bounds.hi = bounds.lo THEN 1
+                ELSE LEAST(width_bucket(r.price, bounds.lo, bounds.hi, %(buckets)s),
+                           %(buckets)s)
+           END AS bucket,
+           COUNT(*) AS count
+    FROM r, bounds GROUP BY 1
+)
+SELECT
+    (SELECT json_build_object(
+        'count', COUNT(*),
+        'time_minutes', json_build_object(
+            'avg', AVG(time_minutes),
+            'p50', percentile_cont(0.5) WITHIN GROUP (ORDER BY time_minutes),
+            'p90', percentile_cont(0.9) WITHIN GROUP (ORDER BY time_minutes)
+        ),
+        'price', json_build_object(
+            'avg', AVG(price),
+            'min', MIN(price),
+            'max', MAX(price),
+            'p50', percentile_cont(0.5) WITHIN GROUP (ORDER BY price),
+            'p90', percentile_cont(0.9) WITHIN GROUP (ORDER BY price)
+        )
+    ) FROM r),
+    (SELECT COALESCE(json_agg(json_build_object(
+        'min', bounds.lo + (bucket - 1) * (bounds.hi - bounds.lo) / %(buckets)s,
+        'max', bounds.lo + bucket * (bounds.hi - bounds.lo) / %(buckets)s,
+        'count', count
+    ) ORDER BY bucket), '[]') FROM buckets, bounds),
+    (SELECT COALESCE(json_agg(json_build_object(
+        'id', id, 'name', name, 'recipe_count', recipe_count
+    ) ORDER BY recipe_count DESC, name), '[]') FROM (
+        SELECT id, name, recipe_count FROM core_tag
+        WHERE user_id = %(user_id)s AND recipe_count > 0
+        ORDER BY recipe_count DESC, name LIMIT %(tags)s
+    ) t)
+"""
+
+
+def version_key(user_id):
+    """Return the cache key holding the version of a user's statistics."""
+    return f"recipe-stats-version:{user_id}"
+
+
+def _round(value):
+    return None if value is None else round(value, 2)
+
+
+def compute_recipe_stats(user_id):
+    """Compute a user's recipe statistics with one query."""
+    with connection.cursor() as cursor:
+        cursor.execute(STATS_SQL, {
+            "user_id": user_id,
+            "buckets": settings.RECIPE_STATS_PRICE_BUCKETS,
+            "tags": settings.RECIPE_STATS_TOP_TAGS,
+        })
+        summary, histogram, tags = cursor.fetchone()
+
+    for key in ("time_minutes", "price"):
+        summary[key] = {name: _round(value) for name, value in summary[key].items()}
+    summary["price"]["histogram"] = [
+        {"min": _round(bucket["min"]), "max": _round(bucket["max"]), "count": bucket["count"]}
+        for bucket in histogram
+    ]
+    summary["tags"] = tags
+    return summary
+
+
+def cached_recipe_stats(user_id):
+    """Return a user's recipe statistics and their cache key.
+
+    The statistics come from the cache when current.
+    """
+    key = f"recipe-stats:{user_id}:{current_version(version_key(user_id))}"
+    stats = cache.get(key)
+    if stats is None:
+        stats = compute_recipe_stats(user_id)
+        cache.set(key, stats, settings.RECIPE_STATS_CACHE_SECONDS)
+    return key, stats
+
+
+def invalidate_recipe_stats(user_id):
+    """Retire a user's cached statistics once the transaction commits.
+
+    Bumping only after commit keeps a concurrent reader from caching the
+    old figures under the new version.
+    """
+    transaction.on_commit(lambda: bump_version(version_key(user_id)))
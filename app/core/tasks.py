@@ -0,0 +1,14 @@
+"""
+Jobs run by the background worker.
+"""
+
+from django.conf import settings
+
+from core.jobs import task
+from core.purge import purge_user
+
+
+@task("purge_user")
+def purge_user_job(user_id):
+    """Purge a user queued by request_user_purge."""
+    return {"deleted": purge_user(user_id, settings.PURGE_BATCH_SIZE)}
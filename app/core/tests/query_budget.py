@@ -0,0 +1,40 @@
+"""
+Query budget assertions for API tests.
+"""
+
+from collections import Counter
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+from core.slow_queries import fingerprint
+
+
+def describe_queries(queries):
+    """Return captured queries grouped by fingerprint, most frequent first."""
+    counts = Counter()
+    examples = {}
+    for query in queries:
+        digest, normalized = fingerprint(query["sql"])
+        counts[digest] += 1
+        examples.setdefault(digest, normalized)
+    return "\n".join(
+        f"  {count}x [{digest}] {examples[digest]}" for digest, count in counts.most_common()
+    )
+
+
+@contextmanager
+def query_budget(budget, using=DEFAULT_DB_ALIAS):
+    """Fail if the block runs more than budget queries.
+
+    Usable as a decorator too. The failure lists the queries by
+    fingerprint, so a loop shows up as one fingerprint repeated.
+    """
+    with CaptureQueriesContext(connections[using]) as context:
+        yield context
+    if len(context) > budget:
+        raise AssertionError(
+            f"{len(context)} queries exceeded the budget of {budget}:\n"
+            f"{describe_queries(context.captured_queries)}"
+        )
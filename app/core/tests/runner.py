@@ -0,0 +1,33 @@
+"""
+Test runner keeping rate limits out of unrelated tests.
+"""
+
+import os
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    """Run tests with throttling off and a rate limit store of their own.
+
+    Without this every test client shares the login bucket of 127.0.0.1,
+    kept from run to run in THROTTLE_STORE_PATH. Tests of throttling set
+    DEFAULT_THROTTLE_RATES themselves.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.throttle_dir = tempfile.TemporaryDirectory()
+        self.throttle_settings = override_settings(
+            THROTTLE_STORE_PATH=os.path.join(self.throttle_dir.name, "buckets"),
+            REST_FRAMEWORK={**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": {}},
+        )
+        self.throttle_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.throttle_settings.disable()
+        self.throttle_dir.cleanup()
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,44 @@
+"""
+Helpers for tests of state that worker processes share through the cache.
+"""
+
+import multiprocessing
+import tempfile
+
+from django.conf import settings
+from django.db import connections
+from django.test import override_settings
+
+
+def _run(func, *args):
+    # The inherited connections are the parent's sessions, which closing
+    # them would end, so the child opens its own.
+    for connection in connections.all():
+        connection.connection = None
+    func(*args)
+
+
+class SharedCacheMixin:
+    """Give a TransactionTestCase a default cache shared with forked processes.
+
+    A file cache stands in for memcached.
+    """
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        default = {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": directory.name,
+        }
+        override = override_settings(CACHES={**settings.CACHES, "default": default})
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def in_other_process(self, func, *args):
+        """Run a function in a forked process, as another worker would."""
+        child = multiprocessing.get_context("fork").Process(target=_run, args=(func, *args))
+        child.start()
+        child.join()
+        self.assertEqual(child.exitcode, 0)
@@ -2,12 +2,22 @@
 Tests for Django admin modifications.
 """
 
-from django.test import TestCase
+from decimal import Decimal
 
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from django.contrib import admin
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.urls import reverse
 from django.test import Client
 
+from core.admin import EstimatedCountPaginator, RecipeAdmin, TagAdmin
+from core.models import Recipe, Tag
+from user.cache import me_cache_key
+
 
 class AdminSiteTests(TestCase):
     """Test Django admin site."""
@@ -44,3 +54,142 @@ class AdminSiteTests(TestCase):
         res = self.client.get(url)
 
         self.assertEqual(res.status_code, 200)
+
+    def test_edit_user_invalidates_me_cache(self):
+        """Test saving a user in the admin drops their cached profile."""
+        cache.set(me_cache_key(self.user.id), {"data": {}, "etag": '"x"'})
+        url = reverse("admin:core_user_change", args=[self.user.id])
+        payload = {
+            "email": self.user.email,
+            "name": "Changed",
+            "is_active": "on",
+        }
+
+        res = self.client.post(url, payload)
+
+        self.assertEqual(res.status_code, 302)
+        self.assertIsNone(cache.get(me_cache_key(self.user.id)))
+
+    def test_delete_user_queues_purge(self):
+        """Test deleting a user in the admin deactivates them instead."""
+        url = reverse("admin:core_user_delete", args=[self.user.id])
+
+        res = self.client.get(url)
+        self.assertEqual(res.status_code, 200)
+        res = self.client.post(url, {"post": "yes"})
+
+        self.assertEqual(res.status_code, 302)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+        self.assertIsNotNone(self.user.purge_requested_at)
+
+
+class RecipeTagAdminTests(TestCase):
+    """Test the recipe and tag admin pages."""
+
+    def setUp(self):
+        self.client = Client()
+        self.admin_user = get_user_model().objects.create_superuser(
+            email="admin@example.com", password="password123"
+        )
+        self.client.force_login(self.admin_user)
+
+    def create_recipes(self, count, titles=()):
+        """Create tagged recipes, each for a different user."""
+        start = Recipe.objects.count()
+        for i in range(start, start + count):
+            user = get_user_model().objects.create_user(
+                email=f"user{i}@example.com", password="password123"
+            )
+            title = titles[i - start] if titles else f"Recipe {i}"
+            recipe = Recipe.objects.create(
+                user=user, title=title, time_minutes=5, price=Decimal("5.00")
+            )
+            recipe.tags.add(Tag.objects.create(user=user, name=f"{title} tag"))
+
+    def changelist_queries(self, url):
+        """Return the number of queries a changelist page load runs."""
+        with CaptureQueriesContext(connection) as context:
+            res = self.client.get(url)
+        self.assertEqual(res.status_code, 200)
+        return len(context)
+
+    def test_changelist_query_budget(self):
+        """Test changelist page loads run a constant number of queries."""
+        for name in ("recipe", "tag"):
+            url = reverse(f"admin:core_{name}_changelist")
+            self.create_recipes(1)
+            small = self.changelist_queries(url)
+            self.create_recipes(20)
+            large = self.changelist_queries(url)
+
+            self.assertEqual(small, large)
+            self.assertLessEqual(large, 8)
+
+    def test_prefix_search(self):
+        """Test searching recipes and tags by prefix."""
+        self.create_recipes(2, titles=["Pancakes", "Waffles"])
+
+        res = self.client.get(reverse("admin:core_recipe_changelist"), {"q": "panc"})
+        self.assertContains(res, "Pancakes")
+        self.assertNotContains(res, "Waffles")
+
+        res = self.client.get(reverse("admin:core_tag_changelist"), {"q": "waff"})
+        self.assertContains(res, "Waffles tag")
+        self.assertNotContains(res, "Pancakes tag")
+
+    def test_search_by_id(self):
+        """Test numeric searches find recipes by id and by title."""
+        self.create_recipes(3, titles=["Pancakes", "Waffles", "1984 Omelette"])
+        recipe = Recipe.objects.get(title="Waffles")
+
+        res = self.client.get(reverse("admin:core_recipe_changelist"), {"q": str(recipe.id)})
+        self.assertContains(res, "Waffles")
+        self.assertNotContains(res, "Pancakes")
+
+        res = self.client.get(reverse("admin:core_recipe_changelist"), {"q": "1984"})
+        self.assertContains(res, "1984 Omelette")
+        self.assertNotContains(res, "Waffles")
+
+    def test_search_uses_index(self):
+        """Test admin searches can be served by the pattern indexes."""
+        request = RequestFactory().get("/")
+        request.user = self.admin_user
+        searches = [
+            (RecipeAdmin, Recipe, "panc", ["recipe_upper_title_idx"]),
+            (RecipeAdmin, Recipe, "42", ["recipe_upper_title_idx", "core_recipe_pkey"]),
+            (TagAdmin, Tag, "waff", ["tag_upper_name_idx"]),
+        ]
+        with connection.cursor() as cursor:
+            # Tiny test tables would otherwise always be scanned.
+            cursor.execute("SET LOCAL enable_seqscan = off")
+        for model_admin, model, term, indexes in searches:
+            with self.subTest(term=term):
+                queryset, _ = model_admin(model, admin.site).get_search_results(
+                    request, model.objects.all(), term
+                )
+                plan = queryset.explain()
+                for index in indexes:
+                    self.assertIn(index, plan)
+                self.assertNotIn("Seq Scan", plan)
+
+    def test_edit_recipe_page(self):
+        """Test the recipe edit page renders without listing users or tags."""
+        self.create_recipes(1)
+        recipe = Recipe.objects.get()
+
+        res = self.client.get(reverse("admin:core_recipe_change", args=[recipe.id]))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertNotContains(res, "<option value=\"%s\"" % self.admin_user.id)
+
+    @override_settings(EXACT_COUNT_LIMIT=2)
+    def test_estimated_count(self):
+        """Test counts above the limit come from the planner estimate."""
+        self.create_recipes(5)
+        paginator = EstimatedCountPaginator(Recipe.objects.order_by("id"), 100)
+
+        self.assertGreaterEqual(paginator.count, 3)
+        self.assertEqual(
+            EstimatedCountPaginator(Recipe.objects.filter(title="Missing").order_by("id"), 100).count, 0
+        )
@@ -0,0 +1,137 @@
+"""
+Tests for expiring token authentication.
+"""
+
+import importlib
+from datetime import timedelta
+from io import StringIO
+
+from django.apps import apps
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.models import AuthToken
+from core.tests.shared_cache import SharedCacheMixin
+
+ME_URL = reverse("user:me")
+
+
+def deactivate(user_id):
+    user = get_user_model().objects.get(pk=user_id)
+    user.is_active = False
+    user.save()
+
+
+class ExpiringTokenAuthenticationTests(TestCase):
+    """Test authenticating with expiring tokens."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user("test@example.com", "testpass")
+        self.token = AuthToken.objects.issue(self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+    def test_login_issues_usable_token(self):
+        """Test the token endpoint issues a token that authenticates."""
+        res = APIClient().post(
+            reverse("user:token"), {"email": "test@example.com", "password": "testpass"}
+        )
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Token {res.data['token']}")
+
+        self.assertEqual(client.get(ME_URL).status_code, status.HTTP_200_OK)
+        self.assertEqual(AuthToken.objects.filter(user=self.user).count(), 2)
+
+    def test_expired_token_rejected(self):
+        """Test a token unused for longer than the TTL is refused."""
+        AuthToken.objects.filter(key=self.token.key).update(
+            last_used=timezone.now() - timedelta(days=365)
+        )
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_recent_use_not_written(self):
+        """Test requests within the touch interval do not write the token."""
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(ME_URL)
+            self.client.get(ME_URL)
+
+        self.assertFalse(any(q["sql"].startswith("UPDATE") for q in queries))
+
+    @override_settings(AUTH_TOKEN_TOUCH_INTERVAL_SECONDS=60)
+    def test_stale_use_slides_expiry(self):
+        """Test a use after the touch interval moves last_used forward."""
+        old = timezone.now() - timedelta(minutes=10)
+        AuthToken.objects.filter(key=self.token.key).update(last_used=old)
+
+        self.client.get(ME_URL)
+
+        self.token.refresh_from_db()
+        self.assertGreater(self.token.last_used, old)
+
+    def test_cached_token_follows_deactivation(self):
+        """Test a cached token stops working once its user is deactivated."""
+        self.assertEqual(self.client.get(ME_URL).status_code, status.HTTP_200_OK)
+
+        self.user.is_active = False
+        self.user.save()
+
+        self.assertEqual(self.client.get(ME_URL).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_purge_expired_tokens(self):
+        """Test the purge command only deletes expired tokens."""
+        expired = AuthToken.objects.issue(self.user)
+        AuthToken.objects.filter(key=expired.key).update(
+            last_used=timezone.now() - timedelta(days=365)
+        )
+
+        call_command("purge_expired_tokens", stdout=StringIO())
+
+        self.assertEqual(list(AuthToken.objects.all()), [self.token])
+
+
+class SharedTokenCacheTests(SharedCacheMixin, TransactionTestCase):
+    """Test cached tokens are revoked in every worker process."""
+
+    def test_deactivation_in_other_process(self):
+        """Test a user deactivated by another worker is refused here."""
+        user = get_user_model().objects.create_user("test@example.com", "testpass")
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Token {AuthToken.objects.issue(user).key}")
+        self.assertEqual(client.get(ME_URL).status_code, status.HTTP_200_OK)
+
+        self.in_other_process(deactivate, user.pk)
+
+        self.assertEqual(client.get(ME_URL).status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class LegacyTokenMigrationTests(TestCase):
+    """Test DRF authtoken tokens keep working after the cut-over."""
+
+    def test_legacy_tokens_copied(self):
+        """Test copied tokens authenticate and copying twice is harmless."""
+        user = get_user_model().objects.create_user("test@example.com", "testpass")
+        legacy = Token.objects.create(user=user)
+        migration = importlib.import_module("core.migrations.0013_copy_legacy_tokens")
+
+        migration.copy_legacy_tokens(apps, connection.schema_editor())
+        migration.copy_legacy_tokens(apps, connection.schema_editor())
+
+        self.assertEqual(AuthToken.objects.get(key=legacy.key).created, legacy.created)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Token {legacy.key}")
+        self.assertEqual(client.get(ME_URL).status_code, status.HTTP_200_OK)
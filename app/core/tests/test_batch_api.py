@@ -0,0 +1,160 @@
+"""
+Tests for the batch API.
+"""
+
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+
+BATCH_URL = reverse("core:batch")
+
+HOME_SCREEN = [
+    {"id": "me", "path": reverse("user:me")},
+    {"id": "tags", "path": reverse("recipe:tag-list")},
+    {"id": "recipes", "path": reverse("recipe:recipe-list")},
+]
+
+
+def create_user(email="test@example.com", password="testpass"):
+    """Helper function to create a user."""
+    return get_user_model().objects.create_user(email, password, name="Test Name")
+
+
+class PublicBatchApiTests(TestCase):
+    """Test the batch API (public)."""
+
+    def test_auth_required(self):
+        """Test that authentication is required for batches."""
+        res = APIClient().post(BATCH_URL, {"requests": HOME_SCREEN}, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateBatchApiTests(TestCase):
+    """Test the batch API (private)."""
+
+    def setUp(self):
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_home_screen_batch(self):
+        """Test several reads come back together with their statuses."""
+        Tag.objects.create(user=self.user, name="Vegan")
+        Recipe.objects.create(
+            user=self.user, title="Sample", time_minutes=5, price=Decimal("5.00")
+        )
+
+        res = self.client.post(BATCH_URL, {"requests": HOME_SCREEN}, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        responses = {r["id"]: r for r in res.data["responses"]}
+        self.assertEqual([r["status"] for r in res.data["responses"]], [200, 200, 200])
+        self.assertEqual(responses["me"]["body"]["email"], self.user.email)
+        self.assertEqual(responses["tags"]["body"][0]["name"], "Vegan")
+        self.assertEqual(responses["recipes"]["body"][0]["title"], "Sample")
+
+    def test_writes_run_in_order(self):
+        """Test sub-requests with bodies run one after another."""
+        payload = {
+            "requests": [
+                {
+                    "method": "POST",
+                    "path": reverse("recipe:recipe-list"),
+                    "body": {"title": "Soup", "time_minutes": 5, "price": "2.00"},
+                },
+                {"path": reverse("recipe:recipe-list")},
+                {"method": "POST", "path": reverse("recipe:recipe-list"), "body": {}},
+            ]
+        }
+
+        res = self.client.post(BATCH_URL, payload, format="json")
+
+        statuses = [r["status"] for r in res.data["responses"]]
+        self.assertEqual(statuses, [201, 200, 400])
+        self.assertEqual(res.data["responses"][1]["body"][0]["title"], "Soup")
+
+    def test_idempotency_key_per_sub_request(self):
+        """Test the batch's Idempotency-Key is not applied to sub-requests."""
+        def create(title, **extra):
+            return {
+                "method": "POST",
+                "path": reverse("recipe:recipe-list"),
+                "body": {"title": title, "time_minutes": 5, "price": "2.00"},
+                **extra,
+            }
+        payload = {
+            "requests": [
+                create("Soup"),
+                create("Stew"),
+                create("Salad", headers={"idempotency-key": "salad"}),
+                create("Salad", headers={"Idempotency-Key": "salad"}),
+            ]
+        }
+
+        res = self.client.post(BATCH_URL, payload, format="json", HTTP_IDEMPOTENCY_KEY="batch")
+
+        self.assertEqual([r["status"] for r in res.data["responses"]], [201, 201, 201, 201])
+        self.assertEqual(
+            sorted(Recipe.objects.values_list("title", flat=True)), ["Salad", "Soup", "Stew"]
+        )
+
+    def test_sub_request_headers_limited(self):
+        """Test sub-requests cannot set headers such as Authorization."""
+        payload = {
+            "requests": [
+                {"path": reverse("user:me"), "headers": {"Authorization": "Token x"}},
+            ]
+        }
+
+        res = self.client.post(BATCH_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_unknown_and_nested_paths(self):
+        """Test unknown routes and nested batches are refused per request."""
+        payload = {
+            "requests": [
+                {"path": "/api/does-not-exist/"},
+                {"method": "POST", "path": BATCH_URL, "body": {"requests": []}},
+            ]
+        }
+
+        res = self.client.post(BATCH_URL, payload, format="json")
+
+        statuses = [r["status"] for r in res.data["responses"]]
+        self.assertEqual(statuses, [404, 400])
+
+    def test_non_api_path_rejected(self):
+        """Test only API routes can be batched."""
+        payload = {"requests": [{"path": "/admin/"}]}
+
+        res = self.client.post(BATCH_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ParallelBatchApiTests(TransactionTestCase):
+    """Test parallel batches, which use their own database connections."""
+
+    def test_parallel_reads(self):
+        """Test read only batches can run on the thread pool."""
+        user = create_user()
+        Tag.objects.create(user=user, name="Vegan")
+        client = APIClient()
+        client.force_authenticate(user)
+
+        res = client.post(
+            BATCH_URL, {"requests": HOME_SCREEN, "parallel": True}, format="json"
+        )
+
+        self.assertEqual([r["id"] for r in res.data["responses"]], ["me", "tags", "recipes"])
+        self.assertEqual([r["status"] for r in res.data["responses"]], [200, 200, 200])
+        self.assertEqual(res.data["responses"][1]["body"][0]["name"], "Vegan")
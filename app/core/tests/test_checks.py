@@ -0,0 +1,109 @@
+"""
+Tests for the production profile checks and middleware.
+"""
+
+from django.conf import settings
+from django.test import SimpleTestCase, RequestFactory, override_settings
+
+from core.checks import check_production_profile
+from core.middleware import APISessionMiddleware
+
+
+PRODUCTION_SETTINGS = {
+    "APP_PROFILE": "production",
+    "DEBUG": False,
+    "MIDDLEWARE": [
+        "core.middleware.APISessionMiddleware",
+        "core.middleware.APIAuthenticationMiddleware",
+        "core.middleware.APIMessageMiddleware",
+    ],
+    "TEMPLATES": [
+        {
+            "BACKEND": "django.template.backends.django.DjangoTemplates",
+            "OPTIONS": {
+                "loaders": [
+                    (
+                        "django.template.loaders.cached.Loader",
+                        ["django.template.loaders.app_directories.Loader"],
+                    ),
+                ],
+            },
+        }
+    ],
+    "CACHES": {
+        "default": {
+            "BACKEND": "django.core.cache.backends.memcached.PyMemcacheCache",
+            "LOCATION": "memcached:11211",
+        },
+    },
+}
+
+
+def error_ids(**overrides):
+    """Run the production check with overrides and return the error ids."""
+    with override_settings(**{**PRODUCTION_SETTINGS, **overrides}):
+        return [error.id for error in check_production_profile()]
+
+
+class ProductionProfileCheckTests(SimpleTestCase):
+    """Test the production profile system check."""
+
+    def setUp(self):
+        self.databases_setting = {
+            alias: {**db, "CONN_MAX_AGE": 600}
+            for alias, db in settings.DATABASES.items()
+        }
+
+    def test_development_profile_is_not_checked(self):
+        """Test the development profile may keep its debug tooling."""
+        with override_settings(APP_PROFILE="development", DEBUG=True):
+            self.assertEqual(check_production_profile(), [])
+
+    def test_clean_production_profile(self):
+        """Test a production profile without debug overhead passes."""
+        self.assertEqual(error_ids(DATABASES=self.databases_setting), [])
+
+    def test_production_profile_with_debug_overhead(self):
+        """Test each piece of debug overhead and per-process state is reported."""
+        ids = error_ids(
+            DEBUG=True,
+            CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+            MIDDLEWARE=["django.contrib.sessions.middleware.SessionMiddleware"],
+            TEMPLATES=[
+                {
+                    "BACKEND": "django.template.backends.django.DjangoTemplates",
+                    "OPTIONS": {
+                        "debug": True,
+                        "context_processors": [
+                            "django.template.context_processors.debug",
+                        ],
+                    },
+                }
+            ],
+        )
+
+        self.assertEqual(
+            sorted(set(ids)),
+            ["core.E001", "core.E002", "core.E003", "core.E004", "core.E005", "core.E006"],
+        )
+
+
+class APIExemptMiddlewareTests(SimpleTestCase):
+    """Test the API variants of the session middleware."""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.middleware = APISessionMiddleware(lambda request: request)
+
+    def test_api_request_skips_session(self):
+        """Test API requests are not given a session."""
+        request = self.middleware(self.factory.get("/api/recipe/recipes/"))
+
+        self.assertFalse(hasattr(request, "session"))
+
+    def test_admin_request_keeps_session(self):
+        """Test non API requests still get a session."""
+        request = self.factory.get("/admin/")
+        self.middleware.process_request(request)
+
+        self.assertTrue(hasattr(request, "session"))
@@ -1,11 +1,19 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
 from unittest.mock import patch
 
+from django.contrib.auth import get_user_model
 from django.core.management import call_command
 
 from psycopg2 import OperationalError as Psycopg2OperationalError
 from django.db.utils import OperationalError
 
-from django.test import SimpleTestCase
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from core.models import Recipe, Tag, Tombstone
+from core.purge import request_user_purge
 
 
 @patch("core.management.commands.wait_for_db.Command.check")
@@ -26,3 +34,121 @@ class CommandTests(SimpleTestCase):
         call_command("wait_for_db")
         self.assertEqual(mocked_check.call_count, 6)
         mocked_check.assert_called_with(databases=["default"])
+
+
+class CheckTagDenormalizationTests(TestCase):
+    """Test the check_tag_denormalization command."""
+
+    def setUp(self):
+        user = get_user_model().objects.create_user("test@example.com", "testpass")
+        self.tag = Tag.objects.create(user=user, name="Vegan")
+        self.recipe = Recipe.objects.create(
+            user=user, title="Sample", time_minutes=5, price=Decimal("5.00")
+        )
+        self.recipe.tags.add(self.tag)
+
+    def run_command(self, *args):
+        out = StringIO()
+        call_command("check_tag_denormalization", *args, stdout=out)
+        return out.getvalue()
+
+    def test_consistent(self):
+        """Test nothing is reported when the columns match the links."""
+        out = self.run_command()
+
+        self.assertIn("All recipe tag snapshots are consistent.", out)
+        self.assertIn("All tag recipe counts are consistent.", out)
+
+    def test_repair_drift(self):
+        """Test drifted rows are reported and repaired."""
+        Recipe.objects.update(tags_snapshot=[])
+        Tag.objects.update(recipe_count=7)
+
+        out = self.run_command()
+        self.assertIn("Found 1 stale recipe tag snapshots.", out)
+        self.assertIn("Found 1 stale tag recipe counts.", out)
+
+        self.run_command("--repair", "--batch-size", "1")
+        self.recipe.refresh_from_db()
+        self.tag.refresh_from_db()
+        self.assertEqual(
+            self.recipe.tags_snapshot, [{"id": self.tag.id, "name": "Vegan"}]
+        )
+        self.assertEqual(self.tag.recipe_count, 1)
+
+
+class PurgeTombstonesTests(TestCase):
+    """Test the purge_tombstones command."""
+
+    def test_purge_expired_tombstones(self):
+        """Test only tombstones past the retention are deleted."""
+        user = get_user_model().objects.create_user("test@example.com", "testpass")
+        old = timezone.now() - timedelta(days=365)
+        for object_id in range(3):
+            Tombstone.objects.create(
+                user=user, kind=Tombstone.RECIPE, object_id=object_id, deleted_at=old
+            )
+        recent = Tombstone.objects.create(user=user, kind=Tombstone.TAG, object_id=1)
+
+        call_command("purge_tombstones", "--batch-size", "2", stdout=StringIO())
+
+        self.assertEqual(list(Tombstone.objects.all()), [recent])
+
+
+class ExportRecipesTests(TestCase):
+    """Test the export_recipes command."""
+
+    def test_export_user_recipes(self):
+        """Test a user's recipes are written as CSV with their tags."""
+        user = get_user_model().objects.create_user("test@example.com", "testpass")
+        other = get_user_model().objects.create_user("other@example.com", "testpass")
+        recipe = Recipe.objects.create(
+            user=user, title="Soup, hot", time_minutes=5, price=Decimal("2.50")
+        )
+        recipe.tags.add(
+            Tag.objects.create(user=user, name="Vegan"),
+            Tag.objects.create(user=user, name="Quick"),
+        )
+        Recipe.objects.create(user=other, title="Other", time_minutes=5, price=Decimal("1.00"))
+        out = StringIO()
+
+        call_command("export_recipes", "--user", "test@example.com", stdout=out)
+
+        lines = out.getvalue().splitlines()
+        self.assertEqual(
+            lines[0], "id,title,time_minutes,price,link,description,tags,updated_at"
+        )
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].startswith(f'{recipe.id},"Soup, hot",5,2.50,"","",Quick|Vegan,'))
+
+
+class PurgeUsersTests(TestCase):
+    """Test the purge_users command."""
+
+    def create_library(self, email):
+        user = get_user_model().objects.create_user(email, "testpass")
+        tag = Tag.objects.create(user=user, name="Vegan")
+        for i in range(3):
+            recipe = Recipe.objects.create(
+                user=user, title=f"Recipe {i}", time_minutes=5, price=Decimal("1.00")
+            )
+            recipe.tags.add(tag)
+        recipe.delete()
+        return user
+
+    def test_purge_requested_users(self):
+        """Test only users queued for purging are deleted, with their data."""
+        user = self.create_library("test@example.com")
+        other = self.create_library("other@example.com")
+        request_user_purge(user)
+        out = StringIO()
+
+        call_command("purge_users", "--batch-size", "1", stdout=out)
+
+        self.assertFalse(get_user_model().objects.filter(pk=user.pk).exists())
+        self.assertFalse(Recipe.objects.filter(user_id=user.pk).exists())
+        self.assertFalse(Tag.objects.filter(user_id=user.pk).exists())
+        self.assertFalse(Tombstone.objects.filter(user_id=user.pk).exists())
+        self.assertFalse(Recipe.tags.through.objects.filter(tag__user_id=user.pk).exists())
+        self.assertEqual(Recipe.objects.filter(user=other).count(), 2)
+        self.assertIn("test@example.com: deleted 2 recipes", out.getvalue())
@@ -0,0 +1,129 @@
+"""
+Tests for API response compression.
+"""
+
+import gzip
+import unittest
+import warnings
+
+from django.core.cache import caches
+from django.core.cache.backends.base import CacheKeyWarning
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from core import compression
+from core.middleware import CompressionMiddleware
+
+BODY = b'{"title": "Sample Recipe", "time_minutes": 10}' * 100
+
+
+def compress_response(response, path="/api/recipe/recipes/", encoding="gzip"):
+    """Run a response through the compression middleware."""
+    request = RequestFactory().get(path, HTTP_ACCEPT_ENCODING=encoding)
+    return CompressionMiddleware(lambda req: response)(request)
+
+
+class NegotiateEncodingTests(SimpleTestCase):
+    """Test Accept-Encoding negotiation."""
+
+    def test_gzip(self):
+        """Test gzip is picked when it is the only accepted coding."""
+        self.assertEqual(compression.negotiate_encoding("gzip, deflate"), "gzip")
+
+    def test_nothing_acceptable(self):
+        """Test no coding is picked for identity only clients."""
+        self.assertIsNone(compression.negotiate_encoding(""))
+        self.assertIsNone(compression.negotiate_encoding("gzip;q=0, deflate"))
+
+    @unittest.skipIf(compression.brotli is None, "brotli is not installed")
+    def test_brotli_preferred(self):
+        """Test brotli wins over gzip unless the client ranks it lower."""
+        self.assertEqual(compression.negotiate_encoding("gzip, br"), "br")
+        self.assertEqual(compression.negotiate_encoding("gzip, br;q=0.5"), "gzip")
+
+
+class CompressionMiddlewareTests(SimpleTestCase):
+    """Test the compression middleware."""
+
+    def setUp(self):
+        caches["compression"].clear()
+
+    def test_compresses_large_api_response(self):
+        """Test large API bodies are gzipped and the ratio reported."""
+        response = compress_response(HttpResponse(BODY))
+
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(response.content), BODY)
+        self.assertEqual(response["Content-Length"], str(len(response.content)))
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertIn("ratio=", response["Server-Timing"])
+
+    def test_cached_body_reuses_compressed_bytes(self):
+        """Test a body marked as cached reuses its compressed bytes."""
+        compress_response(compression.cache_compressed_as(HttpResponse(BODY), "body:1"))
+        response = compress_response(
+            compression.cache_compressed_as(HttpResponse(BODY), "body:1")
+        )
+
+        self.assertIn("cached", response["Server-Timing"])
+        self.assertEqual(gzip.decompress(response.content), BODY)
+
+    def test_media_type_variants_cached_apart(self):
+        """Test renderings of one entry for different media types are kept apart."""
+        def render(body, media_type):
+            response = compression.cache_compressed_as(HttpResponse(body), "body:1")
+            response.accepted_media_type = media_type
+            response["Content-Type"] = media_type
+            return compress_response(response)
+
+        indented = BODY.replace(b", ", b",\n    ")
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", CacheKeyWarning)
+            render(BODY, "application/json")
+            response = render(indented, "application/json; indent=4")
+
+        self.assertNotIn("cached", response["Server-Timing"])
+        self.assertEqual(gzip.decompress(response.content), indented)
+
+    def test_unmarked_body_not_cached(self):
+        """Test bodies not rendered from a cache entry are not stored."""
+        compress_response(HttpResponse(BODY))
+        response = compress_response(HttpResponse(BODY))
+
+        self.assertNotIn("cached", response["Server-Timing"])
+        self.assertEqual(caches["compression"]._cache, {})
+
+    @override_settings(COMPRESSION_CACHE_TIMEOUT=0)
+    def test_cache_disabled(self):
+        """Test bodies are compressed every time without the cache."""
+        compress_response(compression.cache_compressed_as(HttpResponse(BODY), "body:1"))
+        response = compress_response(
+            compression.cache_compressed_as(HttpResponse(BODY), "body:1")
+        )
+
+        self.assertNotIn("cached", response["Server-Timing"])
+
+    def test_small_and_non_api_responses_untouched(self):
+        """Test short bodies and non API paths are not compressed."""
+        small = compress_response(HttpResponse(b"{}"))
+        admin = compress_response(HttpResponse(BODY), path="/admin/")
+
+        self.assertFalse(small.has_header("Content-Encoding"))
+        self.assertFalse(admin.has_header("Content-Encoding"))
+        self.assertEqual(admin.content, BODY)
+
+    def test_streaming_response(self):
+        """Test streamed bodies are compressed incrementally."""
+        chunks = [BODY[:1000], BODY[1000:]]
+        response = compress_response(StreamingHttpResponse(iter(chunks)))
+
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(b"".join(response.streaming_content)), BODY)
+
+    @unittest.skipIf(compression.brotli is None, "brotli is not installed")
+    def test_brotli_response(self):
+        """Test brotli encoded bodies round trip."""
+        response = compress_response(HttpResponse(BODY), encoding="br")
+
+        self.assertEqual(response["Content-Encoding"], "br")
+        self.assertEqual(compression.brotli.decompress(response.content), BODY)
@@ -0,0 +1,42 @@
+"""
+Tests for estimated row counts.
+"""
+
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from core import counts
+from core.models import Recipe
+
+
+class CountTests(TestCase):
+    """Test core.counts.count."""
+
+    def setUp(self):
+        user = get_user_model().objects.create_user(
+            email="test@example.com", password="password123"
+        )
+        Recipe.objects.bulk_create(
+            Recipe(user=user, title=f"Recipe {i}", time_minutes=5, price=Decimal("5.00"))
+            for i in range(5)
+        )
+
+    def test_exact_below_limit(self):
+        """Test querysets within the limit are counted exactly."""
+        self.assertEqual(counts.count(Recipe.objects.all(), limit=10), (5, False))
+
+    def test_estimate_above_limit(self):
+        """Test larger querysets report an approximate count."""
+        value, approximate = counts.count(Recipe.objects.all(), limit=2)
+
+        self.assertTrue(approximate)
+        self.assertGreaterEqual(value, 3)
+
+    def test_filtered_estimate_uses_plan(self):
+        """Test filtered querysets are estimated from the query plan."""
+        queryset = Recipe.objects.filter(title__startswith="Recipe")
+
+        self.assertGreaterEqual(counts.estimate_count(queryset), 1)
+        self.assertGreaterEqual(counts.count(queryset, limit=2)[0], 3)
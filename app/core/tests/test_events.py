@@ -0,0 +1,145 @@
+"""
+Tests for the server-sent events stream.
+"""
+
+import json
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync, sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from django.contrib.auth import get_user_model
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework.test import APIClient
+
+from core.events import events_app, listener
+from core.models import AuthToken, Recipe, StreamTicket, Tag
+
+TICKET_URL = reverse("core:events-ticket")
+
+
+def stream_scope(token=None, method="GET", query_string=b""):
+    headers = [(b"authorization", f"Token {token}".encode())] if token else []
+    return {
+        "type": "http",
+        "method": method,
+        "path": "/api/events/",
+        "query_string": query_string,
+        "headers": headers,
+    }
+
+
+class EventStreamTests(TransactionTestCase):
+    """Test change events pushed through LISTEN/NOTIFY."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("test@example.com", "testpass")
+        self.token = AuthToken.objects.issue(self.user).key
+
+    def tearDown(self):
+        # The listener holds a connection to the test database.
+        listener.stop()
+
+    def test_requires_token(self):
+        """Test streams are refused without a valid token."""
+        async def run():
+            app = ApplicationCommunicator(events_app, stream_scope("bad"))
+            await app.send_input({"type": "http.request", "body": b""})
+            return await app.receive_output(5)
+
+        self.assertEqual(async_to_sync(run)()["status"], 401)
+
+    def open_stream(self, scope):
+        """Return the status of a stream opened with a scope."""
+        async def run():
+            app = ApplicationCommunicator(events_app, scope)
+            await app.send_input({"type": "http.request", "body": b""})
+            start = await app.receive_output(5)
+            if start["status"] == 200:
+                await app.send_input({"type": "http.disconnect"})
+                await app.wait(5)
+            return start["status"]
+
+        return async_to_sync(run)()
+
+    def test_token_not_accepted_in_url(self):
+        """Test API tokens in the query string are refused."""
+        scope = stream_scope(query_string=f"token={self.token}".encode())
+
+        self.assertEqual(self.open_stream(scope), 401)
+
+    def test_ticket_used_once(self):
+        """Test a stream ticket opens one stream."""
+        ticket = StreamTicket.objects.issue(self.user).key
+        scope = stream_scope(query_string=f"ticket={ticket}".encode())
+
+        self.assertEqual(self.open_stream(scope), 200)
+        self.assertEqual(self.open_stream(scope), 401)
+
+    def test_expired_ticket_refused(self):
+        """Test tickets expire after EVENTS_TICKET_SECONDS."""
+        ticket = StreamTicket.objects.issue(self.user)
+        ticket.created = timezone.now() - timedelta(minutes=1)
+        ticket.save()
+        scope = stream_scope(query_string=f"ticket={ticket.key}".encode())
+
+        self.assertEqual(self.open_stream(scope), 401)
+
+    def test_user_receives_own_changes(self):
+        """Test committed changes reach the owner's stream only."""
+        other = get_user_model().objects.create_user("other@example.com", "testpass")
+
+        def write():
+            Tag.objects.create(user=other, name="Hidden")
+            recipe = Recipe.objects.create(
+                user=self.user, title="Soup", time_minutes=5, price=1
+            )
+            recipe_id = recipe.id
+            recipe.delete()
+            return recipe_id
+
+        async def run():
+            app = ApplicationCommunicator(events_app, stream_scope(self.token))
+            await app.send_input({"type": "http.request", "body": b""})
+            start = await app.receive_output(5)
+            await app.receive_output(5)
+            recipe_id = await sync_to_async(write)()
+            bodies = [(await app.receive_output(5))["body"] for _ in range(2)]
+            await app.send_input({"type": "http.disconnect"})
+            await app.wait(5)
+            return start, recipe_id, bodies
+
+        start, recipe_id, bodies = async_to_sync(run)()
+
+        self.assertEqual(start["status"], 200)
+        self.assertIn((b"content-type", b"text/event-stream"), start["headers"])
+        data = json.dumps({"id": recipe_id})
+        # The other user's tag comes first but is not delivered.
+        self.assertEqual(bodies, [
+            f"event: recipe.created\ndata: {data}\n\n".encode(),
+            f"event: recipe.deleted\ndata: {data}\n\n".encode(),
+        ])
+
+
+class EventTicketApiTests(TestCase):
+    """Test issuing event stream tickets."""
+
+    def test_auth_required(self):
+        """Test tickets are only issued to authenticated users."""
+        res = APIClient().post(TICKET_URL)
+
+        self.assertEqual(res.status_code, 401)
+
+    def test_issue_ticket(self):
+        """Test a ticket is issued for the requesting user."""
+        user = get_user_model().objects.create_user("test@example.com", "testpass")
+        client = APIClient()
+        client.force_authenticate(user)
+
+        res = client.post(TICKET_URL)
+
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual(StreamTicket.objects.get(key=res.data["ticket"]).user, user)
+        self.assertEqual(res.data["expires_in"], 30)
@@ -0,0 +1,69 @@
+"""
+Tests for the password hashers.
+"""
+
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import check_password, make_password
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core import hashers
+
+
+class PooledHasherTests(SimpleTestCase):
+    """Test the settings driven PBKDF2 hasher."""
+
+    @override_settings(PASSWORD_HASH_ITERATIONS=1000)
+    def test_iterations_from_settings(self):
+        """Test new hashes use the configured iteration count."""
+        encoded = make_password("testpass")
+
+        self.assertTrue(encoded.startswith("pbkdf2_sha256$1000$"))
+        self.assertTrue(check_password("testpass", encoded))
+
+    @override_settings(PASSWORD_HASH_ITERATIONS=1000, PASSWORD_HASHING_POOL_SIZE=1)
+    def test_pool_matches_inline_hash(self):
+        """Test hashing in the process pool gives the inline result."""
+        hasher = hashers.PooledPBKDF2PasswordHasher()
+        pooled = hasher.encode("testpass", "somesalt")
+
+        with override_settings(PASSWORD_HASHING_POOL_SIZE=0):
+            inline = hasher.encode("testpass", "somesalt")
+            self.assertIsNone(hashers.get_hashing_pool())
+
+        self.assertEqual(pooled, inline)
+
+    def test_benchmark_command(self):
+        """Test the benchmark reports each iteration count."""
+        out = StringIO()
+        call_command(
+            "benchmark_password_hashers", "--iterations", "1000", "2000",
+            "--rounds", "1", stdout=out,
+        )
+
+        self.assertIn("pbkdf2_sha256 x1000", out.getvalue())
+        self.assertIn("pbkdf2_sha256 x2000", out.getvalue())
+
+
+class RehashOnLoginTests(TestCase):
+    """Test hashes are upgraded when the cost changes."""
+
+    def test_login_rehashes_password(self):
+        """Test logging in upgrades a hash made with the old cost."""
+        with override_settings(PASSWORD_HASH_ITERATIONS=1000):
+            user = get_user_model().objects.create_user("test@example.com", "testpass")
+
+        with override_settings(PASSWORD_HASH_ITERATIONS=2000):
+            res = APIClient().post(
+                reverse("user:token"),
+                {"email": "test@example.com", "password": "testpass"},
+            )
+
+        self.assertEqual(res.status_code, 200)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith("pbkdf2_sha256$2000$"))
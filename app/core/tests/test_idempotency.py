@@ -0,0 +1,82 @@
+"""
+Tests for Idempotency-Key handling.
+"""
+
+import hashlib
+import json
+import threading
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework.test import APIClient
+
+from core.models import IdempotencyKey, Recipe
+
+RECIPES_URL = reverse("recipe:recipe-list")
+CREATE_USER_URL = reverse("user:create")
+
+
+class IdempotencyFingerprintTests(TestCase):
+    """Test how request payloads are stored."""
+
+    def test_fingerprint_not_plain_hash(self):
+        """Test payloads with passwords are not stored as a plain hash."""
+        payload = {"email": "test@example.com", "password": "testpass123", "name": "Test"}
+
+        res = APIClient().post(CREATE_USER_URL, payload, format="json", HTTP_IDEMPOTENCY_KEY="k")
+
+        self.assertEqual(res.status_code, 201)
+        plain = hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+        self.assertNotEqual(IdempotencyKey.objects.get(key="k").request_hash, plain)
+
+
+class ConcurrentIdempotencyTests(TransactionTestCase):
+    """Test concurrent duplicates are coalesced."""
+
+    def test_concurrent_duplicates_run_once(self):
+        """Test simultaneous requests with one key create one recipe."""
+        user = get_user_model().objects.create_user("test@example.com", "testpass")
+        payload = {"title": "Soup", "time_minutes": 5, "price": "2.00"}
+        results = []
+
+        def post():
+            client = APIClient()
+            client.force_authenticate(user)
+            try:
+                res = client.post(RECIPES_URL, payload, HTTP_IDEMPOTENCY_KEY="same")
+                results.append((res.status_code, res.data["id"]))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=post) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(Recipe.objects.count(), 1)
+        self.assertEqual(len(set(results)), 1)
+
+
+class PurgeIdempotencyKeysTests(TestCase):
+    """Test the purge_idempotency_keys command."""
+
+    def test_purge_expired_keys(self):
+        """Test only expired keys are deleted."""
+        now = timezone.now()
+        for key, expires_at in (("old", now - timedelta(hours=1)), ("new", now + timedelta(hours=1))):
+            IdempotencyKey.objects.create(
+                scope="/api/user/create/:", key=key, request_hash="x",
+                status_code=201, expires_at=expires_at,
+            )
+
+        call_command("purge_idempotency_keys", stdout=StringIO())
+
+        self.assertEqual(list(IdempotencyKey.objects.values_list("key", flat=True)), ["new"])
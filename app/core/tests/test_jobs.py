@@ -0,0 +1,150 @@
+"""
+Tests for background jobs.
+"""
+
+import threading
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import jobs
+from core.models import Job, Recipe
+from core.purge import request_user_purge
+
+calls = []
+
+
+@jobs.task("test_add")
+def add(a, b):
+    calls.append((a, b))
+    return a + b
+
+
+@jobs.task("test_fail")
+def fail():
+    raise RuntimeError("boom")
+
+
+def create_user(email="test@example.com"):
+    return get_user_model().objects.create_user(email, "testpass")
+
+
+class JobQueueTests(TestCase):
+    """Test claiming and running jobs."""
+
+    def test_enqueue_unknown_job(self):
+        """Test only registered jobs can be queued."""
+        with self.assertRaises(ValueError):
+            jobs.enqueue("missing")
+
+    def test_run_job(self):
+        """Test a claimed job runs and stores its result."""
+        job = jobs.enqueue("test_add", {"a": 1, "b": 2})
+
+        claimed = jobs.claim()
+        self.assertEqual(claimed, [job])
+        self.assertEqual(jobs.claim(), [])
+        jobs.run_job(claimed[0])
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.SUCCEEDED)
+        self.assertEqual(job.result, 3)
+        self.assertEqual(job.attempts, 1)
+
+    def test_future_job_not_claimed(self):
+        """Test jobs are not claimed before their run_at."""
+        jobs.enqueue("test_add", {"a": 1, "b": 2}, run_at=timezone.now() + timedelta(hours=1))
+
+        self.assertEqual(jobs.claim(), [])
+
+    @override_settings(JOB_RETRY_BACKOFF_SECONDS=60)
+    def test_retry_with_backoff(self):
+        """Test failed jobs are retried later, then marked failed."""
+        job = jobs.enqueue("test_fail", max_attempts=2)
+
+        jobs.run_job(jobs.claim()[0])
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertIn("RuntimeError: boom", job.error)
+        self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=25))
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        jobs.run_job(jobs.claim()[0])
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 2)
+        self.assertIsNotNone(job.finished_at)
+
+    def test_abandoned_job_reclaimed(self):
+        """Test jobs locked by a dead worker are claimed again."""
+        job = jobs.enqueue("test_add", {"a": 1, "b": 2})
+        jobs.claim()
+        Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(days=1))
+
+        self.assertEqual(jobs.claim(), [job])
+
+
+class JobApiTests(TestCase):
+    """Test the job status endpoints."""
+
+    def setUp(self):
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_poll_own_job(self):
+        """Test users can poll their own jobs only."""
+        job = jobs.enqueue("test_add", {"a": 1, "b": 2}, user=self.user)
+        other = jobs.enqueue("test_add", {"a": 1, "b": 2}, user=create_user("other@example.com"))
+
+        res = self.client.get(reverse("core:job-detail", args=[job.id]))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["status"], Job.QUEUED)
+
+        res = self.client.get(reverse("core:job-detail", args=[other.id]))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+        res = self.client.get(reverse("core:job-list"))
+        self.assertEqual([item["id"] for item in res.data], [job.id])
+
+
+class WorkerTests(TransactionTestCase):
+    """Test the run_worker command, whose threads use their own connections."""
+
+    def test_locked_job_skipped(self):
+        """Test a job locked by another worker is skipped, not waited for."""
+        job = jobs.enqueue("test_add", {"a": 1, "b": 2})
+        claimed = []
+
+        with transaction.atomic():
+            Job.objects.select_for_update().get(pk=job.pk)
+            thread = threading.Thread(target=lambda: claimed.extend(jobs.claim()))
+            thread.start()
+            thread.join()
+        connection.close()
+
+        self.assertEqual(claimed, [])
+
+    def test_worker_runs_queue(self):
+        """Test the worker drains the queue, including a user purge."""
+        calls.clear()
+        user = create_user()
+        Recipe.objects.create(user=user, title="Soup", time_minutes=5, price=1)
+        request_user_purge(user)
+        for i in range(4):
+            jobs.enqueue("test_add", {"a": i, "b": 1})
+
+        call_command("run_worker", "--concurrency", "2", "--once", stdout=StringIO())
+
+        self.assertEqual(sorted(calls), [(i, 1) for i in range(4)])
+        self.assertEqual(Job.objects.filter(status=Job.SUCCEEDED).count(), 5)
+        self.assertFalse(get_user_model().objects.filter(pk=user.pk).exists())
@@ -0,0 +1,120 @@
+"""
+Tests for the metrics registry and endpoint.
+"""
+
+import json
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core import metrics
+
+
+class RegistryTests(SimpleTestCase):
+    """Test recording and rendering metrics."""
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        override = override_settings(METRICS_DIR=self.dir.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_histogram(self):
+        """Test histograms render cumulative buckets, sum and count."""
+        registry = metrics.Registry()
+        # Stand in for another worker, so rendering does not overwrite it.
+        registry.pid = 999997
+        for value in (0.003, 0.2, 30):
+            registry.observe("db_query_duration_seconds", value, ("test:histogram",))
+        registry.maybe_flush(force=True)
+
+        text = metrics.render()
+
+        route = 'route="test:histogram"'
+        self.assertIn(f'db_query_duration_seconds_bucket{{{route},le="0.005"}} 1', text)
+        self.assertIn(f'db_query_duration_seconds_bucket{{{route},le="0.25"}} 2', text)
+        self.assertIn(f'db_query_duration_seconds_bucket{{{route},le="+Inf"}} 3', text)
+        self.assertIn(f"db_query_duration_seconds_count{{{route}}} 3", text)
+        self.assertIn("# TYPE db_query_duration_seconds histogram", text)
+
+    def test_processes_merged(self):
+        """Test the files of other processes are summed, dead ones included."""
+        key = 'auth_token_cache_total|["test-merge"]'
+        for pid in (999998, 999999):
+            with open(os.path.join(self.dir.name, f"{pid}.json"), "w") as file:
+                json.dump({key: 2}, file)
+
+        text = metrics.render()
+
+        self.assertIn('auth_token_cache_total{result="test-merge"} 4', text)
+        self.assertNotIn('pid="999999"', text)
+        self.assertIn(f'process_resident_memory_bytes{{pid="{os.getpid()}"}}', text)
+
+    def test_dead_processes_folded(self):
+        """Test files of exited processes are removed without losing counts."""
+        key = 'auth_token_cache_total|["test-fold"]'
+        for pid in (999998, 999999):
+            with open(os.path.join(self.dir.name, f"{pid}.json"), "w") as file:
+                json.dump({key: 2}, file)
+        metrics.render()
+        with open(os.path.join(self.dir.name, "999999.json"), "w") as file:
+            json.dump({key: 1}, file)
+
+        text = metrics.render()
+
+        self.assertIn('auth_token_cache_total{result="test-fold"} 5', text)
+        files = {name for name in os.listdir(self.dir.name) if name.endswith(".json")}
+        self.assertEqual(files, {"dead.json", f"{os.getpid()}.json"})
+
+
+@override_settings(METRICS_TOKEN="secret")
+class MetricsEndpointTests(TestCase):
+    """Test requests are measured and exposed at /metrics."""
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+
+    def test_request_recorded_by_route(self):
+        """Test API requests are recorded under their route name."""
+        user = get_user_model().objects.create_user("test@example.com", "testpass")
+        client = APIClient()
+        client.force_authenticate(user)
+
+        with override_settings(METRICS_DIR=self.dir.name):
+            client.get(reverse("recipe:recipe-list"))
+            res = self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer secret")
+
+        self.assertEqual(res.status_code, 200)
+        text = res.content.decode()
+        self.assertIn(
+            'http_request_duration_seconds_count{route="recipe:recipe-list",'
+            'method="GET",status="200"}',
+            text,
+        )
+        self.assertIn('db_queries_per_request_count{route="recipe:recipe-list"}', text)
+        self.assertIn('http_response_size_bytes_count{route="recipe:recipe-list"}', text)
+
+    def test_token_required(self):
+        """Test scrapes must send the configured bearer token."""
+        with override_settings(METRICS_DIR=self.dir.name):
+            denied = self.client.get(reverse("metrics"))
+            wrong = self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer wrong")
+            allowed = self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer secret")
+
+        self.assertEqual(denied.status_code, 401)
+        self.assertEqual(wrong.status_code, 401)
+        self.assertEqual(allowed.status_code, 200)
+
+    @override_settings(METRICS_TOKEN="")
+    def test_disabled_without_token(self):
+        """Test /metrics is not served when no token is configured."""
+        res = self.client.get(reverse("metrics"))
+
+        self.assertEqual(res.status_code, 404)
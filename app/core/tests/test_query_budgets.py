@@ -0,0 +1,144 @@
+"""
+Query budgets of the API routes.
+"""
+
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.db import transaction
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.models import AuthToken, Job, Recipe, Tag
+from core.tests.query_budget import describe_queries, query_budget
+
+SIZES = (1, 10, 100)
+
+
+def populate(user, size):
+    """Create size tags and recipes, the first recipe using every tag.
+
+    Each recipe has its own tag, and a twin shares the first one, so even
+    the smallest size has similar recipes.
+    """
+    tags = Tag.objects.bulk_create(
+        Tag(user=user, name=f"Tag {i}", recipe_count=2) for i in range(size)
+    )
+    recipes = Recipe.objects.bulk_create(
+        Recipe(
+            user=user, title=f"Recipe {i}", time_minutes=i + 1, price=Decimal("5.00"),
+            tags_snapshot=[{"id": tag.id, "name": tag.name}],
+        )
+        for i, tag in enumerate(tags + tags[:1])
+    )
+    links = {(recipes[0].id, tag.id) for tag in tags}
+    links.update((recipe.id, tag.id) for recipe, tag in zip(recipes, tags + tags[:1]))
+    Recipe.tags.through.objects.bulk_create(
+        Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id) for recipe_id, tag_id in links
+    )
+    jobs = Job.objects.bulk_create(
+        Job(name="purge_user", payload={"user_id": 0}, user=user, max_attempts=1)
+        for _ in range(size)
+    )
+    return {
+        "recipe": recipes[0].id,
+        "tag": tags[0].id,
+        "job": jobs[0].id,
+        "tags": [{"name": tag.name} for tag in tags],
+    }
+
+
+def recipe_url(data, action="detail"):
+    return reverse(f"recipe:recipe-{action}", args=[data["recipe"]])
+
+
+def tag_url(data):
+    return reverse("recipe:tag-detail", args=[data["tag"]])
+
+
+def batch(data):
+    return {"requests": [
+        {"path": recipe_url(data)},
+        {"path": reverse("recipe:tag-list")},
+    ]}
+
+
+# (name, method, url, payload, budget). Budgets are per request and must
+# hold whether the user has 1, 10 or 100 recipes, tags and jobs. Requests
+# carry a token the cache has not seen, so budgets include its lookup.
+# The export's COPY runs on a connection of its own and is not counted.
+ROUTES = [
+    ("signup", "post", lambda data: reverse("user:create"),
+     lambda data: {"email": "new@example.com", "password": "testpass", "name": "New"}, 2),
+    ("login", "post", lambda data: reverse("user:token"),
+     lambda data: {"email": "test@example.com", "password": "testpass"}, 2),
+    ("recipe list", "get", lambda data: reverse("recipe:recipe-list"), None, 2),
+    ("recipe page", "get", lambda data: reverse("recipe:recipe-list") + "?limit=20", None, 3),
+    ("recipe detail", "get", recipe_url, None, 3),
+    ("recipe create", "post", lambda data: reverse("recipe:recipe-list"),
+     lambda data: {"title": "New", "time_minutes": 5, "price": "1.00", "tags": data["tags"]}, 12),
+    ("recipe update", "patch", recipe_url, lambda data: {"title": "Renamed"}, 4),
+    ("recipe replace", "put", recipe_url,
+     lambda data: {"title": "Replaced", "time_minutes": 5, "price": "1.00", "tags": data["tags"]}, 9),
+    ("recipe retag", "patch", recipe_url, lambda data: {"tags": [{"name": "Fresh"}]}, 19),
+    ("recipe delete", "delete", recipe_url, None, 8),
+    ("similar recipes", "get", lambda data: recipe_url(data, "similar"), None, 4),
+    ("recipe stats", "get", lambda data: reverse("recipe:recipe-stats"), None, 2),
+    ("recipe export", "get", lambda data: reverse("recipe:recipe-export"), None, 1),
+    ("tag list", "get", lambda data: reverse("recipe:tag-list"), None, 2),
+    ("tag list with counts", "get", lambda data: reverse("recipe:tag-list") + "?with_counts=1", None, 2),
+    ("tag autocomplete", "get", lambda data: reverse("recipe:tag-list") + "?prefix=tag", None, 2),
+    ("tag rename", "patch", tag_url, lambda data: {"name": "Renamed"}, 6),
+    ("tag delete", "delete", tag_url, None, 8),
+    ("sync", "get", lambda data: reverse("recipe:sync"), None, 3),
+    ("profile", "get", lambda data: reverse("user:me"), None, 1),
+    ("profile update", "patch", lambda data: reverse("user:me"), lambda data: {"name": "New"}, 3),
+    ("account delete", "delete", lambda data: reverse("user:me"), None, 8),
+    ("job list", "get", lambda data: reverse("core:job-list"), None, 2),
+    ("job detail", "get", lambda data: reverse("core:job-detail", args=[data["job"]]), None, 2),
+    ("event ticket", "post", lambda data: reverse("core:events-ticket"), None, 3),
+    ("slow queries", "get", lambda data: reverse("core:slow-queries"), None, 1),
+    ("batch", "post", lambda data: reverse("core:batch"), batch, 4),
+]
+
+
+class RouteQueryBudgetTests(TestCase):
+    """Test API routes run a bounded number of queries, whatever the data size."""
+
+    def run_route(self, method, url, payload, size, budget):
+        """Run a request as a user with size objects, returning its queries."""
+        with transaction.atomic():
+            # Staff, for the admin-only routes.
+            user = get_user_model().objects.create_user(
+                "test@example.com", "testpass", is_staff=True
+            )
+            data = populate(user, size)
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f"Token {AuthToken.objects.issue(user).key}")
+            cache.clear()
+            try:
+                with query_budget(budget) as context:
+                    res = getattr(client, method)(
+                        url(data), payload and payload(data), format="json"
+                    )
+                    if res.streaming:
+                        b"".join(res.streaming_content)
+            finally:
+                transaction.set_rollback(True)
+        self.assertLess(res.status_code, 300, getattr(res, "data", None))
+        return context.captured_queries
+
+    def test_route_budgets(self):
+        """Test each route stays within its budget at 1, 10 and 100 objects."""
+        for name, method, url, payload, budget in ROUTES:
+            with self.subTest(route=name):
+                runs = [self.run_route(method, url, payload, size, budget) for size in SIZES]
+                counts = [len(queries) for queries in runs]
+                if len(set(counts)) > 1:
+                    self.fail(
+                        f"Queries grew with the data, {counts} at sizes {SIZES}:\n"
+                        f"{describe_queries(runs[-1])}"
+                    )
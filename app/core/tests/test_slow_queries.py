@@ -0,0 +1,89 @@
+"""
+Tests for slow query capture.
+"""
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import slow_queries
+from core.models import Recipe
+
+
+class FingerprintTests(SimpleTestCase):
+    """Test normalizing queries into fingerprints."""
+
+    def test_literals_folded(self):
+        """Test queries differing only in values share a fingerprint."""
+        first = slow_queries.fingerprint("SELECT * FROM t WHERE id IN (1, 2, 3) AND name = 'a'")
+        second = slow_queries.fingerprint("SELECT *  FROM t\nWHERE id IN (%s, %s) AND name = %s")
+
+        self.assertEqual(first, second)
+        self.assertEqual(first[1], "SELECT * FROM t WHERE id IN (...) AND name = ?")
+
+    def test_top_k_bounded(self):
+        """Test only the slowest fingerprints are kept."""
+        slow_queries.reset()
+        self.addCleanup(slow_queries.reset)
+        with override_settings(SLOW_QUERY_TOP_K=2):
+            for i, duration in enumerate((50, 10, 30)):
+                slow_queries.record(f"SELECT {i} FROM t{i}", duration, None, None, None)
+
+        self.assertEqual([entry["max_ms"] for entry in slow_queries.slowest()], [50, 30])
+
+
+class SlowQueryCaptureTests(TestCase):
+    """Test capturing slow queries of API requests."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("test@example.com", "testpass")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        slow_queries.install(None, connection)
+        slow_queries.reset()
+        self.addCleanup(slow_queries.reset)
+
+    def test_request_query_captured(self):
+        """Test slow queries are logged with their route, view and plan."""
+        Recipe.objects.create(user=self.user, title="Soup", time_minutes=5, price=1)
+
+        with override_settings(SLOW_QUERY_THRESHOLD_MS=0, SLOW_QUERY_EXPLAIN_SAMPLE_RATE=1), \
+                self.assertLogs("core.slow_queries", "WARNING") as logs:
+            self.client.get(reverse("recipe:recipe-list"))
+
+        entries = [
+            entry for entry in slow_queries.slowest()
+            if entry["sql"].startswith('SELECT "core_recipe"')
+        ]
+        self.assertTrue(entries)
+        self.assertEqual(entries[0]["route"], "recipe:recipe-list")
+        self.assertEqual(entries[0]["view"], "recipe.views.RecipeViewSet")
+        self.assertIn("Plan", entries[0]["plan"][0])
+        self.assertIn("route=recipe:recipe-list", logs.output[-1])
+
+    def test_failed_explain_keeps_transaction(self):
+        """Test a query that cannot be explained leaves the transaction usable."""
+        plan = slow_queries._explain(connection, "SELECT missing FROM core_recipe", [])
+
+        self.assertIsNone(plan)
+        self.assertEqual(Recipe.objects.count(), 0)
+
+    def test_staff_only(self):
+        """Test only staff can read and reset the slow query table."""
+        url = reverse("core:slow-queries")
+
+        res = self.client.get(url)
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.user.is_staff = True
+        self.user.save()
+        res = self.client.get(url)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn("queries", res.data)
+
+        res = self.client.delete(url)
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,154 @@
+"""
+Tests for the token bucket rate limits.
+"""
+
+import json
+import multiprocessing
+import os
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import metrics
+from core.throttling import SET_SIZE, BucketStore
+
+TOKEN_URL = reverse("user:token")
+RECIPES_URL = reverse("recipe:recipe-list")
+
+
+def take_in_child(path, key, count):
+    store = BucketStore(path, 64)
+    for _ in range(count):
+        store.take([key], 2, 1)
+
+
+class BucketStoreTests(SimpleTestCase):
+    """Test the shared token buckets."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "buckets")
+
+    def test_take_and_refill(self):
+        """Test buckets allow bursts up to capacity, then refill over time."""
+        store = BucketStore(self.path, 64)
+
+        self.assertEqual(store.take(["a"], 2, 0.5, now=100), 0)
+        self.assertEqual(store.take(["a"], 2, 0.5, now=100), 0)
+        self.assertEqual(store.take(["a"], 2, 0.5, now=100), 2)
+        self.assertEqual(store.take(["b"], 2, 0.5, now=100), 0)
+        self.assertEqual(store.take(["a"], 2, 0.5, now=102), 0)
+
+    def test_refused_take_leaves_other_buckets(self):
+        """Test a bucket without tokens keeps the others from being taken."""
+        store = BucketStore(self.path, 64)
+        store.take(["ip"], 1, 1, now=100)
+
+        for _ in range(3):
+            self.assertEqual(store.take(["ip", "account"], 1, 1, now=100), 1)
+        self.assertEqual(store.take(["account"], 1, 1, now=100), 0)
+
+    def test_keys_in_one_set(self):
+        """Test keys sharing a set get a bucket each."""
+        store = BucketStore(self.path, SET_SIZE)
+
+        self.assertEqual(store.take(["a", "b"], 1, 1, now=100), 0)
+        self.assertEqual(store.take(["a"], 1, 1, now=100), 1)
+        self.assertEqual(store.take(["b"], 1, 1, now=100), 1)
+
+    def test_full_set_evicts_oldest(self):
+        """Test a key whose set is full takes over the least recent slot."""
+        store = BucketStore(self.path, SET_SIZE)
+        store.take(["first"], 1, 1, now=100)
+        for i in range(SET_SIZE):
+            store.take([f"key{i}"], 1, 1, now=101)
+
+        self.assertEqual(store.take(["first"], 1, 1, now=101), 0)
+
+    def test_shared_across_processes(self):
+        """Test tokens taken by another process are seen by this one."""
+        child = multiprocessing.get_context("fork").Process(
+            target=take_in_child, args=(self.path, "shared", 2)
+        )
+        child.start()
+        child.join()
+
+        self.assertGreater(BucketStore(self.path, 64).take(["shared"], 2, 1), 0)
+
+
+class ThrottleApiTests(TestCase):
+    """Test API requests are throttled per scope."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        rates = {"login": "2/min", "writes": "1/min", "reads": "100/min"}
+        override = override_settings(
+            THROTTLE_STORE_PATH=os.path.join(directory.name, "buckets"),
+            REST_FRAMEWORK={**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": rates},
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_login_limited_per_account(self):
+        """Test login attempts are limited per account across client IPs."""
+        get_user_model().objects.create_user("test@example.com", "testpass")
+        payload = {"email": "test@example.com", "password": "wrong"}
+        key = f"throttle_requests_total|{json.dumps(['login', 'throttled'])}"
+        before = metrics.registry().values.get(key, 0)
+
+        for ip in ("10.0.0.1", "10.0.0.2"):
+            res = APIClient(REMOTE_ADDR=ip).post(TOKEN_URL, payload)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        res = APIClient(REMOTE_ADDR="10.0.0.3").post(TOKEN_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(res["Retry-After"], "30")
+        self.assertEqual(metrics.registry().values[key], before + 1)
+
+    def test_throttled_client_cannot_drain_account(self):
+        """Test requests refused per IP take no tokens from the account."""
+        get_user_model().objects.create_user("test@example.com", "testpass")
+        attacker = APIClient(REMOTE_ADDR="10.0.0.9")
+        for _ in range(2):
+            attacker.post(TOKEN_URL, {"email": "other@example.com", "password": "wrong"})
+        for _ in range(3):
+            res = attacker.post(TOKEN_URL, {"email": "test@example.com", "password": "wrong"})
+            self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+        res = APIClient(REMOTE_ADDR="10.0.0.1").post(
+            TOKEN_URL, {"email": "test@example.com", "password": "testpass"}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_writes_limited_per_user(self):
+        """Test writes are limited per user, apart from reads."""
+        payload = {"title": "Soup", "time_minutes": 5, "price": "1.00"}
+        clients = []
+        for email in ("test@example.com", "other@example.com"):
+            client = APIClient()
+            client.force_authenticate(get_user_model().objects.create_user(email, "testpass"))
+            clients.append(client)
+
+        self.assertEqual(clients[0].post(RECIPES_URL, payload).status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            clients[0].post(RECIPES_URL, payload).status_code,
+            status.HTTP_429_TOO_MANY_REQUESTS,
+        )
+        self.assertEqual(clients[0].get(RECIPES_URL).status_code, status.HTTP_200_OK)
+        self.assertEqual(clients[1].post(RECIPES_URL, payload).status_code, status.HTTP_201_CREATED)
+
+    def test_limits_exported(self):
+        """Test the configured limits are exported as metrics."""
+        text = metrics.render()
+
+        self.assertIn('throttle_capacity_requests{scope="login"} 2', text)
+        self.assertIn('throttle_refill_per_second{scope="writes"} 0.016666666666666666', text)
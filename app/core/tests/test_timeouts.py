@@ -0,0 +1,86 @@
+"""
+Tests for per-route statement timeouts.
+"""
+
+import json
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.test import APIClient
+
+from core import metrics
+from core.models import Recipe
+from recipe.views import RecipeViewSet
+
+RECIPES_URL = reverse("recipe:recipe-list")
+
+
+def slow_list(self, request, *args, **kwargs):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_sleep(2)")
+    return Response([])
+
+
+def show_timeout(self, request, *args, **kwargs):
+    with connection.cursor() as cursor:
+        cursor.execute("SHOW statement_timeout")
+        return Response({"timeout": cursor.fetchone()[0]})
+
+
+@override_settings(STATEMENT_TIMEOUTS={"recipe:recipe-list": 50, "core:batch": None})
+class StatementTimeoutTests(TransactionTestCase):
+    """Test views run under their route's statement timeout."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("test@example.com", "testpass")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_timeout_set_for_request_only(self):
+        """Test the timeout applies to the view's transaction only."""
+        with mock.patch.object(RecipeViewSet, "list", show_timeout):
+            res = self.client.get(RECIPES_URL)
+            with override_settings(STATEMENT_TIMEOUTS={"recipe:recipe-list": None}):
+                unlimited = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.data, {"timeout": "50ms"})
+        self.assertEqual(unlimited.data, {"timeout": "0"})
+        with connection.cursor() as cursor:
+            cursor.execute("SHOW statement_timeout")
+            self.assertEqual(cursor.fetchone()[0], "0")
+
+    def test_cancelled_query_returns_503(self):
+        """Test a cancelled query answers 503 with Retry-After."""
+        key = f"db_statement_timeouts_total|{json.dumps(['recipe:recipe-list'])}"
+        before = metrics.registry().values.get(key, 0)
+
+        with mock.patch.object(RecipeViewSet, "list", slow_list), \
+                self.assertLogs("core.timeouts", "WARNING"):
+            res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(res["Retry-After"], "5")
+        self.assertEqual(metrics.registry().values[key], before + 1)
+        Recipe.objects.create(user=self.user, title="Soup", time_minutes=5, price=1)
+        self.assertEqual(Recipe.objects.count(), 1)
+
+    def test_batched_request_timeout(self):
+        """Test a cancelled sub-request fails alone."""
+        batch = [
+            {"id": "recipes", "path": RECIPES_URL},
+            {"id": "me", "path": reverse("user:me")},
+        ]
+
+        with mock.patch.object(RecipeViewSet, "list", slow_list), \
+                self.assertLogs("core.timeouts", "WARNING"):
+            res = self.client.post(reverse("core:batch"), {"requests": batch}, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        statuses = [response["status"] for response in res.data["responses"]]
+        self.assertEqual(statuses, [503, 200])
@@ -0,0 +1,190 @@
+"""
+Token bucket rate limits shared by the worker processes.
+
+Buckets live in a memory-mapped file at THROTTLE_STORE_PATH, split into
+sets of SET_SIZE slots. A key hashes to one set, which is guarded by an
+fcntl byte-range lock, so taking a token costs a hash, a lock and a few
+memory reads rather than a round trip to a server. A refilled bucket is
+the same as a missing one, so a key whose set is full takes over the
+slot updated longest ago.
+"""
+
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+
+from django.conf import settings
+
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+from core import metrics
+
+# Key hash, tokens left and when they were counted.
+SLOT = struct.Struct("=Qdd")
+SET_SIZE = 8
+
+
+class BucketStore:
+    """Token buckets in a file mapped by every process."""
+
+    def __init__(self, path, slots):
+        self.sets = max(1, slots // SET_SIZE)
+        self.set_bytes = SET_SIZE * SLOT.size
+        size = self.sets * self.set_bytes
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self.fd).st_size < size:
+            os.ftruncate(self.fd, size)
+        self.map = mmap.mmap(self.fd, size)
+        # fcntl locks are held by the process, so threads also need one.
+        self.locks = [threading.Lock() for _ in range(64)]
+
+    def take(self, keys, capacity, refill, now=None):
+        """Take a token from each of the buckets of keys, if all have one.
+
+        Return 0 if they did, otherwise the seconds until they all will. A
+        refused request takes nothing, so one bucket running dry does not
+        drain the others.
+        """
+        digests = []
+        for key in keys:
+            digest = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little")
+            if (digest or 1) not in digests:
+                digests.append(digest or 1)
+        # Sets are always locked in the same order, so takes cannot deadlock.
+        indexes = sorted({digest % self.sets for digest in digests})
+        locks = sorted({index % len(self.locks) for index in indexes})
+        for lock in locks:
+            self.locks[lock].acquire()
+        locked = []
+        try:
+            for index in indexes:
+                fcntl.lockf(self.fd, fcntl.LOCK_EX, self.set_bytes, index * self.set_bytes)
+                locked.append(index)
+
+            now = time.time() if now is None else now
+            buckets, wait = [], 0.0
+            for digest in digests:
+                slot, tokens = self._find(digest, capacity, refill, now, buckets)
+                buckets.append((slot, digest, tokens))
+                if tokens < 1:
+                    wait = max(wait, (1 - tokens) / refill)
+            if wait:
+                return wait
+            for slot, digest, tokens in buckets:
+                SLOT.pack_into(self.map, slot, digest, tokens - 1, now)
+            return 0.0
+        finally:
+            for index in locked:
+                fcntl.lockf(self.fd, fcntl.LOCK_UN, self.set_bytes, index * self.set_bytes)
+            for lock in locks:
+                self.locks[lock].release()
+
+    def _find(self, digest, capacity, refill, now, buckets):
+        """Return the slot of a bucket and its tokens, refilled up to now.
+
+        A missing bucket takes over the oldest slot not among buckets.
+        """
+        start = (digest % self.sets) * self.set_bytes
+        oldest = None
+        for offset in range(start, start + self.set_bytes, SLOT.size):
+            slot_key, slot_tokens, updated = SLOT.unpack_from(self.map, offset)
+            if slot_key == digest:
+                elapsed = max(0.0, now - updated)
+                return offset, min(capacity, slot_tokens + elapsed * refill)
+            if (oldest is None or updated < oldest[1]) and all(offset != b[0] for b in buckets):
+                oldest = (offset, updated)
+        return oldest[0], capacity
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def store():
+    """Return the bucket store of the current process."""
+    global _store
+    config = (os.getpid(), settings.THROTTLE_STORE_PATH, settings.THROTTLE_STORE_SLOTS)
+    if _store is None or _store[0] != config:
+        # Forked workers map the file again.
+        with _store_lock:
+            if _store is None or _store[0] != config:
+                _store = (config, BucketStore(*config[1:]))
+    return _store[1]
+
+
+def parse_rate(rate):
+    """Return the (capacity, refill per second) of a DRF "n/period" rate."""
+    num_requests, duration = SimpleRateThrottle.parse_rate(None, rate)
+    return num_requests, num_requests / duration
+
+
+def rate_limits():
+    """Return the (capacity, refill per second) of every throttle scope."""
+    return {
+        scope: parse_rate(rate)
+        for scope, rate in api_settings.DEFAULT_THROTTLE_RATES.items()
+        if rate is not None
+    }
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    """Token bucket limit of a scope, per user or else per client IP.
+
+    A rate of "60/min" allows bursts of 60 requests and refills a token
+    every second. Rates are read from DEFAULT_THROTTLE_RATES.
+    """
+
+    def __init__(self):
+        self.wait_seconds = 0.0
+
+    def get_scope(self, request):
+        return self.scope
+
+    def get_keys(self, request, scope):
+        """Return the keys of the buckets the request takes a token from."""
+        if request.user and request.user.is_authenticated:
+            ident = f"user:{request.user.pk}"
+        else:
+            ident = f"ip:{self.get_ident(request)}"
+        return [self.cache_format % {"scope": scope, "ident": ident}]
+
+    def allow_request(self, request, view):
+        scope = self.get_scope(request)
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(scope)
+        if rate is None:
+            return True
+        capacity, refill = parse_rate(rate)
+        self.wait_seconds = store().take(self.get_keys(request, scope), capacity, refill)
+        allowed = not self.wait_seconds
+        metrics.inc("throttle_requests_total", (scope, "allowed" if allowed else "throttled"))
+        return allowed
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class RequestRateThrottle(TokenBucketThrottle):
+    """Limit reads and writes in separate scopes."""
+
+    def get_scope(self, request):
+        return "reads" if request.method in SAFE_METHODS else "writes"
+
+
+class LoginRateThrottle(TokenBucketThrottle):
+    """Limit login attempts per client IP and per account."""
+
+    scope = "login"
+
+    def get_keys(self, request, scope):
+        keys = super().get_keys(request, scope)
+        email = request.data.get("email") if hasattr(request.data, "get") else None
+        if isinstance(email, str) and email:
+            ident = f"email:{email.strip().lower()}"
+            keys.append(self.cache_format % {"scope": scope, "ident": ident})
+        return keys
@@ -0,0 +1,71 @@
+"""
+Per-route statement timeouts.
+
+Views run in a transaction whose statement_timeout is set with SET LOCAL
+from STATEMENT_TIMEOUTS, so PostgreSQL cancels a pathological query
+instead of letting it hold a worker and a backend. Cancelled queries are
+answered with a 503 and a Retry-After header.
+"""
+
+import logging
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, transaction
+from django.http import JsonResponse
+from psycopg2 import errorcodes
+
+from core import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def timeout_for(route):
+    """Return the statement timeout of a route in milliseconds, or None."""
+    return settings.STATEMENT_TIMEOUTS.get(route, settings.STATEMENT_TIMEOUT_DEFAULT_MS)
+
+
+@contextmanager
+def statement_timeout(route, using=DEFAULT_DB_ALIAS):
+    """Run the block in a transaction limited to the route's timeout.
+
+    The timeout is set right before the first query, so blocks that never
+    reach the database cost no round trip. Blocks already in a transaction
+    keep its timeout, as SET LOCAL would outlive their savepoint.
+    """
+    timeout = timeout_for(route)
+    connection = connections[using]
+    if timeout is None or connection.in_atomic_block:
+        yield
+        return
+    pending = True
+
+    def set_timeout(execute, sql, params, many, context):
+        nonlocal pending
+        if pending:
+            pending = False
+            context["cursor"].execute("SET LOCAL statement_timeout = %s", [f"{timeout}ms"])
+        return execute(sql, params, many, context)
+
+    with transaction.atomic(using=using), connection.execute_wrapper(set_timeout):
+        yield
+
+
+def is_query_canceled(exception):
+    """Return whether a database error is a cancelled statement."""
+    return (
+        isinstance(exception, OperationalError)
+        and getattr(exception.__cause__, "pgcode", None) == errorcodes.QUERY_CANCELED
+    )
+
+
+def timeout_response(route):
+    """Record a cancelled statement and return the 503 telling to retry."""
+    logger.warning("Statement timeout of %sms exceeded on %s", timeout_for(route), route)
+    metrics.inc("db_statement_timeouts_total", (route,))
+    response = JsonResponse(
+        {"detail": "The request took too long, try again later."},
+        status=503,
+    )
+    response["Retry-After"] = str(settings.STATEMENT_TIMEOUT_RETRY_AFTER_SECONDS)
+    return response
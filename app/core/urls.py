@@ -0,0 +1,18 @@
+"""
+URL mapping for the core APIs.
+"""
+
+from django.urls import path
+
+from core import views
+
+
+app_name = "core"
+
+urlpatterns = [
+    path("batch/", views.batch_view, name="batch"),
+    path("events/ticket/", views.EventTicketView.as_view(), name="events-ticket"),
+    path("jobs/", views.JobListView.as_view(), name="job-list"),
+    path("jobs/<int:pk>/", views.JobDetailView.as_view(), name="job-detail"),
+    path("slow-queries/", views.SlowQueryView.as_view(), name="slow-queries"),
+]
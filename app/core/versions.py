@@ -0,0 +1,26 @@
+"""
+Cache version counters for invalidating derived per-user data.
+
+The counters live in the default cache, which the worker processes share,
+so a bump in one of them retires the data in all of them.
+"""
+
+import time
+
+from django.core.cache import cache
+
+
+def current_version(key):
+    """Return the version stored under a cache key, creating it if missing."""
+    # Versions start from the clock so a re-created key cannot match a
+    # version handed out before it was evicted.
+    cache.add(key, time.time_ns() // 1000, None)
+    return cache.get(key)
+
+
+def bump_version(key):
+    """Increment a version, returning the new one or None if it was unset."""
+    try:
+        return cache.incr(key)
+    except ValueError:
+        return None
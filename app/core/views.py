@@ -1,3 +1,209 @@
-from django.shortcuts import render # noqa
+"""
+Views for the core APIs.
+"""
 
-# Create your views here.
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.http import HttpResponse
+from django.db import connections
+from django.urls import Resolver404, resolve
+from django.utils.crypto import constant_time_compare
+
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema
+
+from rest_framework import generics, status
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from core import metrics, serializers, slow_queries, timeouts
+from core.authentication import ExpiringTokenAuthentication
+from core.models import Job, StreamTicket
+from core.pagination import EstimatedCountPagination
+
+logger = logging.getLogger(__name__)
+
+# Request headers that describe the batch body rather than a sub-request.
+BODY_META = ("CONTENT_TYPE", "CONTENT_LENGTH", "HTTP_CONTENT_ENCODING", "wsgi.input")
+# Headers of one request only, such as Idempotency-Key; sub-requests
+# send their own.
+REQUEST_META = tuple(
+    "HTTP_" + name.upper().replace("-", "_") for name in serializers.SUB_REQUEST_HEADERS
+)
+
+
+class BatchView(APIView):
+    """Run several API requests in one round trip.
+
+    The batch is authenticated once and each sub-request is dispatched
+    in-process to its view, with the batch's headers apart from the
+    per-request ones, which it may set in "headers". Batches made only of GET requests may ask to be
+    run in parallel on a thread pool.
+    """
+
+    authentication_classes = (ExpiringTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+
+    @extend_schema(request=serializers.BatchSerializer, responses=OpenApiTypes.OBJECT)
+    def post(self, request):
+        serializer = serializers.BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        sub_requests = serializer.validated_data["requests"]
+
+        read_only = all(sub["method"] == "GET" for sub in sub_requests)
+        if serializer.validated_data["parallel"] and read_only:
+            with ThreadPoolExecutor(settings.BATCH_MAX_WORKERS) as pool:
+                responses = list(pool.map(
+                    lambda sub: self._dispatch_in_thread(request, sub), sub_requests
+                ))
+        else:
+            responses = [self._dispatch(request, sub) for sub in sub_requests]
+
+        return Response({"responses": responses})
+
+    def _dispatch_in_thread(self, request, sub):
+        """Dispatch from a pool thread, closing its database connections."""
+        try:
+            return self._dispatch(request, sub)
+        finally:
+            connections.close_all()
+
+    def _dispatch(self, request, sub):
+        """Run one sub-request through its view and describe the response."""
+        result = {"id": sub.get("id"), "status": status.HTTP_404_NOT_FOUND, "body": None}
+        url = urlsplit(sub["path"])
+        try:
+            match = resolve(url.path)
+        except Resolver404:
+            return result
+        if match.func is batch_view:
+            result["status"] = status.HTTP_400_BAD_REQUEST
+            return result
+
+        sub_request = self._build_request(request, sub, url)
+        sub_request.resolver_match = match
+        try:
+            with timeouts.statement_timeout(match.view_name):
+                response = match.func(sub_request, *match.args, **match.kwargs)
+                if hasattr(response, "render"):
+                    response.render()
+        except Exception as exc:
+            if timeouts.is_query_canceled(exc):
+                return self._describe(result, timeouts.timeout_response(match.view_name))
+            logger.exception("Batched request to %s failed", url.path)
+            result["status"] = status.HTTP_500_INTERNAL_SERVER_ERROR
+            return result
+        return self._describe(result, response)
+
+    def _describe(self, result, response):
+        """Fill a sub-request result from its response."""
+        result["status"] = response.status_code
+        if not response.streaming and response.content:
+            content = response.content
+            if response.get("Content-Type", "").startswith("application/json"):
+                result["body"] = json.loads(content)
+            else:
+                result["body"] = content.decode(response.charset, "replace")
+        return result
+
+    def _build_request(self, request, sub, url):
+        """Build a Django request for a sub-request, reusing the batch auth."""
+        body = b""
+        if "body" in sub:
+            body = json.dumps(sub["body"]).encode()
+
+        environ = {
+            key: value for key, value in request.META.items()
+            if key not in BODY_META and key not in REQUEST_META
+        }
+        for name, value in sub.get("headers", {}).items():
+            environ["HTTP_" + name.upper().replace("-", "_")] = value
+        environ.update({
+            "REQUEST_METHOD": sub["method"],
+            "PATH_INFO": url.path,
+            "QUERY_STRING": url.query,
+            "CONTENT_TYPE": "application/json",
+            "CONTENT_LENGTH": str(len(body)),
+            "wsgi.input": BytesIO(body),
+        })
+        sub_request = WSGIRequest(environ)
+        # DRF skips its authenticators for requests carrying these.
+        sub_request._force_auth_user = request.user
+        sub_request._force_auth_token = request.auth
+        return sub_request
+
+
+batch_view = BatchView.as_view()
+
+
+class JobListView(generics.ListAPIView):
+    """List the background jobs of the authenticated user, newest first."""
+
+    serializer_class = serializers.JobSerializer
+    authentication_classes = (ExpiringTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+    pagination_class = EstimatedCountPagination
+
+    def get_queryset(self):
+        return Job.objects.filter(user=self.request.user).order_by("-id")
+
+
+class JobDetailView(generics.RetrieveAPIView):
+    """Poll the status and result of one of the user's jobs."""
+
+    serializer_class = serializers.JobSerializer
+    authentication_classes = (ExpiringTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+
+    def get_queryset(self):
+        return Job.objects.filter(user=self.request.user)
+
+
+class SlowQueryView(APIView):
+    """Show the slowest query fingerprints seen by this worker process."""
+
+    authentication_classes = (ExpiringTokenAuthentication,)
+    permission_classes = (IsAdminUser,)
+
+    @extend_schema(responses=OpenApiTypes.OBJECT)
+    def get(self, request):
+        return Response({"queries": slow_queries.slowest()})
+
+    @extend_schema(responses={204: None})
+    def delete(self, request):
+        slow_queries.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class EventTicketView(APIView):
+    """Issue a single-use ticket for opening the event stream."""
+
+    authentication_classes = (ExpiringTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+
+    @extend_schema(request=None, responses={201: OpenApiTypes.OBJECT})
+    def post(self, request):
+        ticket = StreamTicket.objects.issue(request.user)
+        return Response(
+            {"ticket": ticket.key, "expires_in": settings.EVENTS_TICKET_SECONDS},
+            status=status.HTTP_201_CREATED,
+        )
+
+
+def metrics_view(request):
+    """Return the metrics of all worker processes for Prometheus."""
+    token = settings.METRICS_TOKEN
+    if not token:
+        return HttpResponse(status=status.HTTP_404_NOT_FOUND)
+    if not constant_time_compare(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        return HttpResponse(status=status.HTTP_401_UNAUTHORIZED)
+    return HttpResponse(
+        metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -2,6 +2,8 @@
 Serializers for recipe APIs.
 """
 
+from django.db import transaction
+
 from rest_framework import serializers
 
 from core.models import Recipe, Tag
@@ -16,6 +18,15 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_fields = ("id",)
 
 
+class TagWithCountSerializer(TagSerializer):
+    """Serializer for tag objects with the number of recipes using them."""
+
+    recipe_count = serializers.IntegerField(source="num_recipes", read_only=True)
+
+    class Meta(TagSerializer.Meta):
+        fields = TagSerializer.Meta.fields + ("recipe_count",)
+
+
 class RecipeSerializer(serializers.ModelSerializer):
     """Serializer for the recipe object."""
 
@@ -34,34 +45,71 @@ class RecipeSerializer(serializers.ModelSerializer):
         )
         read_only_fields = ("id",)
 
-    def _get_or_create_tags(self, recipe, tags):
+    def _get_or_create_tags(self, tags):
         auth_user = self.context["request"].user
-        for tag in tags:
-            tag_obj, _ = Tag.objects.get_or_create(user=auth_user, **tag)
-            recipe.tags.add(tag_obj)
-
+        names = list(dict.fromkeys(tag["name"] for tag in tags))
+        # One query for the existing tags rather than one per tag.
+        existing = {
+            tag.name: tag
+            for tag in Tag.objects.filter(user=auth_user, name__in=names)
+        }
+        return [
+            existing[name] if name in existing
+            else Tag.objects.create(user=auth_user, name=name)
+            for name in names
+        ]
+
+    @transaction.atomic
     def create(self, validated_data):
         tags = validated_data.pop("tags", [])
         recipe = Recipe.objects.create(**validated_data)
-        self._get_or_create_tags(recipe, tags)
+        if tags:
+            recipe.tags.add(*self._get_or_create_tags(tags))
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         tags = validated_data.pop("tags", None)
         if tags is not None:
-            instance.tags.clear()
-            self._get_or_create_tags(instance, tags)
-        
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
-
-        instance.save()
+            # set() only touches the links that actually change.
+            instance.tags.set(self._get_or_create_tags(tags))
+
+        changed = [
+            attr for attr, value in validated_data.items()
+            if getattr(instance, attr) != value
+        ]
+        for attr in changed:
+            setattr(instance, attr, validated_data[attr])
+
+        if changed:
+            instance.save(update_fields=changed)
         return instance
 
 
+class RecipeListSerializer(RecipeSerializer):
+    """Serializer for recipe lists, reading tags from Recipe.tags_snapshot."""
+
+    tags = serializers.JSONField(source="tags_snapshot", read_only=True)
+
+
+class SimilarRecipeSerializer(RecipeListSerializer):
+    """Serializer for similar recipes with their tag overlap score."""
+
+    similarity = serializers.FloatField(read_only=True)
+
+    class Meta(RecipeListSerializer.Meta):
+        fields = RecipeListSerializer.Meta.fields + ("similarity",)
+
+
 class RecipeDetailSerializer(RecipeSerializer):
     """Serializer for the recipe detail object."""
 
     class Meta(RecipeSerializer.Meta):
         fields = RecipeSerializer.Meta.fields + ("description",)
         read_only_fields = RecipeSerializer.Meta.read_only_fields
+
+
+class RecipeSyncSerializer(RecipeDetailSerializer):
+    """Serializer for synced recipes, reading tags from Recipe.tags_snapshot."""
+
+    tags = serializers.JSONField(source="tags_snapshot", read_only=True)
@@ -4,15 +4,21 @@ Test the recipe API.
 
 from decimal import Decimal
 
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.urls import reverse
 
 from rest_framework import status
 from rest_framework.test import APIClient
 
+from core import similarity
+from core.counts import recipe_count_key
 from core.models import Recipe, Tag
+from core.tests.shared_cache import SharedCacheMixin
 
 from recipe.serializers import RecipeSerializer, RecipeDetailSerializer
 
@@ -344,3 +350,326 @@ class PrivateRecipeApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(recipe.tags.count(), 0)
         self.assertFalse(recipe.tags.exists())
+
+    def test_list_recipe_tags_from_snapshot(self):
+        """Test listing recipes serves tags from the snapshot column."""
+        vegan = Tag.objects.create(user=self.user, name="Vegan")
+        dessert = Tag.objects.create(user=self.user, name="Dessert")
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(vegan, dessert)
+
+        with override_settings(RECIPE_LIST_TAG_SNAPSHOT=False):
+            expected = self.client.get(RECIPES_URL).data
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, expected)
+        self.assertEqual(
+            res.data[0]["tags"],
+            [{"id": vegan.id, "name": "Vegan"}, {"id": dessert.id, "name": "Dessert"}],
+        )
+
+    def test_tag_snapshot_follows_tag_rename_and_delete(self):
+        """Test renaming and deleting tags updates recipe snapshots."""
+        vegan = Tag.objects.create(user=self.user, name="Vegan")
+        dessert = Tag.objects.create(user=self.user, name="Dessert")
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(vegan, dessert)
+
+        vegan.name = "Plant Based"
+        vegan.save()
+        dessert.delete()
+
+        recipe.refresh_from_db()
+        self.assertEqual(
+            recipe.tags_snapshot, [{"id": vegan.id, "name": "Plant Based"}]
+        )
+
+    def test_partial_update_writes_changed_columns(self):
+        """Test a patch only writes the columns it changes."""
+        recipe = create_recipe(user=self.user, time_minutes=10)
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.patch(detail_url(recipe.id), {"time_minutes": 20})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["time_minutes"], 20)
+        updates = [q["sql"] for q in queries if q["sql"].startswith("UPDATE")]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('"time_minutes"', updates[0].split("WHERE")[0])
+        self.assertNotIn('"description"', updates[0].split("WHERE")[0])
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.time_minutes, 20)
+
+    def test_partial_update_without_changes(self):
+        """Test a patch repeating the stored values writes nothing."""
+        recipe = create_recipe(user=self.user, title="Sample Recipe")
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.patch(detail_url(recipe.id), {"title": "Sample Recipe"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["title"], "Sample Recipe")
+        self.assertEqual(
+            [q for q in queries if q["sql"].startswith("UPDATE") and "RETURNING" not in q["sql"]],
+            [],
+        )
+
+    def test_partial_update_other_user_recipe(self):
+        """Test patching another user's recipe is not found."""
+        user2 = create_user(**user_details2)
+        recipe = create_recipe(user=user2, title="Sample Recipe")
+
+        res = self.client.patch(detail_url(recipe.id), {"title": "Changed"})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, "Sample Recipe")
+
+    def test_create_recipe_idempotency_key(self):
+        """Test repeating a create with the same key replays the response."""
+        payload = {"title": "Soup", "time_minutes": 5, "price": Decimal("2.00")}
+
+        res1 = self.client.post(RECIPES_URL, payload, HTTP_IDEMPOTENCY_KEY="abc")
+        res2 = self.client.post(RECIPES_URL, payload, HTTP_IDEMPOTENCY_KEY="abc")
+
+        self.assertEqual(res1.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res2.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res2.data, res1.data)
+        self.assertEqual(res2["Idempotent-Replayed"], "true")
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 1)
+
+    def test_create_recipe_idempotency_key_reused(self):
+        """Test a key cannot be reused for a different payload."""
+        payload = {"title": "Soup", "time_minutes": 5, "price": Decimal("2.00")}
+        self.client.post(RECIPES_URL, payload, HTTP_IDEMPOTENCY_KEY="abc")
+
+        payload["title"] = "Stew"
+        res = self.client.post(RECIPES_URL, payload, HTTP_IDEMPOTENCY_KEY="abc")
+
+        self.assertEqual(res.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 1)
+
+    def test_paginated_list_count(self):
+        """Test ?limit= pages the list and reports an exact count."""
+        cache.clear()
+        for i in range(3):
+            create_recipe(user=self.user, title=f"Recipe {i}")
+
+        res = self.client.get(RECIPES_URL, {"limit": 2})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["count"], 3)
+        self.assertFalse(res.data["count_is_approximate"])
+        self.assertEqual(len(res.data["results"]), 2)
+        self.assertIsNotNone(res.data["next"])
+
+    def test_cached_count_bumped_on_create_and_delete(self):
+        """Test the cached recipe count follows creates and deletes."""
+        cache.clear()
+        recipe = create_recipe(user=self.user)
+        self.client.get(RECIPES_URL, {"limit": 1})
+        self.assertEqual(cache.get(recipe_count_key(self.user.id)), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            create_recipe(user=self.user)
+        self.assertEqual(cache.get(recipe_count_key(self.user.id)), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.delete()
+        res = self.client.get(RECIPES_URL, {"limit": 1})
+        self.assertEqual(res.data["count"], 1)
+
+
+class SimilarRecipesTests(TestCase):
+    """Test the similar recipes action."""
+
+    def setUp(self):
+        cache.clear()
+        similarity._indexes.clear()
+        self.client = APIClient()
+        self.user = create_user(**user_details)
+        self.client.force_authenticate(self.user)
+
+        self.tags = {
+            name: Tag.objects.create(user=self.user, name=name)
+            for name in ("Vegan", "Dessert", "Quick", "Spicy")
+        }
+        self.target = self.create("Target", "Vegan", "Dessert", "Quick")
+        self.close = self.create("Close", "Vegan", "Dessert", "Quick", "Spicy")
+        self.far = self.create("Far", "Quick", "Spicy")
+        self.create("Unrelated", "Spicy")
+        other = create_user(**user_details2)
+        other_tag = Tag.objects.create(user=other, name="Vegan")
+        create_recipe(user=other).tags.add(other_tag)
+
+    def create(self, title, *tags):
+        recipe = create_recipe(user=self.user, title=title)
+        recipe.tags.add(*(self.tags[name] for name in tags))
+        return recipe
+
+    def similar(self):
+        url = reverse("recipe:recipe-similar", args=[self.target.id])
+        res = self.client.get(url)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [(item["title"], round(item["similarity"], 2)) for item in res.data]
+
+    def test_ranked_by_jaccard(self):
+        """Test recipes are ranked by shared tags over combined tags."""
+        self.assertEqual(self.similar(), [("Close", 0.75), ("Far", 0.25)])
+
+    @override_settings(RECIPE_SIMILAR_IN_MEMORY=True)
+    def test_in_memory_index(self):
+        """Test the in-memory index ranks alike and follows tag changes."""
+        self.assertEqual(self.similar(), [("Close", 0.75), ("Far", 0.25)])
+        index = similarity._indexes[self.user.id]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.far.tags.add(self.tags["Vegan"], self.tags["Dessert"])
+            self.close.tags.remove(self.tags["Quick"])
+
+        self.assertIs(similarity._indexes[self.user.id], index)
+        self.assertEqual(self.similar(), [("Far", 0.75), ("Close", 0.5)])
+
+    def test_other_users_recipe_not_found(self):
+        """Test similar recipes cannot be requested for another user's recipe."""
+        other = Recipe.objects.exclude(user=self.user).get()
+        url = reverse("recipe:recipe-similar", args=[other.id])
+
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+
+
+class RecipeStatsTests(TestCase):
+    """Test the recipe statistics action."""
+
+    url = reverse("recipe:recipe-stats")
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = create_user(**user_details)
+        self.client.force_authenticate(self.user)
+
+        vegan = Tag.objects.create(user=self.user, name="Vegan")
+        for minutes, price in [(10, "1.00"), (20, "2.00"), (30, "3.00"), (40, "11.00")]:
+            recipe = create_recipe(user=self.user, time_minutes=minutes, price=Decimal(price))
+            recipe.tags.add(vegan)
+        create_recipe(user=create_user(**user_details2), price=Decimal("99.00"))
+
+    @override_settings(RECIPE_STATS_PRICE_BUCKETS=2)
+    def test_stats(self):
+        """Test the summaries, histogram and tag usage of the user's recipes."""
+        res = self.client.get(self.url)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["count"], 4)
+        self.assertEqual(res.data["time_minutes"], {"avg": 25, "p50": 25, "p90": 37})
+        self.assertEqual(res.data["price"]["max"], 11)
+        self.assertEqual(res.data["price"]["histogram"], [
+            {"min": 1, "max": 6, "count": 3},
+            {"min": 6, "max": 11, "count": 1},
+        ])
+        self.assertEqual(res.data["tags"][0]["recipe_count"], 4)
+
+    def test_cached_until_write(self):
+        """Test repeat loads hit the cache and writes refresh the figures."""
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            self.client.get(self.url)
+
+        recipe = Recipe.objects.filter(user=self.user).first()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(detail_url(recipe.id), {"time_minutes": 1000})
+        res = self.client.get(self.url)
+
+        self.assertGreater(res.data["time_minutes"]["avg"], 25)
+
+
+class RecipeExportTests(TransactionTestCase):
+    """Test the CSV export, which streams from its own connection."""
+
+    def test_export_streams_user_recipes(self):
+        """Test the export holds only the user's recipes, as CSV."""
+        user = create_user(**user_details)
+        create_recipe(user=user, title="Mine")
+        create_recipe(user=create_user(**user_details2), title="Theirs")
+        client = APIClient()
+        client.force_authenticate(user)
+
+        res = client.get(reverse("recipe:recipe-export"), HTTP_ACCEPT="text/csv")
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res["Content-Type"], "text/csv; charset=utf-8")
+        body = b"".join(res.streaming_content).decode()
+        self.assertIn("Mine", body)
+        self.assertNotIn("Theirs", body)
+        self.assertEqual(len(body.splitlines()), 2)
+
+
+def create_recipe_for(user_id):
+    create_recipe(user=get_user_model().objects.get(pk=user_id))
+
+
+class SharedRecipeCountTests(SharedCacheMixin, TransactionTestCase):
+    """Test the cached recipe count is kept in step across workers."""
+
+    def test_create_in_other_process(self):
+        """Test a recipe created by another worker is counted here."""
+        user = create_user(email="user@example.com", password="test123")
+        client = APIClient()
+        client.force_authenticate(user)
+        create_recipe(user=user)
+        self.assertEqual(client.get(RECIPES_URL, {"limit": 1}).data["count"], 1)
+
+        self.in_other_process(create_recipe_for, user.pk)
+
+        res = client.get(RECIPES_URL, {"limit": 1})
+        self.assertEqual(res.data["count"], 2)
+        self.assertFalse(res.data["count_is_approximate"])
+
+
+def tag_recipe(recipe_id, tag_id):
+    Recipe.objects.get(pk=recipe_id).tags.add(tag_id)
+
+
+class SharedRecipeStatsTests(SharedCacheMixin, TransactionTestCase):
+    """Test cached statistics are retired in every worker."""
+
+    def test_create_in_other_process(self):
+        """Test a recipe created by another worker shows in the statistics."""
+        user = create_user(email="user@example.com", password="test123")
+        client = APIClient()
+        client.force_authenticate(user)
+        create_recipe(user=user)
+        self.assertEqual(client.get(reverse("recipe:recipe-stats")).data["count"], 1)
+
+        self.in_other_process(create_recipe_for, user.pk)
+
+        self.assertEqual(client.get(reverse("recipe:recipe-stats")).data["count"], 2)
+
+
+@override_settings(RECIPE_SIMILAR_IN_MEMORY=True)
+class SharedTagIndexTests(SharedCacheMixin, TransactionTestCase):
+    """Test in-memory tag indexes follow tag changes made by other workers."""
+
+    def setUp(self):
+        super().setUp()
+        similarity._indexes.clear()
+        self.addCleanup(similarity._indexes.clear)
+
+    def test_retag_in_other_process(self):
+        """Test a recipe tagged by another worker is ranked here."""
+        user = create_user(email="user@example.com", password="test123")
+        client = APIClient()
+        client.force_authenticate(user)
+        tag = Tag.objects.create(user=user, name="Vegan")
+        target = create_recipe(user=user, title="Target")
+        target.tags.add(tag)
+        other = create_recipe(user=user, title="Other")
+        url = reverse("recipe:recipe-similar", args=[target.id])
+        self.assertEqual(client.get(url).data, [])
+
+        self.in_other_process(tag_recipe, other.id, tag.id)
+
+        res = client.get(url)
+        self.assertEqual([item["title"] for item in res.data], ["Other"])
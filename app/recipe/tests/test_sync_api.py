@@ -0,0 +1,135 @@
+"""
+Tests for the sync API.
+"""
+
+import base64
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+from recipe.views import encode_sync_token
+
+SYNC_URL = reverse("recipe:sync")
+
+
+def create_user(email="test@example.com", password="testpass"):
+    """Helper function to create a user."""
+    return get_user_model().objects.create_user(email, password)
+
+
+def create_recipe(user, **params):
+    """Helper function to create a recipe."""
+    defaults = {
+        "title": "Sample Recipe",
+        "time_minutes": 10,
+        "price": Decimal("5.00"),
+    }
+    defaults.update(params)
+
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class PublicSyncApiTests(TestCase):
+    """Test the sync API (public)."""
+
+    def test_auth_required(self):
+        """Test that authentication is required to sync."""
+        res = APIClient().get(SYNC_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+@override_settings(SYNC_SAFETY_WINDOW_SECONDS=0)
+class PrivateSyncApiTests(TestCase):
+    """Test the sync API (private)."""
+
+    def setUp(self):
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_full_sync(self):
+        """Test syncing without a token returns everything of the user."""
+        tag = Tag.objects.create(user=self.user, name="Vegan")
+        recipe = create_recipe(self.user)
+        recipe.tags.add(tag)
+        create_recipe(create_user(email="other@example.com"))
+
+        res = self.client.get(SYNC_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.data["reset"])
+        self.assertEqual([r["id"] for r in res.data["recipes"]], [recipe.id])
+        self.assertEqual(res.data["recipes"][0]["tags"], [{"id": tag.id, "name": "Vegan"}])
+        self.assertEqual([t["id"] for t in res.data["tags"]], [tag.id])
+        self.assertEqual(res.data["deleted"], {"recipes": [], "tags": []})
+
+    def test_incremental_sync(self):
+        """Test syncing with a token returns only changes and deletions."""
+        vegan = Tag.objects.create(user=self.user, name="Vegan")
+        unchanged = create_recipe(self.user, title="Unchanged")
+        edited = create_recipe(self.user, title="Edited")
+        removed = create_recipe(self.user, title="Removed")
+        edited.tags.add(vegan)
+        token = self.client.get(SYNC_URL).data["token"]
+        removed_id, vegan_id = removed.id, vegan.id
+
+        self.client.patch(
+            reverse("recipe:recipe-detail", args=[edited.id]), {"time_minutes": 20}
+        )
+        removed.delete()
+        vegan.delete()
+        dessert = Tag.objects.create(user=self.user, name="Dessert")
+
+        res = self.client.get(SYNC_URL, {"since": token})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertFalse(res.data["reset"])
+        recipes = {r["id"]: r for r in res.data["recipes"]}
+        self.assertEqual(list(recipes), [edited.id])
+        self.assertNotIn(unchanged.id, recipes)
+        self.assertEqual(recipes[edited.id]["time_minutes"], 20)
+        self.assertEqual(recipes[edited.id]["tags"], [])
+        self.assertEqual([t["id"] for t in res.data["tags"]], [dessert.id])
+        self.assertEqual(
+            res.data["deleted"], {"recipes": [removed_id], "tags": [vegan_id]}
+        )
+
+        res = self.client.get(SYNC_URL, {"since": res.data["token"]})
+
+        self.assertEqual(res.data["recipes"], [])
+        self.assertEqual(res.data["tags"], [])
+
+    def test_expired_token_resets(self):
+        """Test a token older than the tombstone retention forces a reset."""
+        create_recipe(self.user)
+        token = encode_sync_token(timezone.now() - timedelta(days=365))
+
+        res = self.client.get(SYNC_URL, {"since": token})
+
+        self.assertTrue(res.data["reset"])
+        self.assertEqual(len(res.data["recipes"]), 1)
+
+    def test_invalid_token(self):
+        """Test a malformed token is rejected."""
+        res = self.client.get(SYNC_URL, {"since": "not-a-token"})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_out_of_range_token(self):
+        """Test a token for a time that cannot be represented is rejected."""
+        for micros in ("99999999999999999999999", "-99999999999999999999999"):
+            with self.subTest(micros=micros):
+                token = base64.urlsafe_b64encode(micros.encode()).decode().rstrip("=")
+
+                res = self.client.get(SYNC_URL, {"since": token})
+
+                self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
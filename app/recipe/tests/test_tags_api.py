@@ -2,15 +2,20 @@
 Test for tags API.
 """
 
+from decimal import Decimal
+from unittest import mock
+
 from django.urls import reverse
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
 
 from rest_framework import status
-from rest_framework.test import APIClient
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
 
-from core.models import Tag
+from core.models import Recipe, Tag
 from recipe.serializers import TagSerializer
+from recipe.views import TagViewSet
 
 TAGS_URL = reverse("recipe:tag-list")
 
@@ -25,6 +30,18 @@ def create_user(email="test@example.com", password="testpass"):
     return get_user_model().objects.create_user(email, password)
 
 
+def create_recipe(user, **params):
+    """Helper function to create a recipe."""
+    defaults = {
+        "title": "Sample Recipe",
+        "time_minutes": 10,
+        "price": Decimal("5.00"),
+    }
+    defaults.update(params)
+
+    return Recipe.objects.create(user=user, **defaults)
+
+
 class PublicTagsApiTests(TestCase):
     def setUp(self):
         self.client = APIClient()
@@ -92,3 +109,121 @@ class PrivateTagsApiTests(TestCase):
 
         tags = Tag.objects.filter(user=self.user)
         self.assertFalse(tags.exists())
+
+    def test_retrieve_tags_with_counts(self):
+        """Test listing tags with the number of recipes using them."""
+        vegan = Tag.objects.create(user=self.user, name="Vegan")
+        dessert = Tag.objects.create(user=self.user, name="Dessert")
+        Tag.objects.create(user=self.user, name="Unused")
+        create_recipe(self.user).tags.add(vegan, dessert)
+        create_recipe(self.user).tags.add(vegan)
+
+        for denormalized in (True, False):
+            with override_settings(TAG_RECIPE_COUNT_DENORMALIZED=denormalized):
+                res = self.client.get(TAGS_URL, {"with_counts": "1"})
+
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            counts = {tag["name"]: tag["recipe_count"] for tag in res.data}
+            self.assertEqual(counts, {"Vegan": 2, "Dessert": 1, "Unused": 0})
+
+    def test_retrieve_tags_without_counts(self):
+        """Test counts are only included when requested."""
+        Tag.objects.create(user=self.user, name="Vegan")
+
+        res = self.client.get(TAGS_URL)
+
+        self.assertNotIn("recipe_count", res.data[0])
+
+
+class TagRecipeCountTests(TestCase):
+    """Test the denormalized Tag.recipe_count column."""
+
+    def setUp(self):
+        self.user = create_user()
+        self.vegan = Tag.objects.create(user=self.user, name="Vegan")
+        self.dessert = Tag.objects.create(user=self.user, name="Dessert")
+
+    def assertCounts(self, vegan, dessert):
+        self.vegan.refresh_from_db()
+        self.dessert.refresh_from_db()
+        self.assertEqual(
+            (self.vegan.recipe_count, self.dessert.recipe_count),
+            (vegan, dessert),
+        )
+
+    def test_add_and_remove_links(self):
+        """Test adding, removing and clearing links from both sides."""
+        recipe = create_recipe(self.user)
+        other = create_recipe(self.user)
+
+        recipe.tags.add(self.vegan, self.dessert)
+        self.vegan.recipe_set.add(other)
+        self.assertCounts(2, 1)
+
+        recipe.tags.remove(self.vegan, self.vegan)
+        other.tags.remove(self.dessert)
+        self.assertCounts(1, 1)
+
+        self.vegan.recipe_set.clear()
+        recipe.tags.clear()
+        self.assertCounts(0, 0)
+
+    def test_set_and_delete_recipe(self):
+        """Test replacing tags and deleting a tagged recipe."""
+        recipe = create_recipe(self.user)
+        recipe.tags.set([self.vegan])
+        recipe.tags.set([self.vegan, self.dessert])
+        self.assertCounts(1, 1)
+
+        recipe.delete()
+        self.assertCounts(0, 0)
+
+
+class TagAutocompleteTests(TestCase):
+    """Test ?prefix= and ?q= tag autocomplete."""
+
+    def setUp(self):
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        recipes = [create_recipe(self.user) for _ in range(3)]
+        for name, uses in [("Vegan", 1), ("Vegetarian", 3), ("Vegetables", 0), ("Dessert", 2)]:
+            tag = Tag.objects.create(user=self.user, name=name)
+            tag.recipe_set.add(*recipes[:uses])
+        Tag.objects.create(user=create_user("other@example.com"), name="Vegan Other")
+
+    def names(self, **params):
+        res = self.client.get(TAGS_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [tag["name"] for tag in res.data]
+
+    def test_prefix_ordered_by_usage(self):
+        """Test prefix matches are case-insensitive and most used first."""
+        self.assertEqual(self.names(prefix="VEG"), ["Vegetarian", "Vegan", "Vegetables"])
+
+    def test_prefix_is_not_a_pattern(self):
+        """Test LIKE wildcards in the prefix match literally."""
+        self.assertEqual(self.names(prefix="%an"), [])
+
+    def test_substring_search(self):
+        """Test ?q= matches anywhere in the name."""
+        self.assertIn("Dessert", self.names(q="sser"))
+
+    @mock.patch("recipe.views.trigram_search_enabled", return_value=True)
+    def test_substring_search_matches_upper_name(self, _):
+        """Test both ?q= matches are on UPPER(name), the trigram index expression."""
+        request = Request(APIRequestFactory().get(TAGS_URL, {"q": "sser"}))
+        request.user = self.user
+        view = TagViewSet(request=request, action="list")
+
+        sql = str(view.get_queryset().query)
+
+        self.assertIn('UPPER("core_tag"."name"::text) LIKE', sql)
+        self.assertIn('UPPER("core_tag"."name") %', sql)
+        self.assertNotIn('"core_tag"."name" %', sql)
+
+    @override_settings(TAG_AUTOCOMPLETE_LIMIT=2)
+    def test_limited_to_top_matches(self):
+        """Test only the most used matches are returned."""
+        self.assertEqual(self.names(prefix="veg"), ["Vegetarian", "Vegan"])
@@ -17,4 +17,5 @@ app_name = "recipe"
 
 urlpatterns = [
     path("recipes/", include(router.urls)),
+    path("sync/", views.SyncView.as_view(), name="sync"),
 ]
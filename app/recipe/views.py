@@ -2,37 +2,157 @@
 Views for the recipe APIs
 """
 
+import base64
+import functools
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import connection, connections
+from django.db.models import Count, F, Q
+from django.db.models.functions import Lower, Upper
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter, extend_schema
+
 from rest_framework import viewsets, mixins
-from rest_framework.authentication import TokenAuthentication
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError as APIValidationError
+from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import JSONRenderer
+from rest_framework.views import APIView
 
 
-from core.models import Recipe, Tag
+from core.authentication import ExpiringTokenAuthentication
+from core.compression import cache_compressed_as
+from core.counts import user_recipe_count
+from core.events import publish
+from core.export import CSVRenderer, stream_recipes
+from core.idempotency import IdempotentCreateMixin
+from core.models import Recipe, Tag, Tombstone
+from core.pagination import EstimatedCountPagination
+from core.similarity import get_index
+from core.stats import cached_recipe_stats, invalidate_recipe_stats
 from recipe import serializers
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(IdempotentCreateMixin, viewsets.ModelViewSet):
     """Manage recipes in the database."""
 
     serializer_class = serializers.RecipeDetailSerializer
     queryset = Recipe.objects.all()
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (ExpiringTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = EstimatedCountPagination
 
     def get_queryset(self):
         """Return objects for the current authenticated user only."""
-        return self.queryset.filter(user=self.request.user).order_by("-id")
+        queryset = self.queryset.filter(user=self.request.user).order_by("-id")
+        if self.action == "list":
+            if settings.RECIPE_LIST_TAG_SNAPSHOT:
+                return queryset.defer("description")
+            return queryset.prefetch_related("tags")
+        return queryset
 
     def get_serializer_class(self):
         """Return appropriate serializer class."""
         if self.action == "list":
+            if settings.RECIPE_LIST_TAG_SNAPSHOT:
+                return serializers.RecipeListSerializer
             return serializers.RecipeSerializer
         return super().get_serializer_class()
 
+    @extend_schema(responses=serializers.SimilarRecipeSerializer(many=True))
+    @action(detail=True, serializer_class=serializers.SimilarRecipeSerializer)
+    def similar(self, request, pk=None):
+        """Return the user's recipes sharing the most tags with a recipe."""
+        recipe = self.get_object()
+        limit = settings.RECIPE_SIMILAR_LIMIT
+        if settings.RECIPE_SIMILAR_IN_MEMORY:
+            ranked = get_index(request.user.id).similar(recipe.id, limit)
+        else:
+            ranked = Recipe.objects.similar(recipe.id, request.user.id, limit)
+
+        recipes = Recipe.objects.defer("description").in_bulk(
+            [recipe_id for recipe_id, _ in ranked]
+        )
+        similar = []
+        for recipe_id, score in ranked:
+            if recipe_id in recipes:
+                recipes[recipe_id].similarity = score
+                similar.append(recipes[recipe_id])
+        return Response(self.get_serializer(similar, many=True).data)
+
+    @extend_schema(responses=OpenApiTypes.OBJECT)
+    @action(detail=False)
+    def stats(self, request):
+        """Return time, price and tag usage statistics of the user's recipes."""
+        key, stats = cached_recipe_stats(request.user.id)
+        return cache_compressed_as(Response(stats), key)
+
+    @extend_schema(responses={200: OpenApiTypes.STR})
+    @action(detail=False, renderer_classes=[JSONRenderer, CSVRenderer])
+    def export(self, request):
+        """Stream the user's recipes as CSV, straight from COPY."""
+        response = StreamingHttpResponse(
+            stream_recipes(request.user.id), content_type="text/csv; charset=utf-8"
+        )
+        response["Content-Disposition"] = 'attachment; filename="recipes.csv"'
+        return response
+
+    def get_count(self, queryset):
+        """Return the user's cached recipe count for paginated lists."""
+        return user_recipe_count(self.request.user.id), False
+
     def perform_create(self, serializer):
         """Create a new recipe."""
         serializer.save(user=self.request.user)
 
+    def update(self, request, *args, **kwargs):
+        """Update a recipe.
+
+        Updates leaving the tags alone run as one conditional
+        UPDATE ... RETURNING, without fetching the recipe first.
+        """
+        partial = kwargs.pop("partial", False)
+        serializer = self.get_serializer(data=request.data, partial=partial)
+        serializer.is_valid(raise_exception=True)
+
+        values = serializer.validated_data
+        if values and "tags" not in values:
+            try:
+                pk = Recipe._meta.pk.to_python(self.kwargs["pk"])
+            except ValidationError:
+                pk = None
+            recipe = pk and Recipe.objects.update_returning(
+                pk, request.user, **values
+            )
+            if recipe:
+                # The raw UPDATE sends no post_save.
+                invalidate_recipe_stats(request.user.id)
+                publish(request.user.id, "recipe.updated", recipe.id)
+                return Response(self.get_serializer(recipe).data)
+
+        # Tag changes, no-op updates and missing recipes take the regular path.
+        serializer.instance = self.get_object()
+        self.perform_update(serializer)
+        return Response(serializer.data)
+
+
+@functools.lru_cache(maxsize=None)
+def _has_pg_trgm(alias):
+    with connections[alias].cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        return cursor.fetchone() is not None
+
+
+def trigram_search_enabled():
+    """Return whether fuzzy tag matching by trigram similarity is on."""
+    return settings.TAG_TRIGRAM_SEARCH and _has_pg_trgm(connection.alias)
+
 
 class TagViewSet(
     mixins.DestroyModelMixin,
@@ -45,13 +165,137 @@ class TagViewSet(
 
     serializer_class = serializers.TagSerializer
     queryset = Tag.objects.all()
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (ExpiringTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = EstimatedCountPagination
+
+    def _with_counts(self):
+        """Return whether recipe counts were requested for the list."""
+        value = self.request.query_params.get("with_counts", "")
+        return self.action == "list" and value.lower() in ("1", "true", "yes")
+
+    def _autocomplete(self):
+        """Return the (prefix, q) autocomplete terms of a list request."""
+        if self.action != "list":
+            return "", ""
+        params = self.request.query_params
+        return params.get("prefix", "").strip(), params.get("q", "").strip()
 
     def get_queryset(self):
         """Return objects for the current authenticated user only."""
-        return self.queryset.filter(user=self.request.user).order_by("-name")
+        queryset = self.queryset.filter(user=self.request.user)
+        if self._with_counts():
+            if settings.TAG_RECIPE_COUNT_DENORMALIZED:
+                queryset = queryset.annotate(num_recipes=F("recipe_count"))
+            else:
+                queryset = queryset.annotate(num_recipes=Count("recipe"))
+
+        prefix, term = self._autocomplete()
+        if prefix or term:
+            if prefix:
+                # Served by tag_user_lower_name_idx.
+                queryset = queryset.alias(lower_name=Lower("name")).filter(
+                    lower_name__startswith=prefix.lower()
+                )
+            if term:
+                # Both match UPPER(name), served by tag_upper_name_trgm_idx.
+                # Trigram similarity ignores case, so this changes no result.
+                match = Q(name__icontains=term)
+                if trigram_search_enabled():
+                    match |= Q(upper_name__trigram_similar=term)
+                queryset = queryset.alias(upper_name=Upper("name")).filter(match)
+            limit = settings.TAG_AUTOCOMPLETE_LIMIT
+            return queryset.order_by("-recipe_count", "name")[:limit]
+
+        return queryset.order_by("-name")
+
+    def get_serializer_class(self):
+        """Return appropriate serializer class."""
+        if self._with_counts():
+            return serializers.TagWithCountSerializer
+        return super().get_serializer_class()
+
+    def paginate_queryset(self, queryset):
+        """Return autocomplete matches unpaginated."""
+        if any(self._autocomplete()):
+            return None
+        return super().paginate_queryset(queryset)
 
     # def perform_create(self, serializer):
     #     """Create a new tag."""
     #     serializer.save(user=self.request.user)
+
+
+def encode_sync_token(moment):
+    """Return the opaque sync token for a point in time."""
+    micros = int(moment.timestamp() * 1_000_000)
+    return base64.urlsafe_b64encode(str(micros).encode()).decode().rstrip("=")
+
+
+def decode_sync_token(token):
+    """Return the point in time of a sync token, raising ValueError if bad."""
+    padded = token + "=" * (-len(token) % 4)
+    try:
+        micros = int(base64.urlsafe_b64decode(padded.encode()).decode())
+        return datetime.fromtimestamp(micros / 1_000_000, tz=dt_timezone.utc)
+    except (ValueError, UnicodeDecodeError, OverflowError, OSError):
+        # Out of range timestamps raise OverflowError or OSError.
+        raise ValueError("Invalid sync token.")
+
+
+class SyncView(APIView):
+    """Return the recipes and tags changed or deleted since a sync token.
+
+    Without ?since=, or with a token older than the tombstone retention, a
+    full snapshot is returned with "reset" set.
+    """
+
+    authentication_classes = (ExpiringTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+
+    @extend_schema(
+        parameters=[OpenApiParameter("since", str, description="Sync token.")],
+        responses=OpenApiTypes.OBJECT,
+    )
+    def get(self, request):
+        user = request.user
+        until = timezone.now() - timedelta(seconds=settings.SYNC_SAFETY_WINDOW_SECONDS)
+        horizon = timezone.now() - timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS)
+
+        since = request.query_params.get("since")
+        if since:
+            try:
+                since = decode_sync_token(since)
+            except ValueError as exc:
+                raise APIValidationError({"since": str(exc)})
+            # Changes that were held back by the safety window are fetched
+            # again by the next sync, so a token never moves backwards.
+            until = max(until, since)
+        reset = not since or since < horizon
+
+        recipes = Recipe.objects.filter(user=user, updated_at__lte=until)
+        tags = Tag.objects.filter(user=user, updated_at__lte=until)
+        deleted = {Tombstone.RECIPE: [], Tombstone.TAG: []}
+        if not reset:
+            recipes = recipes.filter(updated_at__gt=since)
+            tags = tags.filter(updated_at__gt=since)
+            tombstones = Tombstone.objects.filter(
+                user=user, deleted_at__gt=since, deleted_at__lte=until
+            ).values_list("kind", "object_id")
+            for kind, object_id in tombstones:
+                deleted[kind].append(object_id)
+
+        return Response({
+            "token": encode_sync_token(until),
+            "reset": reset,
+            "recipes": serializers.RecipeSyncSerializer(
+                recipes.order_by("updated_at", "id"), many=True
+            ).data,
+            "tags": serializers.TagSerializer(
+                tags.order_by("updated_at", "id"), many=True
+            ).data,
+            "deleted": {
+                "recipes": deleted[Tombstone.RECIPE],
+                "tags": deleted[Tombstone.TAG],
+            },
+        })
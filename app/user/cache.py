@@ -0,0 +1,18 @@
+"""
+Cache of the rendered "me" profile.
+
+Entries live in the default cache, which all worker processes share, so
+dropping one after a change applies to every worker.
+"""
+
+from django.core.cache import cache
+
+
+def me_cache_key(user_id):
+    """Return the cache key of a user's profile response."""
+    return f"user:me:{user_id}"
+
+
+def invalidate_me_cache(user_id):
+    """Drop a user's cached profile after it changed."""
+    cache.delete(me_cache_key(user_id))
@@ -7,6 +7,8 @@ from django.utils.translation import gettext_lazy as _
 
 from rest_framework import serializers
 
+from user.cache import invalidate_me_cache
+
 
 class UserSerializer(serializers.ModelSerializer):
     """Serializer for the user object."""
@@ -23,13 +25,21 @@ class UserSerializer(serializers.ModelSerializer):
     def update(self, instance, validated_data):
         """Update a user, setting the password correctly and return it."""
         password = validated_data.pop("password", None)
-        user = super().update(instance, validated_data)
+        changed = [
+            attr for attr, value in validated_data.items()
+            if getattr(instance, attr) != value
+        ]
+        for attr in changed:
+            setattr(instance, attr, validated_data[attr])
 
         if password:
-            user.set_password(password)
-            user.save()
+            instance.set_password(password)
+            changed.append("password")
 
-        return user
+        if changed:
+            instance.save(update_fields=changed)
+            invalidate_me_cache(instance.pk)
+        return instance
 
 
 class AuthTokenSerializer(serializers.Serializer):
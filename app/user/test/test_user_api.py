@@ -2,12 +2,18 @@
 Tests for user API.
 """
 
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient
 
+from core.models import AuthToken
+from core.tests.shared_cache import SharedCacheMixin
+from user.serializers import UserSerializer
 
 CREATE_USER_URL = reverse("user:create")
 TOKEN_URL = reverse("user:token")
@@ -47,6 +53,38 @@ class PublicUserApiTests(TestCase):
         self.assertTrue(user.check_password(payload["password"]))
         self.assertNotIn("password", res.data)
 
+    def test_create_user_idempotency_key(self):
+        """Test a retried signup replays the first response."""
+        payload = {
+            "email": "test@example.com",
+            "password": "testpass",
+            "name": "Test Name",
+        }
+
+        res1 = self.client.post(CREATE_USER_URL, payload, HTTP_IDEMPOTENCY_KEY="k1")
+        res2 = self.client.post(CREATE_USER_URL, payload, HTTP_IDEMPOTENCY_KEY="k1")
+
+        self.assertEqual(res1.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res2.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res2.data, res1.data)
+        self.assertEqual(get_user_model().objects.count(), 1)
+
+    def test_idempotency_key_scoped_to_client(self):
+        """Test anonymous clients reusing a key do not see each other's signup."""
+        payload = {"email": "test@example.com", "password": "testpass", "name": "Test"}
+        other = {"email": "other@example.com", "password": "testpass", "name": "Other"}
+
+        res1 = self.client.post(
+            CREATE_USER_URL, payload, HTTP_IDEMPOTENCY_KEY="k1", REMOTE_ADDR="10.0.0.1"
+        )
+        res2 = self.client.post(
+            CREATE_USER_URL, other, HTTP_IDEMPOTENCY_KEY="k1", REMOTE_ADDR="10.0.0.2"
+        )
+
+        self.assertEqual(res1.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res2.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res2.data["email"], "other@example.com")
+
     def test_user_user_with_email_exists(self):
         """Test creating a user that already exists fails."""
         payload = {
@@ -126,6 +164,7 @@ class PrivateUserApiTests(TestCase):
     """Test API requests that require authentication."""
 
     def setUp(self):
+        cache.clear()
         self.user = create_user(
             email=user_details["email"],
             password=user_details["password"],
@@ -166,3 +205,81 @@ class PrivateUserApiTests(TestCase):
         self.assertEqual(self.user.name, payload["name"])
         self.assertTrue(self.user.check_password(payload["password"]))
         self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_update_user_profile_single_write(self):
+        """Test updating name and password saves the user once."""
+        payload = {
+            "name": "new name",
+            "password": "newpassword123",
+        }
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.patch(ME_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        updates = [q["sql"] for q in queries if q["sql"].startswith("UPDATE")]
+        self.assertEqual(len(updates), 1)
+        self.assertNotIn('"email"', updates[0])
+
+    def test_retrieve_profile_cached(self):
+        """Test repeated profile reads are served from the cache."""
+        first = self.client.get(ME_URL)
+
+        with self.assertNumQueries(0):
+            second = self.client.get(ME_URL)
+
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second["ETag"], first["ETag"])
+
+    def test_retrieve_profile_not_modified(self):
+        """Test a matching If-None-Match gets a 304."""
+        etag = self.client.get(ME_URL)["ETag"]
+
+        res = self.client.get(ME_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res["ETag"], etag)
+
+    def test_update_invalidates_cached_profile(self):
+        """Test updating the profile drops the cached response."""
+        etag = self.client.get(ME_URL)["ETag"]
+
+        self.client.patch(ME_URL, {"name": "new name"})
+        res = self.client.get(ME_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["name"], "new name")
+
+    def test_delete_me_deactivates_and_queues_purge(self):
+        """Test deleting the profile deactivates the user and revokes tokens."""
+        token = AuthToken.objects.issue(self.user)
+
+        res = self.client.delete(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+        self.assertIsNotNone(self.user.purge_requested_at)
+        self.assertFalse(AuthToken.objects.filter(key=token.key).exists())
+
+
+def rename(user_id, name):
+    user = get_user_model().objects.get(pk=user_id)
+    serializer = UserSerializer(user, data={"name": name}, partial=True)
+    serializer.is_valid(raise_exception=True)
+    serializer.save()
+
+
+class SharedProfileCacheTests(SharedCacheMixin, TransactionTestCase):
+    """Test cached profiles are dropped in every worker process."""
+
+    def test_update_in_other_process(self):
+        """Test a profile updated by another worker is not served stale."""
+        user = create_user(email="test@example.com", password="testpass123", name="Old")
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Token {AuthToken.objects.issue(user).key}")
+        self.assertEqual(client.get(ME_URL).data["name"], "Old")
+
+        self.in_other_process(rename, user.pk, "New")
+
+        self.assertEqual(client.get(ME_URL).data["name"], "New")
@@ -2,14 +2,28 @@
 Views for the user API.
 """
 
-from rest_framework import generics, authentication, permissions
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+
+from rest_framework import generics, permissions, status
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
 
+from core.authentication import ExpiringTokenAuthentication
+from core.compression import cache_compressed_as
+from core.idempotency import IdempotentCreateMixin
+from core.models import AuthToken
+from core.purge import request_user_purge
+from core.throttling import LoginRateThrottle
 from user import serializers
+from user.cache import me_cache_key
 
 
-class CreateUserView(generics.CreateAPIView):
+class CreateUserView(IdempotentCreateMixin, generics.CreateAPIView):
     """Create a new user in the system."""
 
     serializer_class = serializers.UserSerializer
@@ -20,15 +34,48 @@ class CreateTokenView(ObtainAuthToken):
 
     serializer_class = serializers.AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    throttle_classes = (LoginRateThrottle,)
+
+    def post(self, request, *args, **kwargs):
+        """Issue a new expiring token with a single INSERT."""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        token = AuthToken.objects.issue(serializer.validated_data["user"])
+        return Response({"token": token.key})
 
 
-class ManageUserView(generics.RetrieveUpdateAPIView):
+class ManageUserView(generics.RetrieveUpdateDestroyAPIView):
     """Manage the authenticated user."""
 
     serializer_class = serializers.UserSerializer
-    authentication_classes = (authentication.TokenAuthentication,)
+    authentication_classes = (ExpiringTokenAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
 
     def get_object(self):
         """Retrieve and return authenticated user."""
         return self.request.user
+
+    def retrieve(self, request, *args, **kwargs):
+        """Return the profile from the cache, honouring If-None-Match."""
+        key = me_cache_key(request.user.pk)
+        entry = cache.get(key)
+        if entry is None:
+            data = self.get_serializer(self.get_object()).data
+            digest = hashlib.sha1(json.dumps(data, sort_keys=True).encode()).hexdigest()
+            entry = {"data": dict(data), "etag": f'"{digest}"'}
+            cache.set(key, entry, settings.ME_CACHE_SECONDS)
+
+        headers = {"ETag": entry["etag"]}
+        if_none_match = request.headers.get("If-None-Match", "")
+        # Compressed responses carry a weak version of the ETag.
+        etags = [tag.strip().replace("W/", "", 1) for tag in if_none_match.split(",")]
+        if entry["etag"] in etags or if_none_match.strip() == "*":
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return cache_compressed_as(
+            Response(entry["data"], headers=headers), f"{key}:{entry['etag']}"
+        )
+
+    def destroy(self, request, *args, **kwargs):
+        """Deactivate the user now and purge their data in the background."""
+        request_user_purge(request.user)
+        return Response(status=status.HTTP_202_ACCEPTED)